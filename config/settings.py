@@ -44,6 +44,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Ahead of GZipMiddleware: static files are precompressed or don't compress
+    'restaurants.middleware.StaticAssetMiddleware',
+    # Compresses dynamic HTML
+    'django.middleware.gzip.GZipMiddleware',
+    # SQL count and time, template time and cache hits per request
+    'restaurants.metrics.RequestMetricsMiddleware',
+    'restaurants.routers.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,7 +63,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates, timed for the request metrics
+        'BACKEND': 'restaurants.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -76,13 +84,46 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Run on every new connection. WAL lets readers carry on while one writer
+# commits; synchronous=NORMAL is durable across app crashes in WAL mode and
+# only risks the last commits on power loss. mmap_size and cache_size (in KiB
+# when negative) keep hot pages in memory instead of re-reading the file.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA mmap_size=134217728;'
+    'PRAGMA cache_size=-20000;'
+    'PRAGMA busy_timeout=5000;'
+    'PRAGMA temp_store=MEMORY;'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests; health checks replace
+        # any that went bad instead of failing the request
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+            # Seconds to wait for the write lock (matches busy_timeout)
+            'timeout': 5,
+            # Take the write lock at BEGIN rather than on the first write, so a
+            # transaction waits for it instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Read replicas: aliases in DATABASES that serve reads. Add them in
+# local_settings.py, e.g. a second SQLite file kept current with
+# `python manage.py sync_replicas --interval 5`. After a write, the client
+# reads from the primary for REPLICA_PIN_SECONDS so it sees its own changes.
+DATABASE_ROUTERS = ['restaurants.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -120,10 +161,46 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+# collectstatic output: hashed bundles plus .gz/.br siblings
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    # Uploads are stored once per distinct content, see restaurants/storage.py
+    'default': {
+        'BACKEND': 'restaurants.storage.ContentAddressedStorage',
+    },
+    # Content-hashed names, served with far-future cache headers
+    'staticfiles': {
+        'BACKEND': 'restaurants.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Cache backend: 'locmem' (per process), 'file' or 'db' (both shared between
+# processes; run `python manage.py createcachetable` before using 'db').
+# Override in local_settings.py.
+CACHE_BACKEND = 'locmem'
+
+# Queries a request may run before restaurants.metrics flags it, by URL
+# name; DEFAULT_QUERY_BUDGET covers the other views. With DEBUG on an
+# overrun logs a warning with the stack of the first query past the budget,
+# otherwise a one-line warning, and it is counted for
+# `python manage.py query_budgets`.
+QUERY_BUDGETS = {
+    'feed': 30,
+    'explore': 15,
+    'restaurant_search': 15,
+    'restaurant_detail': 20,
+    'view_menu': 15,
+    'view_list': 20,
+    'user_profile': 20,
+    'view_user_profile': 20,
+    'notifications': 10,
+}
+DEFAULT_QUERY_BUDGET = 25
+
 # Auth settings
 LOGIN_REDIRECT_URL = 'feed'
 LOGOUT_REDIRECT_URL = 'login'
@@ -142,3 +219,22 @@ try:
 except ImportError:
     pass
 
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'restaurants.metrics.CountingLocMemCache',
+        'LOCATION': 'bitebook',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'file': {
+        'BACKEND': 'restaurants.metrics.CountingFileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    },
+    'db': {
+        'BACKEND': 'restaurants.metrics.CountingDatabaseCache',
+        'LOCATION': 'bitebook_cache',
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
@@ -29,6 +29,7 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),
     path('', restaurant_views.root_redirect, name='root'),
     path('feed/', restaurant_views.feed, name='feed'),
+    path('explore/', restaurant_views.explore, name='explore'),
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='login'), name='logout'),
     path('signup/', restaurant_views.signup, name='signup'),
@@ -41,17 +42,25 @@ urlpatterns = [
     path('restaurants/<int:restaurant_id>/add-menu/', restaurant_views.add_menu, name='add_menu'),
     path('restaurants/<int:restaurant_id>/menu/', restaurant_views.view_menu, name='view_menu'),
     path('menu-items/<int:menu_item_id>/review/', restaurant_views.add_review, name='add_review'),
+    path('menu-items/<int:menu_item_id>/reviews/', restaurant_views.menu_item_reviews, name='menu_item_reviews'),
     path('reviews/<int:review_id>/like/', restaurant_views.like_review, name='like_review'),
+    path('reviews/<int:review_id>/likes/', restaurant_views.review_like, name='review_like'),
     path('reviews/<int:review_id>/comment/', restaurant_views.add_comment, name='add_comment'),
+    path('reviews/<int:review_id>/comments/', restaurant_views.review_comments, name='review_comments'),
     path('comments/<int:comment_id>/delete/', restaurant_views.delete_comment, name='delete_comment'),
+    path('comments/<int:comment_id>/replies/', restaurant_views.comment_replies, name='comment_replies'),
     path('create-diary-entry/', post_views.create_diary_entry, name='create_diary_entry'),
     path('posts/<int:post_id>/', post_views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/like/', post_views.like_post, name='like_post'),
+    path('posts/<int:post_id>/likes/', post_views.post_like, name='post_like'),
     path('posts/<int:post_id>/comment/', post_views.add_post_comment, name='add_post_comment'),
+    path('posts/<int:post_id>/comments/', post_views.post_comments, name='post_comments'),
     path('posts/<int:post_id>/delete/', post_views.delete_post, name='delete_post'),
     path('post-comments/<int:comment_id>/delete/', post_views.delete_post_comment, name='delete_post_comment'),
+    path('post-comments/<int:comment_id>/replies/', post_views.post_comment_replies, name='post_comment_replies'),
     path('profile/', restaurant_views.user_profile, name='user_profile'),
     path('profile/edit/', restaurant_views.edit_profile, name='edit_profile'),
+    path('profile/delete/', restaurant_views.delete_account, name='delete_account'),
     path('user/<str:username>/', restaurant_views.view_user_profile, name='view_user_profile'),
     path('user/<str:username>/follow/', restaurant_views.follow_user, name='follow_user'),
     path('user/<str:username>/unfollow/', restaurant_views.unfollow_user, name='unfollow_user'),
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 14:28
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_post_counts(apps, schema_editor):
+    # Feeds and post pages stop counting rows, so store today's counts in a single UPDATE
+    Post = apps.get_model('posts', 'Post')
+    PostLike = apps.get_model('posts', 'PostLike')
+    PostComment = apps.get_model('posts', 'PostComment')
+
+    def count(related):
+        rows = related.objects.filter(post=models.OuterRef('pk')).order_by().values('post')
+        return Coalesce(
+            models.Subquery(rows.annotate(count=models.Count('pk')).values('count')), 0,
+        )
+
+    Post.objects.update(like_count=count(PostLike), comment_count=count(PostComment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_post_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_post_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 14:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_comment_count_post_like_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['post', 'created_at'], name='postcomment_post_created_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-19 14:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+SEGMENT_WIDTH = 8
+
+
+def segment(pk):
+    digits = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        digits = DIGITS[digit] + digits
+    return digits.rjust(SEGMENT_WIDTH, '0')
+
+
+def backfill_paths(apps, schema_editor):
+    # Every existing comment is top-level: its path is its own segment
+    PostComment = apps.get_model('posts', 'PostComment')
+    comments = list(PostComment.objects.only('pk'))
+    for comment in comments:
+        comment.path = segment(comment.pk)
+    PostComment.objects.bulk_update(comments, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_postcomment_postcomment_post_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postcomment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.postcomment'),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['post', 'path'], name='postcomment_post_path_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-19 14:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_postcomment_depth_postcomment_parent_and_more'),
+        ('restaurants', '0030_comment_depth_comment_parent_comment_path_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at'], name='post_created_idx'),
+        ),
+    ]
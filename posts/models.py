@@ -2,6 +2,8 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
 
+from restaurants.managers import LiveManager
+
 class Post(models.Model):
     POST_TYPES = [
         ('review', 'Review'),
@@ -16,6 +18,22 @@ class Post(models.Model):
     rating = models.DecimalField(max_digits=3, decimal_places=1, validators=[MinValueValidator(1.0), MaxValueValidator(10.0)], null=True, blank=True)
     review_text = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Kept by restaurants.counters alongside the PostLike and PostComment rows
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Set when deleted; restaurants.purge removes the row and its dependents later
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # A user's posts on their profile, newest first
+            models.Index(fields=['user', '-created_at'], name='post_user_created_idx'),
+            # The past week's posts, scored for the Explore feed
+            models.Index(fields=['-created_at'], name='post_created_idx'),
+        ]
 
     def __str__(self):
         return self.title or f"{self.user.username if self.user else 'Anonymous'}'s post"
@@ -38,6 +56,20 @@ class PostComment(models.Model):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Replies: see restaurants.comments for the path encoding
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    path = models.CharField(max_length=64, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Replies anywhere below this comment, kept by restaurants.counters
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # A post's top-level comments, paged by (created_at, id)
+            models.Index(fields=['post', 'created_at'], name='postcomment_post_created_idx'),
+            # A thread or subtree in display order
+            models.Index(fields=['post', 'path'], name='postcomment_post_path_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} commented on {self.post.title}"
@@ -1,9 +1,15 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Post, PostLike, PostComment
+from .models import Post, PostComment
 from django import forms
 from restaurants.models import Review, Notification
+from restaurants.images import variant_url
+from restaurants.db import retry_on_lock
+from restaurants.comments import comment_page, parse_cursor, subtree
+from restaurants.counters import add_like, comment_on, remove_comment, remove_like
+from restaurants.purge import soft_delete
 from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
 
 class DiaryEntryForm(forms.ModelForm):
     class Meta:
@@ -34,6 +40,7 @@ def post_detail(request, post_id):
     like_count = 0
     user_has_liked = False
     comments = []
+    earlier_comments = None
     
     if post.post_type == 'review' and post.menu_item:
         review = Review.objects.filter(
@@ -43,14 +50,15 @@ def post_detail(request, post_id):
         ).first()
         
         if review:
-            like_count = review.likes.count()
+            like_count = review.like_count
             user_has_liked = review.likes.filter(user=request.user).exists()
-            comments = review.comments.select_related('user', 'user__profile').all()
+            # The newest page; earlier ones load on demand
+            comments, earlier_comments = comment_page(review.comments.all())
     else:
         # For non-review posts, use PostLike and PostComment
-        like_count = post.likes.count()
+        like_count = post.like_count
         user_has_liked = post.likes.filter(user=request.user).exists()
-        comments = post.comments.select_related('user', 'user__profile').all()
+        comments, earlier_comments = comment_page(post.comments.all())
     
     is_top_reviewer = post.user.profile.is_top_reviewer() if post.user and hasattr(post.user, 'profile') else False
     
@@ -60,41 +68,61 @@ def post_detail(request, post_id):
         'like_count': like_count,
         'user_has_liked': user_has_liked,
         'comments': comments,
+        'earlier_comments': earlier_comments,
         'is_top_reviewer': is_top_reviewer
     })
 
 
+def _like_post(request, post):
+    """Like ``post`` as the current user, notifying its author the first time."""
+    if not add_like(post, request.user):
+        return False
+    if post.user and post.user != request.user:
+        Notification.objects.create(
+            user=post.user,
+            notification_type='post_like',
+            post=post,
+            triggered_by=request.user
+        )
+    return True
+
+
 @login_required
+@retry_on_lock
 def like_post(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    like, created = PostLike.objects.get_or_create(post=post, user=request.user)
-    
-    if not created:
-        # Unlike if already liked
-        like.delete()
-        liked = False
-    else:
-        liked = True
-        # Create notification for the post author
-        if post.user and post.user != request.user:
-            Notification.objects.create(
-                user=post.user,
-                notification_type='post_like',
-                post=post,
-                triggered_by=request.user
-            )
+    # Toggle: unlike if already liked
+    liked = _like_post(request, post)
+    if not liked:
+        remove_like(post, request.user)
     
     # Return JSON for AJAX or redirect for regular requests
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'liked': liked,
-            'like_count': post.likes.count()
+            'like_count': post.like_count
         })
     
     # Redirect back to the previous page
     return redirect(request.META.get('HTTP_REFERER', 'feed'))
 
 
+@login_required
+@require_http_methods(['POST', 'DELETE'])
+@retry_on_lock
+def post_like(request, post_id):
+    """Idempotent like (POST) and unlike (DELETE): repeating either changes nothing."""
+    post = get_object_or_404(Post, id=post_id)
+    if request.method == 'POST':
+        _like_post(request, post)
+    else:
+        remove_like(post, request.user)
+    return JsonResponse({
+        'liked': request.method == 'POST',
+        'like_count': post.like_count
+    })
+
+
 @login_required
 def delete_post(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -103,7 +131,8 @@ def delete_post(request, post_id):
     if post.user != request.user and not request.user.is_staff:
         return JsonResponse({'success': False, 'error': 'Unauthorized'}, status=403)
     
-    post.delete()
+    # Hidden now; its likes and comments are purged in the background
+    soft_delete(post)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'success': True})
@@ -112,33 +141,61 @@ def delete_post(request, post_id):
 
 
 @login_required
+def post_comments(request, post_id):
+    """The page of a post's comments before ``?before=<cursor>``, for "View earlier comments"."""
+    post = get_object_or_404(Post, id=post_id)
+    before = request.GET.get('before', '')
+    comments, earlier = comment_page(post.comments.all(), parse_cursor(before))
+    return render(request, 'comment_thread_partial.html', {
+        'comments': comments,
+        'earlier': earlier,
+        'url_name': 'post_comments',
+        'parent_id': post.id,
+        'kind': 'post',
+        'replies_loaded': True,
+    })
+
+
+@login_required
+def post_comment_replies(request, comment_id):
+    """Every reply below one comment on a post, in thread order."""
+    comment = get_object_or_404(PostComment.objects.select_related('post'), id=comment_id)
+    return render(request, 'comment_thread_partial.html', {
+        'comments': subtree(comment.post.comments.all(), comment),
+        'kind': 'post',
+        'replies_loaded': True,
+    })
+
+
+@login_required
+@retry_on_lock
 def delete_post_comment(request, comment_id):
-    comment = get_object_or_404(PostComment, id=comment_id)
+    comment = get_object_or_404(PostComment.objects.select_related('post'), id=comment_id)
     
     # Allow the comment author or staff to delete it
     if comment.user != request.user and not request.user.is_staff:
         return JsonResponse({'success': False, 'error': 'Unauthorized'}, status=403)
     
-    comment.delete()
+    # Replies go with it
+    deleted = remove_comment(comment.post, comment)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return JsonResponse({'success': True})
+        return JsonResponse({'success': True, 'deleted': deleted})
     
     return redirect(request.META.get('HTTP_REFERER', 'feed'))
 
 
 @login_required
+@retry_on_lock
 def add_post_comment(request, post_id):
     if request.method == 'POST':
         post = get_object_or_404(Post, id=post_id)
         text = request.POST.get('text', '').strip()
+        parent_id = request.POST.get('parent', '')
+        parent = post.comments.filter(pk=parent_id).first() if parent_id.isdigit() else None
         
         if text:
-            comment = PostComment.objects.create(
-                post=post,
-                user=request.user,
-                text=text
-            )
+            comment = comment_on(post, request.user, text, parent)
             
             # Create notification for the post author
             if post.user and post.user != request.user:
@@ -161,7 +218,7 @@ def add_post_comment(request, post_id):
                     if profile.display_name:
                         display_name = profile.display_name
                     if profile.profile_picture:
-                        profile_picture_url = profile.profile_picture.url
+                        profile_picture_url = variant_url(profile.profile_picture, profile.picture_variants, 'avatar')
                 
                 return JsonResponse({
                     'success': True,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Restaurant, Menu, MenuItem, Review, Profile, Follow, ReviewLike, RestaurantList, Comment, CustomList, CustomListItem, HappyHour, Notification
+from .models import Restaurant, Menu, MenuItem, Review, Profile, Follow, ReviewLike, RestaurantList, Comment, CustomList, CustomListItem, HappyHour, Notification, MediaBlob, RestaurantFacet, UserSearchEntry, Job
 
 admin.site.register(Restaurant)
 admin.site.register(Menu)
@@ -14,3 +14,7 @@ admin.site.register(CustomList)
 admin.site.register(CustomListItem)
 admin.site.register(HappyHour)
 admin.site.register(Notification)
+admin.site.register(MediaBlob)
+admin.site.register(RestaurantFacet)
+admin.site.register(UserSearchEntry)
+admin.site.register(Job)
@@ -0,0 +1,141 @@
+"""
+Versioned fragment cache for restaurant cards.
+
+Every restaurant has a version stamp in the cache, and a card is stored
+under a key that includes the stamp. Signal handlers replace the stamp when
+the restaurant, its menu items, its reviews or its happy hours change, so an
+edited restaurant simply stops matching its old card; stale entries are
+never read again and age out on their own. The same stamps, and one bumped
+with any of them, validate cached pages (restaurants.page_cache).
+"""
+import time
+from typing import Dict, Iterable, List
+
+from django.core.cache import cache
+from django.db.models import Avg, Count
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString, mark_safe
+
+CARD_TEMPLATE = 'restaurant_card.html'
+CARD_TIMEOUT = 60 * 60 * 24
+
+# Bumped with every restaurant's stamp: anything listing many restaurants
+ANY_RESTAURANT_KEY = 'restaurants:version'
+# Bumped when the similar-restaurant neighbours are recomputed
+SIMILAR_KEY = 'similar:version'
+
+HITS_KEY = 'fragments:hits'
+MISSES_KEY = 'fragments:misses'
+
+
+def version_key(restaurant_id: int) -> str:
+    return f'restaurant:{restaurant_id}:version'
+
+
+def card_key(restaurant_id: int, version: str) -> str:
+    return f'restaurant:{restaurant_id}:card:{version}'
+
+
+def new_version() -> str:
+    return str(time.time_ns())
+
+
+def bump_versions(restaurant_ids: Iterable[int]) -> None:
+    """Give each restaurant a fresh stamp, orphaning its cached fragments and pages."""
+    stamp = new_version()
+    keys = {version_key(pk): stamp for pk in set(restaurant_ids) if pk}
+    if keys:
+        keys[ANY_RESTAURANT_KEY] = stamp
+        cache.set_many(keys, timeout=None)
+
+
+def bump_stamp(key: str) -> None:
+    cache.set(key, new_version(), timeout=None)
+
+
+def get_stamps(keys: Iterable[str]) -> Dict[str, str]:
+    """Current value of each stamp key, minting one for any that have none yet."""
+    keys = list(keys)
+    stamps = cache.get_many(keys)
+    # An unused stamp can't collide with anything cached, so racing another
+    # process here costs at most one extra render
+    minted = {key: new_version() for key in keys if key not in stamps}
+    if minted:
+        cache.set_many(minted, timeout=None)
+        stamps.update(minted)
+    return stamps
+
+
+def get_versions(restaurant_ids: Iterable[int]) -> Dict[int, str]:
+    """Current stamp per restaurant."""
+    keys = {version_key(pk): pk for pk in restaurant_ids}
+    return {keys[key]: stamp for key, stamp in get_stamps(keys).items()}
+
+
+def _incr(key: str, delta: int) -> None:
+    if not delta:
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def fragment_stats() -> Dict[str, float]:
+    """Card cache hits, misses and hit ratio since the counters were last reset."""
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counts.get(HITS_KEY, 0)
+    misses = counts.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'ratio': hits / total if total else 0.0}
+
+
+def reset_fragment_stats() -> None:
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def _review_stats(restaurant_ids: List[int]) -> Dict[int, tuple]:
+    from .models import Review
+
+    rows = (
+        Review.objects.filter(menu_item__menu__restaurant_id__in=restaurant_ids)
+        .values('menu_item__menu__restaurant_id')
+        .annotate(avg_rating=Avg('rating'), review_count=Count('id'))
+    )
+    return {
+        row['menu_item__menu__restaurant_id']: (row['avg_rating'], row['review_count'])
+        for row in rows
+    }
+
+
+def render_restaurant_cards(restaurants: Iterable) -> List[SafeString]:
+    """
+    Rendered card HTML for each restaurant, in order.
+
+    A fully cached page costs two ``get_many`` calls (stamps, then cards) plus
+    the counter updates. Only the misses are rendered, and their ratings come
+    from a single grouped query.
+    """
+    restaurants = list(restaurants)
+    versions = get_versions(restaurant.pk for restaurant in restaurants)
+    keys = {restaurant.pk: card_key(restaurant.pk, versions[restaurant.pk]) for restaurant in restaurants}
+    cards = cache.get_many(keys.values())
+
+    missing = [restaurant for restaurant in restaurants if keys[restaurant.pk] not in cards]
+    if missing:
+        stats = _review_stats([restaurant.pk for restaurant in missing])
+        rendered = {}
+        for restaurant in missing:
+            avg_rating, review_count = stats.get(restaurant.pk, (None, 0))
+            rendered[keys[restaurant.pk]] = render_to_string(CARD_TEMPLATE, {
+                'restaurant': restaurant,
+                'avg_rating': round(avg_rating, 1) if avg_rating else None,
+                'review_count': review_count,
+            })
+        cache.set_many(rendered, CARD_TIMEOUT)
+        cards.update(rendered)
+
+    _incr(HITS_KEY, len(restaurants) - len(missing))
+    _incr(MISSES_KEY, len(missing))
+    return [mark_safe(cards[keys[restaurant.pk]]) for restaurant in restaurants]
@@ -0,0 +1,147 @@
+"""
+Comment threads on reviews and posts.
+
+Replies are stored as a materialized path: a comment's ``path`` is its
+parent's path followed by its own id, written as ``SEGMENT_WIDTH`` base-36
+digits. Sorting a thread by path lists every comment directly after its
+parent and before its parent's next reply, so a whole thread, or the
+subtree under one comment, is a single range read of the (parent, path)
+index already in display order, with ``depth`` giving the indentation.
+Threads stop nesting at ``MAX_DEPTH``; deeper replies join their ancestor
+at that depth.
+
+Feed cards show only the newest ``PREVIEW_SIZE`` top-level comments of each
+review or post, next to the stored comment_count. ``latest_comments``
+fetches those for a whole page of cards in one query, numbering each
+thread's comments newest first with ROW_NUMBER() and keeping the first few.
+Their replies load on demand.
+
+Full threads are read newest first in pages of ``PAGE_SIZE`` top-level
+comments, with their replies, and shown oldest first. Pages are keyed on
+(created_at, id) of the oldest comment already shown rather than an offset,
+so each page is one range read of the thread's index however long the
+thread is, and comments added meanwhile do not shift the pages. The cursor
+carries both values, so it keeps working if that comment is deleted.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+PREVIEW_SIZE = 3
+PAGE_SIZE = 20
+MAX_DEPTH = 6
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+SEGMENT_WIDTH = 8
+
+
+def segment(pk: int) -> str:
+    digits = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        digits = DIGITS[digit] + digits
+    return digits.rjust(SEGMENT_WIDTH, '0')
+
+
+def path_ids(path: str) -> List[int]:
+    """Ids of the comments along a path, from the top-level comment down."""
+    return [int(path[i:i + SEGMENT_WIDTH], 36) for i in range(0, len(path), SEGMENT_WIDTH)]
+
+
+def below(path: str) -> Q:
+    """Comments strictly below the comment at ``path``, as a range on the path index."""
+    # Every path character is a base-36 digit, so '~' sorts after all of them
+    return Q(path__gt=path, path__lt=path + '~')
+
+
+def cursor(comment) -> str:
+    """``?before=`` value for the comments older than ``comment``: its created_at in microseconds and its id."""
+    return f'{(comment.created_at - EPOCH) // timedelta(microseconds=1)}-{comment.pk}'
+
+
+def parse_cursor(value: str) -> Optional[Tuple[datetime, int]]:
+    """The (created_at, pk) anchor of a cursor, or None for anything malformed."""
+    micros, _, pk = value.partition('-')
+    if not (micros.isdigit() and pk.isdigit()):
+        return None
+    return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+
+
+def numbered_comments(model, parent: str, parent_ids: Iterable[int]):
+    """The top-level comments on each of the parents, with ``position`` counting from the newest."""
+    return model.objects.filter(
+        **{f'{parent}__in': parent_ids}, parent__isnull=True,
+    ).select_related('user', 'user__profile').annotate(
+        position=Window(RowNumber(), partition_by=F(parent), order_by=[F('created_at').desc(), F('pk').desc()]),
+    )
+
+
+def preview_queryset(model, parent: str, parent_ids: Iterable[int], n: int = PREVIEW_SIZE):
+    """The newest ``n`` top-level comments on each of the parents, grouped by parent and oldest first."""
+    return numbered_comments(model, parent, parent_ids).filter(position__lte=n).order_by(parent, '-position')
+
+
+def latest_comments(model, parent: str, parent_ids: Iterable[int],
+                    n: int = PREVIEW_SIZE) -> Dict[int, Tuple[List, Optional[str]]]:
+    """
+    For each parent, its newest ``n`` top-level comments, oldest first, and
+    the cursor for the page before them (None when there are no more).
+    """
+    parent_ids = list(parent_ids)
+    if not parent_ids:
+        return {}
+    # One extra row per thread says whether there is anything earlier
+    threads = defaultdict(list)
+    for comment in preview_queryset(model, parent, parent_ids, n + 1):
+        threads[getattr(comment, f'{parent}_id')].append(comment)
+    return {
+        parent_id: (comments[-n:], cursor(comments[-n]) if len(comments) > n else None)
+        for parent_id, comments in threads.items()
+    }
+
+
+def replies_to(comments, roots: List) -> List:
+    """Every reply below ``roots``, in one query, in path order."""
+    if not roots:
+        return []
+    return list(comments.filter(reduce(or_, (below(root.path) for root in roots))).select_related(
+        'user', 'user__profile',
+    ).order_by('path'))
+
+
+def older_roots(comments, anchor: Optional[Tuple] = None):
+    """Top-level comments newest first, from just before ``anchor``, a (created_at, pk) pair, if given."""
+    roots = comments.filter(parent__isnull=True).select_related('user', 'user__profile').order_by('-created_at', '-pk')
+    if anchor is not None:
+        created_at, pk = anchor
+        roots = roots.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    return roots
+
+
+def comment_page(comments, before: Optional[Tuple] = None, size: int = PAGE_SIZE) -> Tuple[List, Optional[str]]:
+    """
+    The ``size`` top-level comments just older than ``before``, a parsed
+    cursor (the newest when None), with all their replies, in thread order,
+    and the cursor for the page before them, or None when this page reaches
+    the start of the thread.
+    """
+    page = list(older_roots(comments, before)[:size + 1])
+    earlier = len(page) > size
+    page = page[:size][::-1]
+    replies = defaultdict(list)
+    for reply in replies_to(comments, page):
+        replies[reply.path[:SEGMENT_WIDTH]].append(reply)
+    thread = [comment for root in page for comment in [root] + replies[root.path]]
+    return thread, cursor(page[0]) if earlier else None
+
+
+def subtree(comments, comment) -> List:
+    """The replies below one comment, in thread order."""
+    return replies_to(comments, [comment])
@@ -0,0 +1,180 @@
+"""
+Conditional GET for pages that rarely change between visits.
+
+Each page has a state function that returns a few cheap aggregates (row
+counts and newest timestamps) describing everything the page renders. The
+``conditional_page`` decorator hashes that state, together with the viewer's
+own state, into an ETag, so a repeat visit is answered with ``304 Not
+Modified`` before the view runs any of its queries.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from .context_processors import get_trending_restaurants
+from .models import CustomList, CustomListItem, HappyHour, MenuItem, Restaurant, RestaurantList, Review, ReviewLike, SimilarRestaurant
+
+
+def _stamp(queryset, field):
+    """
+    (row count, newest ``field``) for a queryset. Rows are only inserted and
+    deleted, or stamp ``field`` whenever they are saved, so any change moves
+    one of the two.
+    """
+    row = queryset.aggregate(count=Count('pk'), latest=Max(field))
+    return row['count'], row['latest']
+
+
+def _viewer_state(request, full_page):
+    """Parts of the response that depend on who is looking rather than on the object."""
+    user = request.user
+    if not full_page:
+        return user.pk
+    if not user.is_authenticated:
+        return ('anonymous', request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+    trending = sorted(get_trending_restaurants().values_list('pk', 'name', 'review_count')[:5])
+    return (
+        user.pk,
+        user.is_staff,
+        # The CSRF token embedded in forms must match the current cookie
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        # The sidebar on every authenticated page
+        trending,
+    )
+
+
+def conditional_page(state_func, full_page=True):
+    """
+    ``condition()`` for a view whose content is described by
+    ``state_func(request, *args, **kwargs)``, which returns a tuple of
+    (hashable parts, last modified datetime), or None to always render.
+    ``full_page`` folds in the base template's per-user parts (CSRF token,
+    staff links, trending sidebar); JSON endpoints only vary by user.
+
+    Validation uses the ETag only: Last-Modified is sent for information, but
+    a deleted row doesn't move any timestamp, so If-Modified-Since alone is
+    never trusted to produce a 304.
+    """
+    def get_state(request, *args, **kwargs):
+        if not hasattr(request, '_page_state'):
+            state = None
+            if request.method in ('GET', 'HEAD'):
+                state = state_func(request, *args, **kwargs)
+            request._page_state = state
+        return request._page_state
+
+    def etag_func(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        if state is None:
+            return None
+        parts, _ = state
+        # Full pages and their AJAX partials share a URL
+        key = repr((parts, _viewer_state(request, full_page), request.headers.get('X-Requested-With')))
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            state = get_state(request, *args, **kwargs)
+            if state is not None:
+                last_modified = state[1]
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+                # Personalised pages: keep them out of shared caches and make
+                # the browser revalidate instead of guessing a freshness lifetime
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _latest(*values):
+    values = [value for value in values if value]
+    return max(values) if values else None
+
+
+def restaurant_detail_state(request, restaurant_id):
+    restaurant = Restaurant.objects.filter(pk=restaurant_id).values('updated_at', 'menu__updated_at').first()
+    if restaurant is None:
+        return None
+    reviews = _stamp(Review.objects.filter(menu_item__menu__restaurant_id=restaurant_id), 'created_at')
+    happy_hours = _stamp(HappyHour.objects.filter(restaurant_id=restaurant_id), 'created_at')
+    similar = _stamp(SimilarRestaurant.objects.filter(restaurant_id=restaurant_id), 'computed_at')
+    saved_as = []
+    if request.user.is_authenticated:
+        saved_as = sorted(RestaurantList.objects.filter(
+            user=request.user, restaurant_id=restaurant_id
+        ).values_list('list_type', flat=True))
+    parts = (restaurant['updated_at'], restaurant['menu__updated_at'], reviews, happy_hours, similar, saved_as)
+    return parts, _latest(
+        restaurant['updated_at'], restaurant['menu__updated_at'], reviews[1], happy_hours[1], similar[1],
+    )
+
+
+def view_menu_state(request, restaurant_id):
+    restaurant = Restaurant.objects.filter(pk=restaurant_id).values('updated_at', 'menu__updated_at').first()
+    if restaurant is None or restaurant['menu__updated_at'] is None:
+        # 404 or redirect to add_menu; nothing worth validating
+        return None
+    # Added and edited items move the newest updated_at, deleted ones the count
+    items = _stamp(MenuItem.objects.filter(menu__restaurant_id=restaurant_id), 'updated_at')
+    # The page shows review counts, rating stats and whether photos exist;
+    # reviews, likes and photos themselves come from menu_item_reviews
+    reviews = _stamp(Review.objects.filter(menu_item__menu__restaurant_id=restaurant_id), 'created_at')
+    happy_hours = _stamp(HappyHour.objects.filter(restaurant_id=restaurant_id), 'created_at')
+    parts = (restaurant['updated_at'], restaurant['menu__updated_at'], items, reviews, happy_hours)
+    return parts, _latest(
+        restaurant['updated_at'], restaurant['menu__updated_at'], items[1], reviews[1], happy_hours[1],
+    )
+
+
+def menu_item_reviews_state(request, menu_item_id):
+    if not MenuItem.objects.filter(pk=menu_item_id).exists():
+        # Missing or hidden with its restaurant: let the view 404
+        return None
+    reviews = Review.objects.filter(menu_item_id=menu_item_id).aggregate(
+        count=Count('pk'),
+        latest=Max('created_at'),
+        # Photo variants are filled in after the review is saved
+        processed=Count('pk', filter=~Q(image_variants={})),
+    )
+    likes = _stamp(ReviewLike.objects.filter(review__menu_item_id=menu_item_id), 'created_at')
+    # Which reviews the viewer liked is covered by the like stamp: their own
+    # like or unlike changes the count or the newest like time
+    parts = (
+        request.GET.get('page'), request.GET.get('photos'),
+        reviews['count'], reviews['latest'], reviews['processed'], likes,
+    )
+    return parts, _latest(reviews['latest'], likes[1])
+
+
+def view_list_state(request, list_id):
+    custom_list = CustomList.objects.filter(pk=list_id).values('updated_at').first()
+    if custom_list is None:
+        return None
+    # Hiding a listed restaurant changes the count
+    items = _stamp(CustomListItem.objects.filter(custom_list_id=list_id).exclude(
+        restaurant__deleted_at__isnull=False,
+    ).exclude(menu_item__menu__restaurant__deleted_at__isnull=False), 'added_at')
+    # Ratings shown for listed dishes and for every dish at listed restaurants
+    reviews = _stamp(
+        Review.objects.filter(menu_item__customlistitem__custom_list_id=list_id)
+        | Review.objects.filter(menu_item__menu__restaurant__customlistitem__custom_list_id=list_id),
+        'created_at',
+    )
+    parts = (custom_list['updated_at'], items, reviews)
+    return parts, _latest(custom_list['updated_at'], items[1], reviews[1])
+
+
+def user_lists_state(request):
+    lists = _stamp(CustomList.objects.filter(user=request.user), 'updated_at')
+    items = _stamp(CustomListItem.objects.filter(custom_list__user=request.user), 'added_at')
+    return (request.GET.get('type'), lists, items), _latest(lists[1], items[1])
@@ -0,0 +1,234 @@
+"""
+Denormalized counters.
+
+Profile pages and user search read follower/following counts from columns
+instead of counting Follow rows, and feeds read like and comment counts
+from Review and Post. The functions here change the rows and the counters
+together with relative F() updates, so two requests racing on the same
+profile or post cannot overwrite each other; callers run them inside their
+request's transaction (views are wrapped in ``retry_on_lock``) so the row
+and its counts commit or roll back as one.
+
+Each like and comment also counts towards the Affinity of its author to
+the person engaging, which the ranked feed reads.
+
+Likes are set rather than toggled: liking twice, or unliking something not
+liked, changes nothing, so a double click or a retried request cannot push
+a count off by one.
+
+Rows removed without going through here (a deleted account cascading its
+follows and likes, bulk admin edits) leave the counters stale until
+``reconcile_counters`` recounts them.
+"""
+from collections import Counter
+from typing import Iterable, Tuple
+
+from django.db.models import Count, F, Q
+
+from posts.models import Post, PostComment, PostLike
+
+from .comments import MAX_DEPTH, below, path_ids, segment
+from .models import Affinity, Comment, Follow, Profile, Review, ReviewLike, UserSearchEntry
+
+
+def _adjust_follow_counts(follower_id: int, following_id: int, delta: int) -> None:
+    for user_id, field in ((follower_id, 'following_count'), (following_id, 'followers_count')):
+        if not Profile.objects.filter(user_id=user_id).update(**{field: F(field) + delta}):
+            # Users get a profile lazily; start it from the rows themselves
+            Profile.objects.create(user_id=user_id, **follow_counts(user_id))
+    UserSearchEntry.objects.filter(user_id=following_id).update(follower_count=F('follower_count') + delta)
+
+
+def follow_counts(user_id: int) -> dict:
+    return {
+        'followers_count': Follow.objects.filter(following_id=user_id).count(),
+        'following_count': Follow.objects.filter(follower_id=user_id).count(),
+    }
+
+
+def add_follow(follower, following) -> bool:
+    """Make ``follower`` follow ``following``; False if they already did."""
+    _, created = Follow.objects.get_or_create(follower=follower, following=following)
+    if created:
+        _adjust_follow_counts(follower.pk, following.pk, 1)
+    return created
+
+
+def remove_follow(follower, following) -> bool:
+    """Make ``follower`` stop following ``following``; False if they were not."""
+    deleted = Follow.objects.filter(follower=follower, following=following).delete()[0]
+    if deleted:
+        _adjust_follow_counts(follower.pk, following.pk, -1)
+    return bool(deleted)
+
+
+def reconcile_follow_counts() -> int:
+    """Recount every profile's follow counters from the Follow table; returns the number fixed."""
+    followers = dict(
+        Follow.objects.values('following_id').annotate(count=Count('pk')).order_by()
+        .values_list('following_id', 'count')
+    )
+    following = dict(
+        Follow.objects.values('follower_id').annotate(count=Count('pk')).order_by()
+        .values_list('follower_id', 'count')
+    )
+    missing = (set(followers) | set(following)) - set(Profile.objects.values_list('user_id', flat=True))
+    Profile.objects.bulk_create([
+        Profile(user_id=user_id, followers_count=followers.get(user_id, 0), following_count=following.get(user_id, 0))
+        for user_id in missing
+    ])
+
+    fixed = []
+    for profile in Profile.objects.only('pk', 'user_id', 'followers_count', 'following_count').iterator():
+        counts = (followers.get(profile.user_id, 0), following.get(profile.user_id, 0))
+        if (profile.followers_count, profile.following_count) != counts:
+            profile.followers_count, profile.following_count = counts
+            fixed.append(profile)
+    Profile.objects.bulk_update(fixed, ['followers_count', 'following_count'], batch_size=500)
+
+    entries = []
+    for entry in UserSearchEntry.objects.only('pk', 'follower_count').iterator():
+        count = followers.get(entry.pk, 0)
+        if entry.follower_count != count:
+            entry.follower_count = count
+            entries.append(entry)
+    UserSearchEntry.objects.bulk_update(entries, ['follower_count'], batch_size=500)
+    return len(missing) + len(fixed) + len(entries)
+
+
+def _adjust(target, field: str, delta: int) -> None:
+    # The base manager also reaches soft-deleted rows awaiting purge
+    type(target)._base_manager.filter(pk=target.pk).update(**{field: F(field) + delta})
+    target.refresh_from_db(fields=[field])
+
+
+def _adjust_affinity(user_id: int, author_id, field: str, delta: int) -> None:
+    if author_id is None or author_id == user_id:
+        return
+    if not Affinity.objects.filter(user_id=user_id, author_id=author_id).update(**{field: F(field) + delta}) and delta > 0:
+        Affinity.objects.create(user_id=user_id, author_id=author_id, **{field: delta})
+
+
+def uncount_affinities(pairs: Iterable[Tuple[int, int]], field: str) -> None:
+    """Take back the affinity of (user, author) pairs whose likes or comments were deleted in bulk."""
+    for (user_id, author_id), count in Counter(pairs).items():
+        _adjust_affinity(user_id, author_id, field, -count)
+
+
+def add_like(target, user) -> bool:
+    """Make ``user`` like a Review or Post; False if they already did."""
+    _, created = target.likes.get_or_create(user=user)
+    if created:
+        _adjust(target, 'like_count', 1)
+        _adjust_affinity(user.pk, target.user_id, 'likes', 1)
+    return created
+
+
+def remove_like(target, user) -> bool:
+    """Make ``user`` stop liking a Review or Post; False if they did not."""
+    deleted = target.likes.filter(user=user).delete()[0]
+    if deleted:
+        _adjust(target, 'like_count', -1)
+        _adjust_affinity(user.pk, target.user_id, 'likes', -1)
+    return bool(deleted)
+
+
+def comment_on(target, user, text: str, parent=None):
+    """Add a comment (or, with ``parent``, a reply) to a Review or Post and return it."""
+    if parent is not None and parent.depth >= MAX_DEPTH:
+        # Too deep to indent further: reply alongside instead
+        parent = target.comments.get(pk=path_ids(parent.path)[MAX_DEPTH - 1])
+    comment = target.comments.create(
+        user=user, text=text, parent=parent, depth=parent.depth + 1 if parent else 0,
+    )
+    comment.path = (parent.path if parent else '') + segment(comment.pk)
+    comment.save(update_fields=['path'])
+    _adjust(target, 'comment_count', 1)
+    _adjust_affinity(user.pk, target.user_id, 'comments', 1)
+    if parent is not None:
+        target.comments.filter(pk__in=path_ids(parent.path)).update(reply_count=F('reply_count') + 1)
+    return comment
+
+
+def remove_comment(target, comment) -> int:
+    """Delete a comment on a Review or Post with all its replies; returns how many went."""
+    thread = target.comments.filter(Q(pk=comment.pk) | below(comment.path))
+    authors = list(thread.values('user_id').annotate(count=Count('pk')).order_by().values_list('user_id', 'count'))
+    deleted = thread.delete()[1].get(type(comment)._meta.label, 0)
+    if deleted:
+        _adjust(target, 'comment_count', -deleted)
+        for user_id, count in authors:
+            _adjust_affinity(user_id, target.user_id, 'comments', -count)
+        target.comments.filter(pk__in=path_ids(comment.path)[:-1]).update(reply_count=F('reply_count') - deleted)
+    return deleted
+
+
+# (model, like model, comment model, their foreign key to the model)
+ENGAGEMENT = [
+    (Review, ReviewLike, Comment, 'review_id'),
+    (Post, PostLike, PostComment, 'post_id'),
+]
+
+
+def reconcile_engagement_counts() -> int:
+    """Recount every review's and post's like and comment counters and every comment's reply count; returns the number fixed."""
+    fixed = 0
+    for model, like_model, comment_model, key in ENGAGEMENT:
+        def counts(related):
+            return dict(related.objects.values(key).annotate(count=Count('pk')).order_by().values_list(key, 'count'))
+
+        likes, comments = counts(like_model), counts(comment_model)
+        stale = []
+        for row in model.objects.only('pk', 'like_count', 'comment_count').iterator():
+            actual = (likes.get(row.pk, 0), comments.get(row.pk, 0))
+            if (row.like_count, row.comment_count) != actual:
+                row.like_count, row.comment_count = actual
+                stale.append(row)
+        model.objects.bulk_update(stale, ['like_count', 'comment_count'], batch_size=500)
+        fixed += len(stale)
+
+        # Each comment counts once towards every comment above it
+        replies = Counter(
+            ancestor
+            for path in comment_model.objects.values_list('path', flat=True).iterator()
+            for ancestor in path_ids(path)[:-1]
+        )
+        stale = []
+        for comment in comment_model.objects.only('pk', 'reply_count').iterator():
+            if comment.reply_count != replies.get(comment.pk, 0):
+                comment.reply_count = replies.get(comment.pk, 0)
+                stale.append(comment)
+        comment_model.objects.bulk_update(stale, ['reply_count'], batch_size=500)
+        fixed += len(stale)
+    return fixed
+
+
+def reconcile_affinities() -> int:
+    """Recount every Affinity from the like and comment rows; returns the number of rows fixed, added or removed."""
+    actual = Counter()
+    for model, like_model, comment_model, key in ENGAGEMENT:
+        author = key.replace('_id', '__user_id')
+        for field, related in (('likes', like_model), ('comments', comment_model)):
+            for user_id, author_id, count in related.objects.filter(**{f'{author}__isnull': False}).exclude(
+                user_id=F(author),
+            ).values('user_id', author).annotate(count=Count('pk')).order_by().values_list('user_id', author, 'count'):
+                actual[(user_id, author_id, field)] += count
+
+    fixed, stale = [], []
+    for affinity in Affinity.objects.iterator():
+        pair = (affinity.user_id, affinity.author_id)
+        counts = (actual.pop(pair + ('likes',), 0), actual.pop(pair + ('comments',), 0))
+        if not any(counts):
+            stale.append(affinity.pk)
+        elif (affinity.likes, affinity.comments) != counts:
+            affinity.likes, affinity.comments = counts
+            fixed.append(affinity)
+    Affinity.objects.bulk_update(fixed, ['likes', 'comments'], batch_size=500)
+    Affinity.objects.filter(pk__in=stale).delete()
+
+    missing = {}
+    for (user_id, author_id, field), count in actual.items():
+        missing.setdefault((user_id, author_id), Affinity(user_id=user_id, author_id=author_id))
+        setattr(missing[(user_id, author_id)], field, count)
+    Affinity.objects.bulk_create(missing.values(), batch_size=500)
+    return len(fixed) + len(stale) + len(missing)
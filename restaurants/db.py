@@ -0,0 +1,66 @@
+"""
+Helpers for writing to SQLite under concurrency.
+
+SQLite allows one writer at a time. With WAL and ``transaction_mode``
+IMMEDIATE (see DATABASES in settings) a write transaction takes the lock at
+BEGIN and waits up to the busy timeout for it; ``retry_on_lock`` covers the
+rare case where that wait runs out by retrying the whole view with backoff.
+"""
+import random
+import time
+from functools import wraps
+from typing import Iterator
+
+from django.db import OperationalError, transaction
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def is_lock_error(error: Exception) -> bool:
+    return isinstance(error, OperationalError) and any(message in str(error).lower() for message in LOCK_MESSAGES)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Wait before retrying after failed try number ``attempt`` (from 0): exponential with jitter, capped."""
+    # Jitter keeps retrying writers from waking up in lockstep
+    return min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def backoff_delays(attempts: int, base_delay: float, max_delay: float) -> Iterator[float]:
+    """Sleep times between ``attempts`` tries."""
+    for attempt in range(attempts - 1):
+        yield backoff_delay(attempt, base_delay, max_delay)
+
+
+def retry_on_lock(view=None, *, attempts: int = 4, base_delay: float = 0.05, max_delay: float = 1.0):
+    """
+    Run a write view in one transaction, retrying it when SQLite reports lock
+    contention. The transaction makes the retry safe: a failed attempt leaves
+    nothing behind, so a comment or notification is never written twice.
+
+    Can be used bare (``@retry_on_lock``) or with arguments.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if transaction.get_connection().in_atomic_block:
+                # An outer transaction owns the outcome; retrying inside it
+                # would replay on top of its half-done work
+                with transaction.atomic():
+                    return view(request, *args, **kwargs)
+
+            delays = backoff_delays(attempts, base_delay, max_delay)
+            while True:
+                try:
+                    with transaction.atomic():
+                        return view(request, *args, **kwargs)
+                except OperationalError as e:
+                    delay = next(delays, None)
+                    if delay is None or not is_lock_error(e):
+                        raise
+                    time.sleep(delay)
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
@@ -0,0 +1,207 @@
+"""
+The Explore feed: the most talked-about recent posts from everyone.
+
+Posts from the last ``WINDOW_DAYS`` are scored by engagement decayed with
+age, ``(1 + likes + COMMENT_WEIGHT * comments) / (hours + 2) ** GRAVITY``, using
+the stored counters (a review post's engagement lives on its review). The
+best ``EXPLORE_SIZE`` are cut into pages of ``PAGE_SIZE`` and stored as one
+shared snapshot in the cache, so every viewer reads the same ranking and a
+page costs one cache read and a few primary-key lookups however many people
+use the site.
+
+The snapshot is rebuilt at most once per ``REFRESH_INTERVAL``: the first
+request to find it stale takes a short cache lock and rebuilds it, while
+everyone else keeps serving the previous one. ``refresh_explore`` does the
+same from a scheduler, so requests need never rebuild at all.
+
+Per-viewer state (whether they have liked each card) is not part of the
+snapshot; it is overlaid with one query over both like tables.
+"""
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count, Value
+from django.utils import timezone
+
+from .comments import latest_comments
+from .models import Comment, Review, ReviewLike
+
+SNAPSHOT_KEY = 'explore:snapshot'
+LOCK_KEY = 'explore:lock'
+REFRESH_INTERVAL = 5 * 60
+# The snapshot outlives its refresh interval so readers have something to
+# serve while one request rebuilds it
+SNAPSHOT_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 60
+
+WINDOW_DAYS = 7
+COMMENT_WEIGHT = 2.0
+GRAVITY = 1.5
+EXPLORE_SIZE = 200
+PAGE_SIZE = 20
+
+
+def score(likes: int, comments: int, age_hours: float) -> float:
+    return (1 + likes + COMMENT_WEIGHT * comments) / (age_hours + 2) ** GRAVITY
+
+
+def match_reviews(posts: Iterable) -> Dict[int, int]:
+    """
+    The review behind each review post, as {post pk: review pk}, in one query.
+
+    A review post carries its review's dish, author and rating; like the
+    feed, the oldest review matching all three is the one it shows.
+    """
+    posts = [post for post in posts if post.post_type == 'review' and post.menu_item_id and post.user_id]
+    if not posts:
+        return {}
+    reviews = {}
+    for pk, menu_item_id, user_id, rating in Review.objects.filter(
+        menu_item_id__in={post.menu_item_id for post in posts}, user_id__in={post.user_id for post in posts},
+    ).order_by('-pk').values_list('pk', 'menu_item_id', 'user_id', 'rating'):
+        reviews[(menu_item_id, user_id, rating)] = pk
+    matched = {}
+    for post in posts:
+        review_id = reviews.get((post.menu_item_id, post.user_id, post.rating))
+        if review_id is not None:
+            matched[post.pk] = review_id
+    return matched
+
+
+def top_reviewers(user_ids: Iterable[int]) -> set:
+    """Which of the users Profile.is_top_reviewer would badge, in two queries."""
+    from django.contrib.auth import get_user_model
+
+    user_ids = set(user_ids)
+    counts = sorted(
+        get_user_model().objects.annotate(review_count=Count('review')).filter(review_count__gt=0)
+        .values_list('review_count', flat=True),
+        reverse=True,
+    )
+    if not counts or not user_ids:
+        return set()
+    threshold = counts[min(int(len(counts) * 0.1), len(counts) - 1)]
+    return set(
+        Review.objects.filter(user_id__in=user_ids).values('user_id').annotate(count=Count('pk')).order_by()
+        .filter(count__gte=threshold).values_list('user_id', flat=True)
+    )
+
+
+def build_snapshot() -> Dict:
+    """Score the recent posts and cut the best into pages of [post, review, top reviewer] entries."""
+    from posts.models import Post
+
+    now = timezone.now()
+    posts = list(Post.objects.filter(
+        created_at__gte=now - timedelta(days=WINDOW_DAYS), user__isnull=False,
+    ).only('pk', 'post_type', 'user_id', 'menu_item_id', 'rating', 'created_at', 'like_count', 'comment_count'))
+    review_ids = match_reviews(posts)
+    engagement = {
+        pk: (likes, comments)
+        for pk, likes, comments in Review.objects.filter(pk__in=review_ids.values()).values_list(
+            'pk', 'like_count', 'comment_count',
+        )
+    }
+
+    def post_score(post):
+        review_id = review_ids.get(post.pk)
+        if review_id in engagement:
+            likes, comments = engagement[review_id]
+        else:
+            likes, comments = post.like_count, post.comment_count
+        return score(likes, comments, (now - post.created_at).total_seconds() / 3600)
+
+    ranked = sorted(posts, key=lambda post: (-post_score(post), -post.pk))[:EXPLORE_SIZE]
+    badged = top_reviewers(post.user_id for post in ranked)
+    entries = [[post.pk, review_ids.get(post.pk), post.user_id in badged] for post in ranked]
+    return {
+        'computed_at': time.time(),
+        'pages': [entries[start:start + PAGE_SIZE] for start in range(0, len(entries), PAGE_SIZE)],
+    }
+
+
+def refresh_snapshot() -> Dict:
+    snapshot = build_snapshot()
+    cache.set(SNAPSHOT_KEY, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def current_snapshot() -> Dict:
+    """The shared snapshot, rebuilt by this request only if it is stale and nobody else is on it."""
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is not None and time.time() - snapshot['computed_at'] < REFRESH_INTERVAL:
+        return snapshot
+    if cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        try:
+            return refresh_snapshot()
+        finally:
+            cache.delete(LOCK_KEY)
+    # Someone else is rebuilding: serve the old ranking, or on a cold cache
+    # work one out for this request without storing it
+    return snapshot if snapshot is not None else build_snapshot()
+
+
+def liked_by(viewer, review_ids: List[int], post_ids: List[int]) -> set:
+    """('review', pk) and ('post', pk) pairs the viewer has liked, in one query."""
+    from posts.models import PostLike
+
+    if not viewer.is_authenticated or not (review_ids or post_ids):
+        return set()
+    reviews = ReviewLike.objects.filter(user=viewer, review_id__in=review_ids).annotate(
+        kind=Value('review'),
+    ).values_list('kind', 'review_id')
+    posts = PostLike.objects.filter(user=viewer, post_id__in=post_ids).annotate(
+        kind=Value('post'),
+    ).values_list('kind', 'post_id')
+    return set(reviews.union(posts, all=True))
+
+
+def explore_page(page: int, viewer) -> Tuple[List[Dict], Optional[int]]:
+    """
+    Cards for one page of the Explore feed, shaped like the feed's, and the
+    next page number (None on the last page). Posts deleted since the
+    snapshot was taken are skipped.
+    """
+    from posts.models import Post, PostComment
+
+    pages = current_snapshot()['pages']
+    if not 1 <= page <= len(pages):
+        return [], None
+    entries = pages[page - 1]
+    posts = Post.objects.select_related(
+        'user', 'user__profile', 'menu_item__menu__restaurant', 'custom_list',
+    ).in_bulk([post_id for post_id, _, _ in entries])
+    reviews = Review.objects.in_bulk([review_id for _, review_id, _ in entries if review_id])
+
+    cards = []
+    for post_id, review_id, top_reviewer in entries:
+        post = posts.get(post_id)
+        if post is None:
+            continue
+        review = reviews.get(review_id)
+        counted = review or post
+        cards.append({
+            'post': post,
+            'review': review,
+            'like_count': counted.like_count,
+            'comment_count': counted.comment_count,
+            'is_top_reviewer': top_reviewer,
+        })
+
+    liked = liked_by(
+        viewer,
+        [card['review'].pk for card in cards if card['review']],
+        [card['post'].pk for card in cards if not card['review']],
+    )
+    review_comments = latest_comments(Comment, 'review', [card['review'].pk for card in cards if card['review']])
+    post_comments = latest_comments(PostComment, 'post', [card['post'].pk for card in cards if not card['review']])
+    for card in cards:
+        if card['review']:
+            card['user_has_liked'] = ('review', card['review'].pk) in liked
+            card['comments'], card['earlier_comments'] = review_comments.get(card['review'].pk, ([], None))
+        else:
+            card['user_has_liked'] = ('post', card['post'].pk) in liked
+            card['comments'], card['earlier_comments'] = post_comments.get(card['post'].pk, ([], None))
+    return cards, page + 1 if page < len(pages) else None
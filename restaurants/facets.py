@@ -0,0 +1,145 @@
+"""
+Faceted restaurant search.
+
+Every restaurant has a RestaurantFacet row holding the attributes search
+filters and counts on: cuisine, city (casefolded, so "Ottawa" and "ottawa"
+are one option), rating band and a bitmask of happy hour days. Signal handlers refresh a restaurant's row whenever it, one of
+its reviews or one of its happy hours is written, so counting is a handful
+of GROUP BY queries over one narrow, indexed table instead of joins through
+menus and reviews.
+
+Each facet is counted with every filter applied except its own, so the
+counts say how many results picking that option would give.
+"""
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Avg, Case, Count, F, IntegerField, Min, Q, When
+from django.db.models.lookups import GreaterThan
+
+from .models import HappyHour, Restaurant, RestaurantFacet, Review
+
+# (lower bound, label), highest first; averages are on the 1-10 review scale
+RATING_BANDS = [
+    (8, '8+'),
+    (6, '6 - 8'),
+    (4, '4 - 6'),
+    (1, 'Under 4'),
+]
+
+DAY_BITS = {day: 1 << index for index, (day, _) in enumerate(HappyHour.DAYS_OF_WEEK)}
+
+SEARCH_FIELDS = ['name', 'cuisine_type', 'address_line1', 'address_line2', 'city', 'province', 'postal_code', 'country']
+
+
+def rating_band(avg_rating) -> Optional[int]:
+    if avg_rating is None:
+        return None
+    for lower, _ in RATING_BANDS:
+        if avg_rating >= lower:
+            return lower
+    return RATING_BANDS[-1][0]
+
+
+def city_key(city: str) -> str:
+    return city.strip().casefold()
+
+
+def day_mask(days: Iterable[str]) -> int:
+    mask = 0
+    for day in days:
+        mask |= DAY_BITS.get(day, 0)
+    return mask
+
+
+def refresh_facet(restaurant_id: int) -> None:
+    """Recompute one restaurant's facet row from its current data."""
+    restaurant = Restaurant.objects.filter(pk=restaurant_id).values('cuisine_type', 'city').first()
+    if restaurant is None:
+        # Deleted, or hidden until the purge gets to it
+        RestaurantFacet.objects.filter(restaurant_id=restaurant_id).delete()
+        return
+    stats = Review.objects.filter(menu_item__menu__restaurant_id=restaurant_id).aggregate(
+        avg_rating=Avg('rating'), review_count=Count('pk'),
+    )
+    days = HappyHour.objects.filter(restaurant_id=restaurant_id).values_list('day_of_week', flat=True).distinct()
+    avg_rating = round(stats['avg_rating'], 1) if stats['avg_rating'] is not None else None
+    RestaurantFacet.objects.update_or_create(
+        restaurant_id=restaurant_id,
+        defaults={
+            'cuisine_type': restaurant['cuisine_type'],
+            'city': restaurant['city'],
+            'city_key': city_key(restaurant['city']),
+            'avg_rating': avg_rating,
+            'rating_band': rating_band(avg_rating),
+            'review_count': stats['review_count'],
+            'happy_hour_days': day_mask(days),
+        },
+    )
+
+
+def search_q(query: str, prefix: str = '') -> Q:
+    """Free-text match on the restaurant's name, cuisine and address fields."""
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{prefix}{field}__icontains': query})
+    return condition
+
+
+def _filtered(filters: Dict, skip: Optional[str] = None):
+    facets = RestaurantFacet.objects.all()
+    if filters.get('query'):
+        facets = facets.filter(search_q(filters['query'], prefix='restaurant__'))
+    if filters.get('cuisine_types') and skip != 'cuisine':
+        facets = facets.filter(cuisine_type__in=filters['cuisine_types'])
+    if filters.get('location') and skip != 'city':
+        facets = facets.filter(city_key=city_key(filters['location']))
+    if filters.get('rating') is not None and skip != 'rating':
+        facets = facets.filter(rating_band=filters['rating'])
+    if filters.get('happy_hour_mode'):
+        facets = facets.filter(happy_hour_days__gt=0)
+        if filters.get('days') and skip != 'day':
+            facets = facets.alias(
+                matching_days=F('happy_hour_days').bitand(day_mask(filters['days']))
+            ).filter(matching_days__gt=0)
+        if filters.get('time'):
+            facets = facets.filter(restaurant_id__in=HappyHour.objects.filter(
+                start_time__lte=filters['time'], end_time__gte=filters['time'],
+            ).values('restaurant_id'))
+    return facets
+
+
+def search_restaurants(**filters):
+    """
+    Restaurants matching the search filters: ``query``, ``cuisine_types``,
+    ``location``, ``rating`` (a band's lower bound), ``happy_hour_mode``,
+    ``days`` and ``time``.
+    """
+    return Restaurant.objects.filter(pk__in=_filtered(filters).values('restaurant_id'))
+
+
+def _grouped(facets, field) -> Dict:
+    rows = facets.values(field).annotate(count=Count('pk')).order_by()
+    return {row[field]: row['count'] for row in rows}
+
+
+def _city_rows(facets):
+    # Spellings of one city count together, under one of them
+    return facets.values('city_key').annotate(spelling=Min('city'), count=Count('pk')).order_by()
+
+
+def _city_counts(facets) -> Dict:
+    return {row['spelling']: row['count'] for row in _city_rows(facets)}
+
+
+def facet_counts(**filters) -> Dict[str, Dict]:
+    """Per-option result counts for cuisine, city, rating band and happy hour day."""
+    days = _filtered(filters, skip='day').aggregate(**{
+        day: Count(Case(When(GreaterThan(F('happy_hour_days').bitand(bit), 0), then=1), output_field=IntegerField()))
+        for day, bit in DAY_BITS.items()
+    })
+    return {
+        'cuisine': _grouped(_filtered(filters, skip='cuisine'), 'cuisine_type'),
+        'city': _city_counts(_filtered(filters, skip='city')),
+        'rating': _grouped(_filtered(filters, skip='rating'), 'rating_band'),
+        'day': days,
+    }
@@ -0,0 +1,205 @@
+"""
+Registry of the queries that run on nearly every page view.
+
+Each entry builds a representative queryset for one access pattern. The
+``explain_hot_queries`` command prints their query plans, and the test suite
+fails if any of them falls back to a full table scan, so a dropped index or
+a rewritten filter shows up before it reaches production.
+"""
+import re
+from datetime import time, timedelta
+from typing import Callable, Dict, List
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+HOT_QUERIES: Dict[str, Callable[[], QuerySet]] = {}
+
+# "SCAN restaurants_review" reads every row; "SCAN ... USING INDEX" walks an
+# index in order and "SEARCH" seeks into one, both of which are fine
+FULL_SCAN = re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)')
+
+
+def hot_query(name: str):
+    """Register a function returning a representative queryset under ``name``."""
+    def decorator(func):
+        HOT_QUERIES[name] = func
+        return func
+    return decorator
+
+
+def explain(queryset: QuerySet) -> str:
+    return queryset.explain()
+
+
+def full_scans(plan: str) -> List[str]:
+    """Tables the plan reads in full."""
+    return FULL_SCAN.findall(plan)
+
+
+@hot_query('unread notification count')
+def unread_notifications():
+    from .models import Notification
+    # count() drops the model's default ordering
+    return Notification.objects.filter(user_id=1, is_read=False).order_by()
+
+
+@hot_query('notification list')
+def notification_list():
+    from .models import Notification
+    return Notification.objects.filter(user_id=1).order_by('-created_at')[:50]
+
+
+@hot_query('profile posts')
+def profile_posts():
+    from posts.models import Post
+    return Post.objects.filter(user_id=1).order_by('-created_at')
+
+
+@hot_query('dish reviews')
+def dish_reviews():
+    from .models import Review
+    return Review.objects.filter(menu_item_id=1).order_by('-created_at')
+
+
+@hot_query('trending restaurants')
+def trending_restaurants():
+    from .context_processors import get_trending_restaurants
+    return get_trending_restaurants()[:5]
+
+
+@hot_query('restaurant favourites')
+def restaurant_favourites():
+    from .models import RestaurantList
+    return RestaurantList.objects.filter(restaurant_id=1, list_type='favorite')
+
+
+@hot_query('happy hour search')
+def happy_hour_search():
+    from .models import HappyHour
+    return HappyHour.objects.filter(
+        day_of_week__in=['friday', 'saturday'], start_time__lte=time(17), end_time__gte=time(17),
+    )
+
+
+@hot_query('restaurant search page')
+def restaurant_search_page():
+    from .models import Restaurant
+    return Restaurant.objects.order_by('-created_at')[:10]
+
+
+@hot_query('restaurants in city')
+def restaurants_in_city():
+    from .models import Restaurant
+    return Restaurant.objects.filter(city='Ottawa').order_by('-created_at')
+
+
+@hot_query('city list')
+def city_list():
+    from .models import Restaurant
+    return Restaurant.objects.values_list('city', flat=True).distinct().order_by('city')
+
+
+@hot_query('recent reviews')
+def recent_reviews():
+    from .models import Review
+    return Review.objects.filter(created_at__gte=timezone.now() - timedelta(hours=24))
+
+
+@hot_query('search facet counts')
+def search_facet_counts():
+    from .facets import _city_rows, _filtered
+    return _city_rows(_filtered({'cuisine_types': ['Thai']}, skip='city'))
+
+
+@hot_query('user search by prefix')
+def user_search_prefix():
+    from .user_search import _prefix
+    from .models import UserSearchEntry
+    return UserSearchEntry.objects.filter(_prefix('username', 'jax') | _prefix('display_name', 'jax'))
+
+
+@hot_query('user search by trigram')
+def user_search_trigram():
+    from django.db.models import Count
+    from .user_search import trigrams
+    from .models import UserSearchTrigram
+    return UserSearchTrigram.objects.filter(trigram__in=trigrams('jaxon')).values('entry_id').annotate(
+        shared=Count('pk'),
+    ).order_by('-shared')
+
+
+@hot_query('follow suggestions')
+def follow_suggestions():
+    from .models import FollowSuggestion
+    return FollowSuggestion.objects.filter(user_id=1).exclude(suggested__followers__follower_id=1).order_by('rank')[:5]
+
+
+@hot_query('dish recommendations')
+def dish_recommendations():
+    from .models import DishRecommendation
+    return DishRecommendation.objects.filter(user_id=1).exclude(menu_item__reviews__user_id=1).order_by('rank')[:6]
+
+
+@hot_query('similar restaurants')
+def similar_restaurants():
+    from .similar import similar_restaurants
+    return similar_restaurants(1)
+
+
+@hot_query('menu items with stats')
+def menu_items_with_stats():
+    from .menus import with_stats
+    from .models import MenuItem
+    return with_stats(MenuItem.objects.filter(menu_id=1))
+
+
+@hot_query('menu item review page')
+def menu_item_review_page():
+    from django.contrib.auth import get_user_model
+    from .menus import review_list
+    from .models import MenuItem
+    return review_list(MenuItem(pk=1), get_user_model()(pk=1))[:10]
+
+
+@hot_query('feed comment previews')
+def feed_comment_previews():
+    from .comments import numbered_comments
+    from .models import Comment
+    # Django cannot EXPLAIN preview_queryset's outer query, which filters on
+    # the window and only trims rows; this is the query inside it
+    return numbered_comments(Comment, 'review', [1, 2, 3])
+
+
+@hot_query('comment thread page')
+def comment_thread_page():
+    from .comments import PAGE_SIZE, older_roots
+    from .models import Comment
+    return older_roots(Comment.objects.filter(review_id=1), (timezone.now(), 100))[:PAGE_SIZE + 1]
+
+
+@hot_query('comment subtree')
+def comment_subtree():
+    from .comments import below
+    from .models import Comment
+    return Comment.objects.filter(review_id=1).filter(below('00000001') | below('00000002')).order_by('path')
+
+
+@hot_query('ranked feed candidates')
+def ranked_feed_candidates():
+    from posts.models import Post
+    from .models import Follow
+    following = Follow.objects.filter(follower_id=1).values_list('following', flat=True)
+    return Post.objects.filter(user__in=following).order_by('-created_at')[:300]
+
+
+@hot_query('viewer affinities')
+def viewer_affinities():
+    from .models import Affinity
+    return Affinity.objects.filter(user_id=1, author_id__in=[2, 3, 4])
+
+
+@hot_query('job claim')
+def job_claim():
+    from .models import Job
+    return Job.objects.filter(status='queued', run_at__lte=timezone.now()).order_by('-priority', 'run_at')[:5]
@@ -0,0 +1,140 @@
+"""
+Image processing pipeline for uploaded review photos and profile pictures.
+
+Uploads are stored as-is by the request, then a background job
+(restaurants.tasks) generates fixed-size, EXIF-free variants in WebP and
+JPEG. Templates render the variants through the ``responsive_image``
+template tag.
+"""
+import os
+from typing import Dict, Optional
+
+from django.core.files.storage import default_storage
+
+# name -> (max width, max height, crop to exact size)
+VARIANTS = {
+    'avatar': (128, 128, True),
+    'card': (640, 480, False),
+    'full': (1600, 1600, False),
+}
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def variant_name(name: str, variant: str, fmt: str) -> str:
+    """Storage name for a variant, e.g. review_images/variants/dish-card.webp"""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    ext = 'jpg' if fmt == 'jpeg' else fmt
+    return os.path.join(directory, 'variants', f"{stem}-{variant}.{ext}")
+
+
+def _existing_variants(name: str, media_root: str) -> Optional[Dict[str, Dict]]:
+    from PIL import Image
+
+    variants = {}
+    for variant in VARIANTS:
+        entry = {}
+        for fmt in FORMATS:
+            target = variant_name(name, variant, fmt)
+            if not os.path.exists(os.path.join(media_root, target)):
+                return None
+            entry[fmt] = target
+        # Opening only parses the header, the pixels are never decoded
+        with Image.open(os.path.join(media_root, entry['jpeg'])) as image:
+            entry['width'], entry['height'] = image.size
+        variants[variant] = entry
+    return variants
+
+
+def generate_variants(source_path: str, name: str, media_root: str) -> Dict[str, Dict]:
+    """
+    Build every variant for one image. Only touches Pillow and the
+    filesystem, so it can run in any process that sees MEDIA_ROOT.
+
+    Args:
+        source_path: Absolute path of the uploaded original
+        name: Storage name of the original (relative to MEDIA_ROOT)
+        media_root: MEDIA_ROOT, used to place the variant files
+
+    Returns:
+        Mapping of variant -> {'width', 'height', 'webp', 'jpeg'} storage names
+    """
+    from PIL import Image, ImageOps
+
+    # Content-addressed uploads share names, so an identical photo that was
+    # already processed only needs its variant sizes read back
+    existing = _existing_variants(name, media_root)
+    if existing:
+        return existing
+
+    with Image.open(source_path) as original:
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    variants = {}
+    for variant, (width, height, crop) in VARIANTS.items():
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+
+        entry = {'width': resized.width, 'height': resized.height}
+        for fmt, options in FORMATS.items():
+            output = resized
+            if fmt == 'jpeg' and output.mode != 'RGB':
+                # JPEG has no alpha channel, flatten onto white
+                background = Image.new('RGB', output.size, (255, 255, 255))
+                background.paste(output, mask=output.getchannel('A'))
+                output = background
+            target = variant_name(name, variant, fmt)
+            target_path = os.path.join(media_root, target)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            # Saving a fresh image never carries the source EXIF/GPS block
+            output.save(target_path, **options)
+            entry[fmt] = target
+        variants[variant] = entry
+    return variants
+
+
+def schedule_variants(instance, field_name: str, variants_field: str) -> None:
+    """
+    Queue variant generation for ``instance.<field_name>``. The upload
+    request returns immediately; until a worker has built the variants,
+    templates fall back to the original file.
+    """
+    from .jobs import enqueue
+    from .tasks import build_image_variants
+
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return
+    enqueue(build_image_variants, instance._meta.label, instance.pk, field_name, variants_field, field_file.name)
+
+
+def variant_url(field_file, variants: Optional[Dict], variant: str, fmt: str = 'jpeg') -> str:
+    """URL of a variant, falling back to the original upload while it is processing."""
+    entry = (variants or {}).get(variant)
+    if entry and entry.get(fmt):
+        return default_storage.url(entry[fmt])
+    return field_file.url if field_file else ''
+
+
+def srcset(variants: Optional[Dict], variant: str, fmt: str) -> str:
+    """srcset listing the requested variant and any larger ones, by pixel width."""
+    names = list(VARIANTS)
+    crop = VARIANTS[variant][2]
+    candidates = []
+    for name in names[names.index(variant):]:
+        entry = (variants or {}).get(name)
+        if VARIANTS[name][2] != crop:
+            # Don't offer a cropped square in place of a full-frame photo
+            continue
+        if entry and entry.get(fmt):
+            candidates.append(f"{default_storage.url(entry[fmt])} {entry['width']}w")
+    return ', '.join(candidates)
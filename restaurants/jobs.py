@@ -0,0 +1,266 @@
+"""
+A job queue in the database, for work that should not hold up a request.
+
+A task is a function decorated with ``@task``; ``enqueue(func, *args,
+**kwargs)`` stores one call of it as a Job row. Arguments are stored as
+JSON, so pass primary keys rather than model instances. The row is written
+in the caller's transaction: a job queued by a view that then fails is
+rolled back with it, and no worker can pick it up before the rows it is
+about have committed.
+
+``manage.py run_jobs`` is the worker; start as many as the machine allows.
+A worker claims the most urgent due job (highest priority, then earliest
+``run_at``) with a conditional UPDATE from 'queued' to 'running'. SQLite has
+a single writer, so of two workers after the same job the second one's
+update matches no row and it moves on to the next candidate.
+
+A task that raises is retried after an exponential backoff until it has had
+``max_attempts``, unless its ``unique_key`` was queued again while it ran,
+in which case that job stands in for the retry. A running job whose
+``timeout`` passes without its worker reporting back is taken to have died
+with the worker and goes back in the queue, so tasks must be safe to run
+twice.
+
+Tasks with ``every`` are periodic: each run queues the next one ``every``
+seconds after it was due, and workers queue the first when they start.
+``unique_key`` allows one queued job per key, which stops periodic tasks
+piling up and collapses repeated requests for the same recomputation.
+
+Each job records how long it waited past its due time and how long it ran;
+``job_stats`` summarises them per task.
+"""
+import logging
+import os
+import socket
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Union
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules, import_string
+
+from .db import backoff_delay, retry_on_lock
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS: Dict[str, Callable] = {}
+
+DEFAULT_TIMEOUT = 5 * 60
+RETRY_BASE_DELAY = 10.0
+RETRY_MAX_DELAY = 60 * 60.0
+# Due jobs looked at per claim, so losing a race to another worker does not
+# send this one back to sleep
+CLAIM_CANDIDATES = 5
+
+
+def task(func=None, *, priority: int = 0, max_attempts: int = 3, timeout: int = DEFAULT_TIMEOUT,
+         every: Optional[int] = None):
+    """
+    Register a function as a background task. ``priority`` orders the queue
+    (higher first); ``timeout`` is how many seconds a run may take before it
+    is presumed lost; ``every`` makes it periodic, in seconds.
+
+    Can be used bare (``@task``) or with arguments.
+    """
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__qualname__}'
+        func.task_options = {'priority': priority, 'max_attempts': max_attempts, 'timeout': timeout, 'every': every}
+        TASKS[func.task_name] = func
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_task(name: str) -> Callable:
+    """The task registered as ``name``, importing its module if need be."""
+    if name not in TASKS:
+        import_string(name)
+    if name not in TASKS:
+        raise LookupError(f'{name} is not a task')
+    return TASKS[name]
+
+
+def discover_tasks() -> None:
+    """Import every installed app's ``tasks`` module, registering its periodic tasks."""
+    autodiscover_modules('tasks')
+
+
+def enqueue(func: Union[Callable, str], *args, priority: Optional[int] = None, delay: float = 0,
+            run_at=None, unique_key: Optional[str] = None, **kwargs) -> Job:
+    """
+    Queue one call of a task, to run ``delay`` seconds from now or at
+    ``run_at``. With a ``unique_key`` that is already queued, returns that
+    job instead of adding another.
+    """
+    func = get_task(func) if isinstance(func, str) else func
+    options = func.task_options
+    job = Job(
+        name=func.task_name, args=list(args), kwargs=kwargs,
+        priority=options['priority'] if priority is None else priority,
+        max_attempts=options['max_attempts'],
+        run_at=run_at or timezone.now() + timedelta(seconds=delay),
+        unique_key=unique_key,
+    )
+    if unique_key is None:
+        job.save()
+        return job
+    while True:
+        try:
+            with transaction.atomic():
+                job.save()
+            return job
+        except IntegrityError:
+            queued = Job.objects.filter(unique_key=unique_key, status='queued').first()
+            if queued is not None:
+                return queued
+            # Claimed in between: this call still needs a run of its own
+
+
+def _timeout(name: str) -> int:
+    return TASKS[name].task_options['timeout'] if name in TASKS else DEFAULT_TIMEOUT
+
+
+@retry_on_lock
+def _claim(worker: str) -> Optional[Job]:
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at')
+    for pk, name in due.values_list('pk', 'name')[:CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(pk=pk, status='queued').update(
+            status='running', worker=worker, attempts=F('attempts') + 1,
+            started_at=now, expires_at=now + timedelta(seconds=_timeout(name)),
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+@retry_on_lock
+def _settle(job: Job, error: Optional[str] = None, duration_ms: Optional[int] = None) -> bool:
+    """
+    Record how an attempt ended: done, back in the queue after a backoff, or
+    failed for good. Returns False if the job is no longer this attempt's,
+    i.e. it was presumed lost and has been handed out again.
+    """
+    now = timezone.now()
+    fields = {
+        'expires_at': None,
+        'duration_ms': duration_ms,
+        'wait_ms': max(0, int((job.started_at - job.run_at).total_seconds() * 1000)),
+    }
+    if error is None:
+        fields.update(status='done', finished_at=now)
+    elif job.attempts < job.max_attempts:
+        delay = backoff_delay(job.attempts - 1, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+        fields.update(status='queued', error=error, run_at=now + timedelta(seconds=delay))
+    else:
+        fields.update(status='failed', error=error, finished_at=now)
+    attempt = Job.objects.filter(pk=job.pk, status='running', worker=job.worker, attempts=job.attempts)
+    try:
+        with transaction.atomic():
+            settled = attempt.update(**fields)
+    except IntegrityError:
+        # Its unique_key was queued again while it ran; that job is the retry
+        del fields['run_at']
+        fields.update(status='failed', finished_at=now, error=f'{error} (retried by the job queued since)')
+        settled = attempt.update(**fields)
+    if not settled:
+        return False
+
+    func = TASKS.get(job.name)
+    every = func.task_options['every'] if func else None
+    if every and fields['status'] != 'queued':
+        enqueue(func, run_at=max(now, job.run_at + timedelta(seconds=every)), unique_key=f'every:{job.name}')
+    return True
+
+
+def execute(job: Job) -> None:
+    """Run one claimed job and record the outcome."""
+    started = time.perf_counter()
+    error = None
+    try:
+        get_task(job.name)(*job.args, **job.kwargs)
+    except Exception as e:
+        logger.exception('Job %s (%s) failed on attempt %s of %s', job.pk, job.name, job.attempts, job.max_attempts)
+        error = f'{type(e).__name__}: {e}'
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    if not _settle(job, error, duration_ms):
+        logger.warning('Job %s (%s) finished after it was presumed lost and handed out again', job.pk, job.name)
+
+
+def run_next(worker: str) -> Optional[Job]:
+    """Claim and run the most urgent due job, if there is one; returns it."""
+    job = _claim(worker)
+    if job is not None:
+        execute(job)
+    return job
+
+
+def reclaim_abandoned() -> int:
+    """Retry (or fail) running jobs whose timeout has passed; returns how many."""
+    reclaimed = 0
+    for job in Job.objects.filter(status='running', expires_at__lt=timezone.now()):
+        reclaimed += _settle(job, f'Abandoned by worker {job.worker}')
+    return reclaimed
+
+
+def schedule_periodic() -> int:
+    """Queue a run of every periodic task that has none queued or running; returns how many."""
+    scheduled = 0
+    for name, func in TASKS.items():
+        if func.task_options['every'] and not Job.objects.filter(name=name, status__in=['queued', 'running']).exists():
+            enqueue(func, unique_key=f'every:{name}')
+            scheduled += 1
+    return scheduled
+
+
+def worker_name() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _percentile(values: List[int], fraction: float) -> Optional[int]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def stats(since) -> List[Dict]:
+    """
+    Per task: jobs finished since ``since`` (done, failed, and how many of
+    them needed retries), their median and 95th percentile run and wait
+    times in ms, and how many are queued or running now.
+    """
+    rows = defaultdict(lambda: {'done': 0, 'failed': 0, 'retried': 0, 'durations': [], 'waits': [], 'pending': 0})
+    for name, status, attempts, duration_ms, wait_ms in Job.objects.filter(finished_at__gte=since).values_list(
+        'name', 'status', 'attempts', 'duration_ms', 'wait_ms',
+    ).iterator():
+        row = rows[name]
+        row[status] += 1
+        row['retried'] += attempts > 1
+        if duration_ms is not None:
+            row['durations'].append(duration_ms)
+        if wait_ms is not None:
+            row['waits'].append(wait_ms)
+    for name in Job.objects.filter(status__in=['queued', 'running']).values_list('name', flat=True):
+        rows[name]['pending'] += 1
+
+    report = []
+    for name, row in sorted(rows.items()):
+        report.append({
+            'task': name,
+            'done': row['done'],
+            'failed': row['failed'],
+            'retried': row['retried'],
+            'pending': row['pending'],
+            'run_p50': _percentile(row['durations'], 0.5),
+            'run_p95': _percentile(row['durations'], 0.95),
+            'wait_p50': _percentile(row['waits'], 0.5),
+            'wait_p95': _percentile(row['waits'], 0.95),
+        })
+    return report
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from restaurants.cache import fragment_stats, reset_fragment_stats
+
+
+class Command(BaseCommand):
+    help = 'Report the hit ratio of the restaurant card fragment cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the counters after reporting')
+
+    def handle(self, *args, **options):
+        stats = fragment_stats()
+        self.stdout.write(f"Backend: {settings.CACHES['default']['BACKEND']}")
+        self.stdout.write(f"Card hits: {stats['hits']}, misses: {stats['misses']}")
+        self.stdout.write(self.style.SUCCESS(f"Hit ratio: {stats['ratio']:.1%}"))
+        if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            self.stdout.write('Local-memory counters are per process; this only sees its own.')
+        if options['reset']:
+            reset_fragment_stats()
+            self.stdout.write('Counters reset.')
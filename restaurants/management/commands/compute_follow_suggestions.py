@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.suggestions import TOP_K, compute_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s "people you may know" follow suggestions (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K, help='Suggestions stored per user')
+
+    def handle(self, *args, **options):
+        rows, seconds = compute_suggestions(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f"Stored {rows} suggestions in {seconds:.1f}s"))
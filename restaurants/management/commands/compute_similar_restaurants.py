@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.similar import TOP_K, compute_similar_restaurants
+
+
+class Command(BaseCommand):
+    help = 'Recompute the "people who saved this also saved" neighbours of every restaurant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K, help='Neighbours stored per restaurant')
+
+    def handle(self, *args, **options):
+        rows, seconds = compute_similar_restaurants(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f"Stored {rows} neighbours in {seconds:.1f}s"))
@@ -0,0 +1,101 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from restaurants.images import generate_variants
+from restaurants.models import MediaBlob, Profile, Review
+from restaurants.storage import ContentAddressedStorage, hash_content
+
+# (model, file field, variants field)
+MEDIA_FIELDS = [
+    (Review, 'image', 'image_variants'),
+    (Profile, 'profile_picture', 'picture_variants'),
+]
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class Command(BaseCommand):
+    help = 'Move existing uploads into content-addressed storage, merging identical files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without changing anything')
+        parser.add_argument('--similar', action='store_true', help='Also list groups of near-duplicate photos')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        if not isinstance(storage, ContentAddressedStorage):
+            self.stderr.write('The default storage is not ContentAddressedStorage; nothing to do.')
+            return
+
+        dry_run = options['dry_run']
+        # Files already named by content are skipped
+        managed_names = set(MediaBlob.objects.values_list('name', flat=True))
+        moved = {}  # legacy name -> content-addressed name
+        digests = set()
+        bytes_before = 0
+        bytes_after = 0
+        rows = 0
+        missing = 0
+
+        for model, field, variants_field in MEDIA_FIELDS:
+            queryset = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            for pk, name in queryset.values_list('pk', field).iterator():
+                if name in managed_names:
+                    continue
+                if name in moved:
+                    # Several rows shared one legacy file; each needs its own reference
+                    if not dry_run:
+                        MediaBlob.objects.filter(name=moved[name]).update(ref_count=F('ref_count') + 1)
+                else:
+                    if not storage.exists(name):
+                        missing += 1
+                        continue
+                    with storage.open(name) as content:
+                        digest, size = hash_content(content)
+                        bytes_before += size
+                        if digest not in digests and not MediaBlob.objects.filter(sha256=digest).exists():
+                            bytes_after += size
+                        digests.add(digest)
+                        moved[name] = name if dry_run else storage.save(name, content)
+                rows += 1
+
+                if not dry_run:
+                    new_name = moved[name]
+                    variants = generate_variants(storage.path(new_name), new_name, str(storage.location))
+                    model.objects.filter(pk=pk).update(**{field: new_name, variants_field: variants})
+
+        if not dry_run:
+            for legacy_name in moved:
+                storage.purge(legacy_name)
+
+        self.stdout.write(f"Rows migrated: {rows}")
+        self.stdout.write(f"Legacy files: {len(moved)}, distinct contents: {len(digests)}")
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Rows pointing at missing files: {missing}"))
+        self.stdout.write(f"Original bytes before: {format_bytes(bytes_before)}, after: {format_bytes(bytes_after)}")
+        verb = 'Would reclaim' if dry_run else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {format_bytes(bytes_before - bytes_after)}"))
+
+        if options['similar']:
+            self.report_similar()
+
+    def report_similar(self):
+        reported = set()
+        for blob in MediaBlob.objects.filter(phash__isnull=False).iterator():
+            if blob.pk in reported:
+                continue
+            matches = blob.similar()
+            if not matches:
+                continue
+            reported.add(blob.pk)
+            reported.update(match.pk for _, match in matches)
+            self.stdout.write(f"{blob.name} ({blob.ref_count} refs) looks like:")
+            for distance, match in matches:
+                self.stdout.write(f"  {match.name} (distance {distance}, {match.ref_count} refs)")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.ranking import WEIGHTS, evaluate
+
+
+class Command(BaseCommand):
+    help = 'Replay past likes and comments to compare the chronological and ranked feed orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Replay the interactions of this many days')
+        for name, weight in WEIGHTS.items():
+            parser.add_argument(f'--{name}', type=float, default=weight, help=f'Weight of {name} in the ranked score')
+
+    def handle(self, *args, **options):
+        results = evaluate(days=options['days'], weights={name: options[name] for name in WEIGHTS})
+        for order, result in results.items():
+            self.stdout.write(
+                f"{order:>13}: {result['interactions']} interactions, MRR {result['mrr']:.3f}, "
+                f"{result['first_page']:.1%} on the first page"
+            )
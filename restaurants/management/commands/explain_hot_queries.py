@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from restaurants.hot_queries import HOT_QUERIES, explain, full_scans
+
+
+class Command(BaseCommand):
+    help = 'Print the query plan of every registered hot query and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true', help='Exit with an error if any query scans a whole table')
+
+    def handle(self, *args, **options):
+        scanning = []
+        for name, build in HOT_QUERIES.items():
+            queryset = build()
+            plan = explain(queryset)
+            scans = full_scans(plan)
+            heading = f"== {name}"
+            if scans:
+                scanning.append(name)
+                heading += self.style.WARNING(f"  [full scan: {', '.join(scans)}]")
+            self.stdout.write(heading)
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(plan)
+            self.stdout.write('')
+
+        if scanning and options['fail_on_scan']:
+            raise CommandError(f"Full table scans in: {', '.join(scanning)}")
+        self.stdout.write(self.style.SUCCESS(f"{len(HOT_QUERIES) - len(scanning)}/{len(HOT_QUERIES)} hot queries use an index"))
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from restaurants.jobs import stats
+
+
+def _ms(value):
+    return '-' if value is None else str(value)
+
+
+class Command(BaseCommand):
+    help = 'Report per-task background job outcomes, run times and queue waits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Look at jobs finished in this many hours')
+
+    def handle(self, *args, **options):
+        rows = stats(timezone.now() - timedelta(hours=options['hours']))
+        if not rows:
+            self.stdout.write('No jobs.')
+            return
+        width = max(len(row['task']) for row in rows)
+        self.stdout.write(
+            f"{'task':<{width}}  {'done':>6} {'failed':>6} {'retried':>7} {'pending':>7}"
+            f"  {'run p50/p95 ms':>16}  {'wait p50/p95 ms':>16}"
+        )
+        for row in rows:
+            line = (
+                f"{row['task']:<{width}}  {row['done']:>6} {row['failed']:>6} {row['retried']:>7} {row['pending']:>7}"
+                f"  {_ms(row['run_p50']) + '/' + _ms(row['run_p95']):>16}"
+                f"  {_ms(row['wait_p50']) + '/' + _ms(row['wait_p95']):>16}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row['failed'] else line)
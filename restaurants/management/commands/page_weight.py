@@ -0,0 +1,57 @@
+import gzip
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+ASSET_PATTERN = re.compile(r'<(?:script[^>]+src|link[^>]+href)="([^"]+)"')
+
+
+def gzipped_size(data):
+    return len(gzip.compress(data, compresslevel=6))
+
+
+class Command(BaseCommand):
+    help = 'Report bytes transferred per page view for the feed and restaurant search pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to render the feed as (defaults to the first user)')
+
+    def handle(self, *args, **options):
+        client = Client(SERVER_NAME='localhost')
+        User = get_user_model()
+        user = User.objects.filter(username=options['user']).first() if options['user'] else User.objects.order_by('pk').first()
+        if user is None:
+            self.stderr.write('No users found; the feed needs a logged-in user.')
+            return
+        client.force_login(user)
+
+        self.stdout.write(f"{'page':<20}{'html':>10}{'html gz':>10}{'assets':>10}{'assets gz':>11}{'first view':>12}{'repeat view':>13}{'inline equiv':>14}")
+        for name in ('feed', 'restaurant_search'):
+            response = client.get(reverse(name), HTTP_ACCEPT_ENCODING='identity')
+            html = response.content
+            assets_raw = 0
+            assets_gz = 0
+            for url in ASSET_PATTERN.findall(html.decode()):
+                if not url.startswith('/' + settings.STATIC_URL.lstrip('/')):
+                    continue
+                path = finders.find(url.split('/' + settings.STATIC_URL.lstrip('/'), 1)[1])
+                if not path:
+                    continue
+                with open(path, 'rb') as f:
+                    data = f.read()
+                assets_raw += len(data)
+                assets_gz += gzipped_size(data)
+
+            html_gz = gzipped_size(html)
+            # Before the bundles, the same CSS/JS was inlined and sent uncompressed on every view
+            inline_equivalent = len(html) + assets_raw
+            self.stdout.write(
+                f"{name:<20}{len(html):>10}{html_gz:>10}{assets_raw:>10}{assets_gz:>11}"
+                f"{html_gz + assets_gz:>12}{html_gz:>13}{inline_equivalent:>14}"
+            )
+        self.stdout.write('Repeat views fetch only the compressed HTML; hashed assets are served from cache.')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.models import PurgeJob
+from restaurants.purge import run_job
+
+
+class Command(BaseCommand):
+    help = 'Run purge jobs for deleted restaurants, posts, lists and accounts that have not finished'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Also take over jobs marked running, e.g. after the server that ran them restarted',
+        )
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'failed'] + (['running'] if options['resume'] else [])
+        for job_id in PurgeJob.objects.filter(status__in=statuses).order_by('created_at').values_list('pk', flat=True):
+            job = run_job(job_id, resume=options['resume'])
+            style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+            self.stdout.write(style(
+                f"{job.model} {job.object_id}: {job.status}, {job.deleted_rows} rows in {job.step}/{job.total_steps} steps"
+                + (f" ({job.error})" if job.error else '')
+            ))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from restaurants.metrics import overrun_counts, query_budget, reset_overruns
+
+
+class Command(BaseCommand):
+    help = 'Report how often each view ran over its query budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the counters after reporting')
+
+    def handle(self, *args, **options):
+        counts = overrun_counts()
+        if not counts:
+            self.stdout.write(self.style.SUCCESS('No view has run over its query budget.'))
+        for name, count in sorted(counts.items(), key=lambda item: -item[1]):
+            self.stdout.write(f'{name}: {count} overruns of a {query_budget(name)} query budget')
+        if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            self.stdout.write('Local-memory counters are per process; this only sees its own.')
+        if options['reset']:
+            reset_overruns()
+            self.stdout.write('Counters reset.')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.facets import refresh_facet
+from restaurants.models import Restaurant
+
+
+class Command(BaseCommand):
+    help = 'Recompute the search facet row of every restaurant (after bulk edits that skip signals)'
+
+    def handle(self, *args, **options):
+        count = 0
+        for restaurant_id in Restaurant.objects.values_list('pk', flat=True).iterator():
+            refresh_facet(restaurant_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Refreshed facets for {count} restaurants"))
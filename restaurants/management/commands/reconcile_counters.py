@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.counters import reconcile_affinities, reconcile_engagement_counts, reconcile_follow_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount the denormalized follower/following, like, comment and affinity counters from their rows'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_follow_counts() + reconcile_engagement_counts() + reconcile_affinities()
+        self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} counter rows"))
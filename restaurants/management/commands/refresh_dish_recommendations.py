@@ -0,0 +1,19 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from restaurants.recommendations import refresh
+
+
+class Command(BaseCommand):
+    help = 'Train the dish recommender and store every user\'s "dishes you\'ll like"'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Keep the trained model and only re-rank users with new reviews')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Training processes for large catalogs')
+
+    def handle(self, *args, **options):
+        users, rows, seconds = refresh(incremental=options['incremental'], workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(f"Stored {rows} recommendations for {users} users in {seconds:.1f}s"))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from restaurants.explore import refresh_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Re-rank the shared Explore feed now instead of waiting for a request to find it stale'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        snapshot = refresh_snapshot()
+        posts = sum(len(page) for page in snapshot['pages'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Ranked {posts} posts into {len(snapshot['pages'])} pages in {time.perf_counter() - started:.1f}s"
+        ))
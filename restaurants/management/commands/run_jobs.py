@@ -0,0 +1,50 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from restaurants.jobs import discover_tasks, reclaim_abandoned, run_next, schedule_periodic, worker_name
+
+# Seconds between looks for jobs abandoned by dead workers
+RECLAIM_INTERVAL = 30
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs until stopped; start several workers for more throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due now, then exit')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when nothing is due')
+
+    def handle(self, *args, **options):
+        discover_tasks()
+        worker = worker_name()
+        stopping = []
+        # Finish the job in hand, then exit
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+        signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+        scheduled = schedule_periodic()
+        self.stdout.write(f"Worker {worker} started; queued {scheduled} periodic tasks")
+        ran = 0
+        reclaimed_at = 0.0
+        while not stopping:
+            if time.monotonic() - reclaimed_at >= RECLAIM_INTERVAL:
+                reclaimed = reclaim_abandoned()
+                if reclaimed:
+                    self.stdout.write(f"Took back {reclaimed} jobs from lost workers")
+                reclaimed_at = time.monotonic()
+            job = run_next(worker)
+            # As after a request: drop connections past CONN_MAX_AGE or broken
+            close_old_connections()
+            if job is not None:
+                ran += 1
+                if options['verbosity'] > 1:
+                    job.refresh_from_db()
+                    self.stdout.write(f"{job.name} #{job.pk}: {job.status} in {job.duration_ms} ms")
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker} ran {ran} jobs"))
@@ -0,0 +1,131 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from restaurants.db import LOCK_MESSAGES, backoff_delays
+
+SCHEMA = """
+CREATE TABLE review (id INTEGER PRIMARY KEY, user_id INTEGER, rating REAL);
+CREATE TABLE review_like (id INTEGER PRIMARY KEY, review_id INTEGER, user_id INTEGER, created_at REAL,
+                          UNIQUE (review_id, user_id));
+CREATE TABLE notification (id INTEGER PRIMARY KEY, user_id INTEGER, review_id INTEGER, triggered_by INTEGER,
+                           is_read INTEGER, created_at REAL);
+CREATE INDEX notification_user ON notification (user_id, is_read);
+"""
+REVIEWS = 500
+
+
+def _like(connection, begin, worker, n):
+    """One like_review request: check for an existing like, insert it and notify the author."""
+    review_id = (worker * 7919 + n) % REVIEWS + 1
+    user_id = worker * 100000 + n
+    connection.execute(begin)
+    try:
+        connection.execute('SELECT id FROM review_like WHERE review_id = ? AND user_id = ?', (review_id, user_id)).fetchone()
+        author = connection.execute('SELECT user_id FROM review WHERE id = ?', (review_id,)).fetchone()[0]
+        connection.execute('INSERT INTO review_like (review_id, user_id, created_at) VALUES (?, ?, ?)',
+                           (review_id, user_id, time.time()))
+        connection.execute('INSERT INTO notification (user_id, review_id, triggered_by, is_read, created_at) '
+                           'VALUES (?, ?, ?, 0, ?)', (author, review_id, user_id, time.time()))
+        connection.execute('COMMIT')
+    except Exception:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        raise
+
+
+def _is_locked(error):
+    return any(message in str(error).lower() for message in LOCK_MESSAGES)
+
+
+def _run_worker(args):
+    path, profile, worker, requests = args
+    done = failed = retries = 0
+    persistent = None
+    for n in range(requests):
+        if profile['persistent']:
+            if persistent is None:
+                persistent = _connect(path, profile)
+            connection = persistent
+        else:
+            # CONN_MAX_AGE=0: every request opens the database again
+            connection = _connect(path, profile)
+        delays = backoff_delays(4, 0.05, 1.0) if profile['retry'] else iter(())
+        while True:
+            try:
+                _like(connection, profile['begin'], worker, n)
+                done += 1
+                break
+            except sqlite3.OperationalError as e:
+                delay = next(delays, None)
+                if delay is None or not _is_locked(e):
+                    failed += 1
+                    break
+                retries += 1
+                time.sleep(delay)
+        if connection is not persistent:
+            connection.close()
+    if persistent is not None:
+        persistent.close()
+    return done, failed, retries
+
+
+def _connect(path, profile):
+    connection = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None)
+    if profile['pragmas']:
+        connection.executescript(profile['pragmas'])
+    return connection
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent write throughput of the stock SQLite setup against the production profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent writer processes')
+        parser.add_argument('--requests', type=int, default=300, help='Like requests per worker')
+
+    def handle(self, *args, **options):
+        options_ = settings.DATABASES['default'].get('OPTIONS', {})
+        profiles = [
+            # What a bare sqlite3 DATABASES entry gives you: rollback journal,
+            # Python's default 5s timeout, deferred transactions, no reuse
+            ('stock', {'pragmas': '', 'timeout': 5.0, 'begin': 'BEGIN', 'persistent': False, 'retry': False}),
+            ('production', {
+                'pragmas': options_.get('init_command', ''),
+                'timeout': float(options_.get('timeout', 5)),
+                'begin': f"BEGIN {options_.get('transaction_mode', 'DEFERRED')}",
+                'persistent': bool(settings.DATABASES['default'].get('CONN_MAX_AGE')),
+                'retry': True,
+            }),
+        ]
+        workers = options['workers']
+        requests = options['requests']
+        self.stdout.write(f"{workers} workers x {requests} like requests each")
+        self.stdout.write(f"{'profile':<12}{'writes/s':>10}{'ok':>8}{'locked':>8}{'retries':>9}{'seconds':>9}")
+        for name, profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                setup = sqlite3.connect(path)
+                setup.executescript(SCHEMA)
+                setup.executemany('INSERT INTO review (id, user_id, rating) VALUES (?, ?, 7.5)',
+                                  [(i, i % 50) for i in range(1, REVIEWS + 1)])
+                setup.commit()
+                setup.close()
+
+                jobs = [(path, profile, worker, requests) for worker in range(workers)]
+                started = time.perf_counter()
+                with multiprocessing.Pool(workers) as pool:
+                    results = pool.map(_run_worker, jobs)
+                elapsed = time.perf_counter() - started
+
+            done = sum(result[0] for result in results)
+            failed = sum(result[1] for result in results)
+            retries = sum(result[2] for result in results)
+            self.stdout.write(
+                f"{name:<12}{done / elapsed:>10.0f}{done:>8}{failed:>8}{retries:>9}{elapsed:>9.2f}"
+            )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from restaurants.routers import replica_aliases, replicate
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto each local replica in DATABASE_REPLICAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep running, syncing every N seconds (simulates replication lag)')
+
+    def handle(self, *args, **options):
+        replicas = replica_aliases()
+        if not replicas:
+            self.stderr.write('DATABASE_REPLICAS is empty; nothing to sync.')
+            return
+        while True:
+            for alias in replicas:
+                replicate(alias)
+            self.stdout.write(f"Synced {', '.join(replicas)}")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+"""
+Soft deletion.
+
+Restaurants, posts and custom lists are hidden by setting ``deleted_at``
+rather than deleted on the spot; restaurants.purge removes them and their
+dependent rows later, a batch at a time. ``objects`` on those models is a
+``LiveManager``, so every query, related manager and ``get_object_or_404``
+leaves hidden rows out without having to ask. ``all_objects`` still sees
+them, for the purge itself. Menu items, reached by id from many pages,
+hide with their restaurant the same way.
+"""
+from django.db import models
+
+
+class LiveManager(models.Manager):
+    """
+    Rows not marked deleted. Subclasses setting ``through`` (e.g.
+    ``'menu__restaurant'``) keep rows whose related row along that lookup is
+    not marked deleted instead.
+    """
+    # A class attribute rather than an argument: related managers are built
+    # by subclassing the default manager's class
+    through = None
+
+    def get_queryset(self):
+        lookup = f'{self.through}__deleted_at__isnull' if self.through else 'deleted_at__isnull'
+        return super().get_queryset().filter(**{lookup: True})
+
+
+class RestaurantChildManager(LiveManager):
+    """Menu items, hidden with the restaurant whose menu they are on."""
+    through = 'menu__restaurant'
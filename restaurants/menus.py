@@ -0,0 +1,36 @@
+"""
+Querysets behind the menu page and a dish's review panel.
+
+They live here rather than inline in the views so restaurants.hot_queries
+can check the plans of the very queries the pages run.
+"""
+from django.db.models import Avg, Count, Exists, Max, Min, OuterRef, Q, Value
+
+from .models import Review, ReviewLike
+
+# Reviews saved without a photo store an empty name rather than NULL
+WITH_PHOTO = Q(image__isnull=False) & ~Q(image='')
+
+
+def with_stats(menu_items):
+    """Rating stats and the photo flag for every item in one query; the reviews themselves are fetched per item when expanded."""
+    return menu_items.annotate(
+        review_count=Count('reviews'),
+        avg_rating=Avg('reviews__rating'),
+        min_rating=Min('reviews__rating'),
+        max_rating=Max('reviews__rating'),
+        has_photos=Exists(Review.objects.filter(WITH_PHOTO, menu_item=OuterRef('pk'))),
+    ).order_by('pk')
+
+
+def review_list(menu_item, viewer, photos: bool = False):
+    """A dish's reviews (or only those with photos) newest first, with whether ``viewer`` liked each."""
+    reviews = menu_item.reviews.select_related('user').order_by('-created_at', '-pk')
+    if photos:
+        return reviews.filter(WITH_PHOTO)
+    # The viewer's own likes ride along in the page query
+    if viewer.is_authenticated:
+        user_has_liked = Exists(ReviewLike.objects.filter(review=OuterRef('pk'), user=viewer))
+    else:
+        user_has_liked = Value(False)
+    return reviews.annotate(user_has_liked=user_has_liked)
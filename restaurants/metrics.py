@@ -0,0 +1,266 @@
+"""
+Per-request SQL, template and cache instrumentation.
+
+``RequestMetricsMiddleware`` measures every request:
+
+* SQL: the number of queries and the time spent in them, through an
+  execute wrapper on each database connection. Queries are also grouped by
+  fingerprint (the SQL with its parameters left as placeholders and IN
+  lists collapsed), so one statement run once per row of a loop, the usual
+  N+1, shows up as a single fingerprint with a high count.
+* Templates: time spent rendering, through the ``TimedDjangoTemplates``
+  backend. It includes queries run lazily from templates.
+* Cache: hits and misses of ``get``/``get_many`` on the default cache,
+  through the ``Counting*Cache`` backends.
+
+The figures go out as a ``Server-Timing`` header, which browser dev tools
+show next to the request, and as one JSON log line per request on the
+``restaurants.metrics`` logger.
+
+``QUERY_BUDGETS`` in settings caps the queries of a view, by URL name
+(``DEFAULT_QUERY_BUDGET`` for the rest). A request over budget logs a
+warning; with DEBUG on it carries the stack of the first query past the
+budget. In production the warning is one line, and an overrun counter per
+view is incremented in the cache for ``query_budgets`` to report.
+"""
+import contextvars
+import json
+import logging
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+# Repeated fingerprints named in the log line
+REPORTED_REPEATS = 5
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def fingerprint(sql: str) -> str:
+    return IN_LIST.sub('IN (...)', sql)
+
+
+class RequestMetrics:
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.fingerprints = Counter()
+        self.over_budget_stack = None
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_depth = 0
+
+    def record_query(self, sql: str, seconds: float) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        self.fingerprints[fingerprint(sql)] += 1
+        if self.budget is not None and self.queries == self.budget + 1 and settings.DEBUG:
+            self.over_budget_stack = _project_stack()
+
+    def repeated(self) -> Dict[str, int]:
+        """Fingerprints run more than once, most repeated first."""
+        return {sql: count for sql, count in self.fingerprints.most_common() if count > 1}
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def _project_stack() -> str:
+    """The current stack, keeping only this project's frames."""
+    root = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(root) and 'site-packages' not in frame.filename and frame.filename != __file__
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+def _time_query(execute, sql, params, many, context):
+    metrics = current()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.record_query(sql, time.perf_counter() - started)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return super().render(context, request)
+        # Templates rendered from inside another (e.g. by a template tag)
+        # are part of the outer one's time
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders for RequestMetricsMiddleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+_MISSING = object()
+
+
+class CountingCacheMixin:
+    """Counts the current request's hits and misses on ``get`` and ``get_many``."""
+
+    def _count(self, hits: int, misses: int) -> None:
+        metrics = current()
+        if metrics is not None and not metrics.cache_depth:
+            metrics.cache_hits += hits
+            metrics.cache_misses += misses
+
+    def get(self, key, default=None, version=None):
+        metrics = current()
+        if metrics is None:
+            return super().get(key, default, version)
+        # Some backends implement get() with get_many(); count the call once
+        metrics.cache_depth += 1
+        try:
+            value = super().get(key, _MISSING, version)
+        finally:
+            metrics.cache_depth -= 1
+        self._count(value is not _MISSING, value is _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        self._count(len(found), len(keys) - len(found))
+        return found
+
+
+class CountingLocMemCache(CountingCacheMixin, LocMemCache):
+    pass
+
+
+class CountingFileBasedCache(CountingCacheMixin, FileBasedCache):
+    pass
+
+
+class CountingDatabaseCache(CountingCacheMixin, DatabaseCache):
+    pass
+
+
+def overrun_key(view_name: str) -> str:
+    return f'query_budget:{view_name}:overruns'
+
+
+def _incr(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def overrun_counts() -> Dict[str, int]:
+    """Budget overruns counted per URL name, for the views that have any."""
+    names = [name for name in get_resolver().reverse_dict if isinstance(name, str)]
+    counts = cache.get_many([overrun_key(name) for name in names])
+    return {name: counts[overrun_key(name)] for name in names if overrun_key(name) in counts}
+
+
+def reset_overruns() -> None:
+    cache.delete_many([overrun_key(name) for name in get_resolver().reverse_dict if isinstance(name, str)])
+
+
+def query_budget(view_name: Optional[str]) -> Optional[int]:
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view_name, getattr(settings, 'DEFAULT_QUERY_BUDGET', None))
+
+
+def server_timing(metrics: RequestMetrics, total_seconds: float) -> str:
+    repeated = sum(count - 1 for count in metrics.repeated().values())
+    return ', '.join([
+        f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} queries, {repeated} repeated"',
+        f'tpl;dur={metrics.template_seconds * 1000:.1f};desc="templates"',
+        f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"',
+        f'total;dur={total_seconds * 1000:.1f}',
+    ])
+
+
+class RequestMetricsMiddleware:
+    """Measure each request; see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_time_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_seconds = time.perf_counter() - started
+
+        response.headers['Server-Timing'] = server_timing(metrics, total_seconds)
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        repeated = metrics.repeated()
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'total_ms': round(total_seconds * 1000, 1),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_seconds * 1000, 1),
+            'repeated': dict(list(repeated.items())[:REPORTED_REPEATS]),
+            'template_ms': round(metrics.template_seconds * 1000, 1),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }))
+        if metrics.budget is not None and metrics.queries > metrics.budget:
+            self.over_budget(request, view_name, metrics, repeated)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current().budget = query_budget(request.resolver_match.view_name)
+
+    def over_budget(self, request, view_name, metrics, repeated):
+        if settings.DEBUG:
+            top = '\n'.join(f'  {count}x {sql}' for sql, count in list(repeated.items())[:REPORTED_REPEATS])
+            logger.warning(
+                '%s ran %s queries, over its budget of %s\nRepeated:\n%s\nFirst query over budget:\n%s',
+                request.path, metrics.queries, metrics.budget, top or '  none', metrics.over_budget_stack,
+            )
+        else:
+            logger.warning('%s ran %s queries, over its budget of %s', request.path, metrics.queries, metrics.budget)
+            _incr(overrun_key(view_name))
@@ -0,0 +1,86 @@
+import mimetypes
+import os
+from typing import Dict
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import FileResponse
+from django.utils._os import safe_join
+
+FAR_FUTURE = 'public, max-age=31536000, immutable'
+SHORT_LIVED = 'public, max-age=300'
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Content-codings of an Accept-Encoding header with their q-values."""
+    accepted = {}
+    for part in header.split(','):
+        coding, *params = (piece.strip() for piece in part.split(';'))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return accepted
+
+
+class StaticAssetMiddleware:
+    """
+    Serve collected static files (STATIC_ROOT) directly.
+
+    Manifest-hashed names never change content, so they get a one-year
+    immutable Cache-Control, and when the client accepts it the precompressed
+    .br/.gz sibling written by collectstatic is sent instead of the original.
+    Other names are served as they are with a short max-age. Requests for
+    files that haven't been collected fall through, so development serving
+    keeps working.
+
+    It sits ahead of GZipMiddleware: what it serves is either precompressed
+    or not worth compressing (images, fonts).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = getattr(settings, 'STATIC_ROOT', None)
+        self.hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if self.root and request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        content_type, _ = mimetypes.guess_type(path)
+        hashed = name in self.hashed_names
+        encoding = None
+        if hashed:
+            accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+            for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if accepted.get(candidate, accepted.get('*', 0)) > 0 and os.path.isfile(path + suffix):
+                    path += suffix
+                    encoding = candidate
+                    break
+
+        response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if hashed:
+            response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = FAR_FUTURE if hashed else SHORT_LIVED
+        return response
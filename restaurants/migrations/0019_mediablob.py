@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0018_profile_picture_variants_review_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.IntegerField(default=0)),
+                ('phash', models.BigIntegerField(blank=True, null=True)),
+                ('phash_band_0', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_band_1', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_band_2', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('phash_band_3', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
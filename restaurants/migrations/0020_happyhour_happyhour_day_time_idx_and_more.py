@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-19 14:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_post_user_created_idx'),
+        ('restaurants', '0019_mediablob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='happyhour',
+            index=models.Index(fields=['day_of_week', 'start_time', 'end_time'], name='happyhour_day_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['city'], name='restaurant_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['-created_at'], name='restaurant_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantlist',
+            index=models.Index(fields=['restaurant', 'list_type'], name='restaurantlist_restaurant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['menu_item', '-created_at'], name='review_item_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at'], name='review_created_idx'),
+        ),
+    ]
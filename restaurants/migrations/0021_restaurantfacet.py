@@ -0,0 +1,67 @@
+# Generated by Django 6.0 on 2026-10-19 14:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+RATING_BANDS = [8, 6, 4, 1]
+
+
+def backfill_facets(apps, schema_editor):
+    # Search reads from the facet table, so every existing restaurant needs a row
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    Review = apps.get_model('restaurants', 'Review')
+    HappyHour = apps.get_model('restaurants', 'HappyHour')
+    RestaurantFacet = apps.get_model('restaurants', 'RestaurantFacet')
+
+    stats = {
+        row['menu_item__menu__restaurant_id']: row
+        for row in Review.objects.values('menu_item__menu__restaurant_id').annotate(
+            avg_rating=models.Avg('rating'), review_count=models.Count('pk'),
+        ).order_by()
+    }
+    days = {}
+    for restaurant_id, day in HappyHour.objects.values_list('restaurant_id', 'day_of_week'):
+        if day in DAYS:
+            days[restaurant_id] = days.get(restaurant_id, 0) | (1 << DAYS.index(day))
+
+    facets = []
+    for restaurant in Restaurant.objects.only('pk', 'cuisine_type', 'city').iterator():
+        row = stats.get(restaurant.pk)
+        avg_rating = round(row['avg_rating'], 1) if row and row['avg_rating'] is not None else None
+        band = None
+        if avg_rating is not None:
+            band = next((lower for lower in RATING_BANDS if avg_rating >= lower), RATING_BANDS[-1])
+        facets.append(RestaurantFacet(
+            restaurant_id=restaurant.pk,
+            cuisine_type=restaurant.cuisine_type,
+            city=restaurant.city,
+            avg_rating=avg_rating,
+            rating_band=band,
+            review_count=row['review_count'] if row else 0,
+            happy_hour_days=days.get(restaurant.pk, 0),
+        ))
+    RestaurantFacet.objects.bulk_create(facets, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0020_happyhour_happyhour_day_time_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantFacet',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='facet', serialize=False, to='restaurants.restaurant')),
+                ('cuisine_type', models.CharField(db_index=True, max_length=100)),
+                ('city', models.CharField(db_index=True, max_length=100)),
+                ('rating_band', models.PositiveSmallIntegerField(blank=True, db_index=True, null=True)),
+                ('avg_rating', models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('happy_hour_days', models.PositiveSmallIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 6.0 on 2026-10-19 14:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def trigrams(text):
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def backfill_search_entries(apps, schema_editor):
+    # User search reads from these tables, so every existing user needs rows
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('restaurants', 'Profile')
+    Follow = apps.get_model('restaurants', 'Follow')
+    UserSearchEntry = apps.get_model('restaurants', 'UserSearchEntry')
+    UserSearchTrigram = apps.get_model('restaurants', 'UserSearchTrigram')
+
+    display_names = dict(Profile.objects.values_list('user_id', 'display_name'))
+    followers = dict(
+        Follow.objects.values('following_id').annotate(count=models.Count('pk')).order_by()
+        .values_list('following_id', 'count')
+    )
+    entries = []
+    grams = []
+    for user_id, username in User.objects.values_list('pk', 'username').iterator():
+        display_name = display_names.get(user_id) or ''
+        entries.append(UserSearchEntry(
+            user_id=user_id,
+            username=normalize(username),
+            display_name=normalize(display_name),
+            follower_count=followers.get(user_id, 0),
+        ))
+        grams.extend(
+            UserSearchTrigram(trigram=gram, entry_id=user_id) for gram in trigrams(f'{username} {display_name}')
+        )
+    UserSearchEntry.objects.bulk_create(entries, batch_size=500)
+    UserSearchTrigram.objects.bulk_create(grams, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('restaurants', '0021_restaurantfacet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(db_index=True, max_length=150)),
+                ('display_name', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('follower_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserSearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='restaurants.usersearchentry')),
+            ],
+            options={
+                'unique_together': {('trigram', 'entry')},
+            },
+        ),
+        migrations.RunPython(backfill_search_entries, migrations.RunPython.noop),
+    ]
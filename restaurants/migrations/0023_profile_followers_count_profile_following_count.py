@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-19 14:16
+
+from django.db import migrations, models
+
+
+def backfill_follow_counts(apps, schema_editor):
+    # Profile pages stop counting Follow rows, so store today's counts and
+    # give every user who follows or is followed a profile to hold them
+    Follow = apps.get_model('restaurants', 'Follow')
+    Profile = apps.get_model('restaurants', 'Profile')
+
+    def counts(field):
+        return dict(
+            Follow.objects.values(field).annotate(count=models.Count('pk')).order_by().values_list(field, 'count')
+        )
+
+    followers = counts('following_id')
+    following = counts('follower_id')
+    existing = set(Profile.objects.values_list('user_id', flat=True))
+    Profile.objects.bulk_create([
+        Profile(user_id=user_id) for user_id in (set(followers) | set(following)) - existing
+    ], batch_size=500)
+    profiles = list(Profile.objects.filter(user_id__in=set(followers) | set(following)))
+    for profile in profiles:
+        profile.followers_count = followers.get(profile.user_id, 0)
+        profile.following_count = following.get(profile.user_id, 0)
+    Profile.objects.bulk_update(profiles, ['followers_count', 'following_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0022_usersearchentry_usersearchtrigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
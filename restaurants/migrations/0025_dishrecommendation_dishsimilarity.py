@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-19 14:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0024_followsuggestion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DishRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('predicted_rating', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.menuitem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dish_recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'rank'], name='dishrec_rank_idx')],
+                'unique_together': {('user', 'menu_item')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DishSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.menuitem')),
+                ('similar_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.menuitem')),
+            ],
+            options={
+                'unique_together': {('menu_item', 'similar_item')},
+            },
+        ),
+    ]
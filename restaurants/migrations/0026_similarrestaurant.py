@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 14:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0025_dishrecommendation_dishsimilarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarRestaurant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('shared_saves', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.restaurant')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['restaurant', 'rank'], name='similarrestaurant_rank_idx')],
+                'unique_together': {('restaurant', 'similar')},
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 6.0 on 2026-10-19 14:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+CUISINES = ['Italian', 'Chinese', 'Indian', 'Mexican', 'Japanese', 'American', 'Thai', 'Other']
+FAVOURITE_WEIGHT = 2.0
+NEUTRAL_RATING = 5.5
+PRICE_LEVELS = [15, 30, 50]
+
+
+def backfill_taste_profiles(apps, schema_editor):
+    # Profile pages read the stored vectors, so build one for everyone with signal
+    RestaurantList = apps.get_model('restaurants', 'RestaurantList')
+    Review = apps.get_model('restaurants', 'Review')
+    TasteProfile = apps.get_model('restaurants', 'TasteProfile')
+
+    def slot(cuisine):
+        return CUISINES.index(cuisine) if cuisine in CUISINES else CUISINES.index('Other')
+
+    stats = {}
+
+    def user_stats(user_id):
+        return stats.setdefault(user_id, ([0] * len(CUISINES), [0] * len(CUISINES), [0.0] * len(CUISINES), [0.0] * len(CUISINES)))
+
+    for row in RestaurantList.objects.filter(list_type='favorite').values('user_id', 'restaurant__cuisine_type').annotate(
+        count=models.Count('pk'),
+    ).order_by():
+        user_stats(row['user_id'])[0][slot(row['restaurant__cuisine_type'])] += row['count']
+    for row in Review.objects.filter(user__isnull=False).values('user_id', 'menu_item__menu__restaurant__cuisine_type').annotate(
+        count=models.Count('pk'), rating_sum=models.Sum('rating'), price_sum=models.Sum('menu_item__price'),
+    ).order_by():
+        favourites, reviews, rating_sums, price_sums = user_stats(row['user_id'])
+        index = slot(row['menu_item__menu__restaurant__cuisine_type'])
+        reviews[index] += row['count']
+        rating_sums[index] += float(row['rating_sum'])
+        price_sums[index] += float(row['price_sum'])
+
+    profiles = []
+    for user_id, (favourites, reviews, rating_sums, price_sums) in stats.items():
+        affinities = [
+            max(0.0, FAVOURITE_WEIGHT * favourite + (rating_sum - NEUTRAL_RATING * count) / (10 - NEUTRAL_RATING))
+            for favourite, count, rating_sum in zip(favourites, reviews, rating_sums)
+        ]
+        norm = sum(value * value for value in affinities) ** 0.5
+        total_reviews = sum(reviews)
+        profiles.append(TasteProfile(
+            user_id=user_id,
+            favourite_counts=favourites,
+            review_counts=reviews,
+            rating_sums=[round(value, 1) for value in rating_sums],
+            price_sums=[round(value, 2) for value in price_sums],
+            vector=[round(value / norm, 4) if norm else 0.0 for value in affinities],
+            price_level=1 + sum(sum(price_sums) / total_reviews > bound for bound in PRICE_LEVELS) if total_reviews else None,
+        ))
+    TasteProfile.objects.bulk_create(profiles, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('restaurants', '0026_similarrestaurant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TasteProfile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='taste_profile', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('favourite_counts', models.JSONField(default=list)),
+                ('review_counts', models.JSONField(default=list)),
+                ('rating_sums', models.JSONField(default=list)),
+                ('price_sums', models.JSONField(default=list)),
+                ('vector', models.JSONField(default=list)),
+                ('price_level', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_taste_profiles, migrations.RunPython.noop),
+    ]
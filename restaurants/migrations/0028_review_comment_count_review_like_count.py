@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 14:28
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_review_counts(apps, schema_editor):
+    # Feeds and review threads stop counting rows, so store today's counts in a single UPDATE
+    Review = apps.get_model('restaurants', 'Review')
+    ReviewLike = apps.get_model('restaurants', 'ReviewLike')
+    Comment = apps.get_model('restaurants', 'Comment')
+
+    def count(related):
+        rows = related.objects.filter(review=models.OuterRef('pk')).order_by().values('review')
+        return Coalesce(
+            models.Subquery(rows.annotate(count=models.Count('pk')).values('count')), 0,
+        )
+
+    Review.objects.update(like_count=count(ReviewLike), comment_count=count(Comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0027_tasteprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_review_counts, migrations.RunPython.noop),
+    ]
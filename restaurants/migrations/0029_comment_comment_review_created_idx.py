@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 14:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0028_review_comment_count_review_like_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['review', 'created_at'], name='comment_review_created_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-19 14:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_affinities(apps, schema_editor):
+    # Count every past like and comment once, grouped by who engaged with whom
+    Affinity = apps.get_model('restaurants', 'Affinity')
+    sources = [
+        (apps.get_model('restaurants', 'ReviewLike'), 'review__user_id', 'likes'),
+        (apps.get_model('restaurants', 'Comment'), 'review__user_id', 'comments'),
+        (apps.get_model('posts', 'PostLike'), 'post__user_id', 'likes'),
+        (apps.get_model('posts', 'PostComment'), 'post__user_id', 'comments'),
+    ]
+    rows = {}
+    for model, author, field in sources:
+        for user_id, author_id, count in model.objects.filter(**{f'{author}__isnull': False}).exclude(
+            user_id=models.F(author),
+        ).values('user_id', author).annotate(count=models.Count('pk')).order_by().values_list('user_id', author, 'count'):
+            row = rows.setdefault((user_id, author_id), Affinity(user_id=user_id, author_id=author_id))
+            setattr(row, field, getattr(row, field) + count)
+    Affinity.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0030_comment_depth_comment_parent_comment_path_and_more'),
+        ('posts', '0010_post_post_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Affinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='affinities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'affinities',
+                'unique_together': {('user', 'author')},
+            },
+        ),
+        migrations.RunPython(backfill_affinities, migrations.RunPython.noop),
+    ]
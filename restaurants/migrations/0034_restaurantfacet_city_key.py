@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+def backfill_city_keys(apps, schema_editor):
+    # The location filter and the city facet match on the casefolded city
+    RestaurantFacet = apps.get_model('restaurants', 'RestaurantFacet')
+    facets = list(RestaurantFacet.objects.only('pk', 'city'))
+    for facet in facets:
+        facet.city_key = facet.city.strip().casefold()
+    RestaurantFacet.objects.bulk_update(facets, ['city_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0033_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurantfacet',
+            name='city_key',
+            field=models.CharField(db_index=True, default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='restaurantfacet',
+            name='city',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.RunPython(backfill_city_keys, migrations.RunPython.noop),
+    ]
@@ -4,10 +4,17 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from .managers import LiveManager, RestaurantChildManager
+
 class Profile(models.Model):
     user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE)
     display_name = models.CharField(max_length=100, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Resized WebP/JPEG renditions, filled in by restaurants.images
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Maintained by restaurants.counters alongside the Follow rows
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.user.username}'s profile"
@@ -81,6 +88,19 @@ class Restaurant(models.Model):
 	updated_at = models.DateTimeField(auto_now=True)
 	created_by = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True, blank=True)
 	normalized_address = models.CharField(max_length=512, unique=True, editable=False)
+	# Set when deleted; restaurants.purge removes the row and its dependents later
+	deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+	objects = LiveManager()
+	all_objects = models.Manager()
+
+	class Meta:
+		indexes = [
+			# Location filter and the distinct city list
+			models.Index(fields=['city'], name='restaurant_city_idx'),
+			# Newest-first search pages
+			models.Index(fields=['-created_at'], name='restaurant_created_idx'),
+		]
 
 	def save(self, *args, **kwargs):
 		# Normalize address for uniqueness
@@ -118,6 +138,10 @@ class HappyHour(models.Model):
 	
 	class Meta:
 		ordering = ['day_of_week', 'start_time']
+		indexes = [
+			# Happy hour search by day and time
+			models.Index(fields=['day_of_week', 'start_time', 'end_time'], name='happyhour_day_time_idx'),
+		]
 	
 	def __str__(self):
 		return f"{self.restaurant.name} - {self.get_day_of_week_display()} {self.start_time.strftime('%I:%M%p')}-{self.end_time.strftime('%I:%M%p')}"
@@ -137,6 +161,12 @@ class MenuItem(models.Model):
 	name = models.CharField(max_length=255)
 	description = models.TextField(blank=True, null=True)
 	price = models.DecimalField(max_digits=6, decimal_places=2)
+	# Part of the menu page's ETag, so an edited item isn't served stale
+	updated_at = models.DateTimeField(auto_now=True)
+
+	# Hidden with their restaurant until the purge removes them
+	objects = RestaurantChildManager()
+	all_objects = models.Manager()
 
 	def get_rating_stats(self):
 		"""Calculate rating statistics for this menu item"""
@@ -165,8 +195,21 @@ class Review(models.Model):
 	rating = models.DecimalField(max_digits=3, decimal_places=1, validators=[MinValueValidator(1.0), MaxValueValidator(10.0)])
 	review_text = models.TextField(blank=True)
 	image = models.ImageField(upload_to='review_images/', blank=True, null=True)
+	# Resized WebP/JPEG renditions, filled in by restaurants.images
+	image_variants = models.JSONField(default=dict, blank=True, editable=False)
 	is_public = models.BooleanField(default=True)
 	created_at = models.DateTimeField(auto_now_add=True)
+	# Kept by restaurants.counters alongside the ReviewLike and Comment rows
+	like_count = models.PositiveIntegerField(default=0, editable=False)
+	comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+	class Meta:
+		indexes = [
+			# Reviews of a dish, newest first
+			models.Index(fields=['menu_item', '-created_at'], name='review_item_created_idx'),
+			# Trending: reviews in the last 24 hours
+			models.Index(fields=['created_at'], name='review_created_idx'),
+		]
 
 	def __str__(self):
 		username = self.user.username if self.user else 'Anonymous'
@@ -197,6 +240,10 @@ class RestaurantList(models.Model):
 
 	class Meta:
 		unique_together = ('user', 'restaurant', 'list_type')  # Prevent duplicates
+		indexes = [
+			# Everyone who favourited a restaurant (new menu item notifications)
+			models.Index(fields=['restaurant', 'list_type'], name='restaurantlist_restaurant_idx'),
+		]
 
 	def __str__(self):
 		return f"{self.user.username}'s {self.list_type}: {self.restaurant.name}"
@@ -207,9 +254,21 @@ class Comment(models.Model):
 	user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
 	text = models.TextField()
 	created_at = models.DateTimeField(auto_now_add=True)
+	# Replies: see restaurants.comments for the path encoding
+	parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+	path = models.CharField(max_length=64, default='', editable=False)
+	depth = models.PositiveSmallIntegerField(default=0, editable=False)
+	# Replies anywhere below this comment, kept by restaurants.counters
+	reply_count = models.PositiveIntegerField(default=0, editable=False)
 
 	class Meta:
 		ordering = ['created_at']
+		indexes = [
+			# A review's top-level comments, paged by (created_at, id)
+			models.Index(fields=['review', 'created_at'], name='comment_review_created_idx'),
+			# A thread or subtree in display order
+			models.Index(fields=['review', 'path'], name='comment_review_path_idx'),
+		]
 
 	def __str__(self):
 		return f"{self.user.username} on {self.review.menu_item.name}"
@@ -226,6 +285,11 @@ class CustomList(models.Model):
 	list_type = models.CharField(max_length=20, choices=LIST_TYPE_CHOICES)
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
+	# Set when deleted; restaurants.purge removes the row and its dependents later
+	deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+	objects = LiveManager()
+	all_objects = models.Manager()
 
 	class Meta:
 		ordering = ['-created_at']
@@ -277,6 +341,10 @@ class Notification(models.Model):
 	
 	class Meta:
 		ordering = ['-created_at']
+		indexes = [
+			# Unread badge count and the newest-first notification list
+			models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_unread_idx'),
+		]
 	
 	def __str__(self):
 		return f"{self.notification_type} for {self.user.username}"
@@ -295,3 +363,274 @@ class Notification(models.Model):
 		elif self.notification_type == 'post_comment' and self.triggered_by:
 			return f"{self.triggered_by.username} commented on your post"
 		return "New notification"
+
+
+class MediaBlob(models.Model):
+	"""A stored upload, shared by every row whose file has the same bytes"""
+	sha256 = models.CharField(max_length=64, unique=True)
+	name = models.CharField(max_length=255, unique=True)
+	size = models.PositiveBigIntegerField()
+	ref_count = models.IntegerField(default=0)
+	# 64-bit dHash, plus its four 16-bit bands for indexed near-duplicate lookups
+	phash = models.BigIntegerField(null=True, blank=True)
+	phash_band_0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+	phash_band_1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+	phash_band_2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+	phash_band_3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	def __str__(self):
+		return f"{self.name} ({self.ref_count} refs)"
+
+	def similar(self, max_distance=None):
+		"""Other stored photos that look like this one, closest first"""
+		from .storage import find_similar, NEAR_DUPLICATE_DISTANCE
+		if self.phash is None:
+			return []
+		matches = find_similar(self.phash, max_distance if max_distance is not None else NEAR_DUPLICATE_DISTANCE)
+		return [(distance, blob) for distance, blob in matches if blob.pk != self.pk]
+
+
+class RestaurantFacet(models.Model):
+	"""Search facets of one restaurant, kept current by restaurants.facets on every write"""
+	restaurant = models.OneToOneField(Restaurant, on_delete=models.CASCADE, primary_key=True, related_name='facet')
+	cuisine_type = models.CharField(max_length=100, db_index=True)
+	city = models.CharField(max_length=100)
+	# Casefolded city, which the location filter and the city facet go by
+	city_key = models.CharField(max_length=100, db_index=True)
+	# Lower bound of the rating band (see facets.RATING_BANDS), null when unrated
+	rating_band = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True)
+	avg_rating = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
+	review_count = models.PositiveIntegerField(default=0)
+	# One bit per day of the week with a happy hour, Monday = bit 0
+	happy_hour_days = models.PositiveSmallIntegerField(default=0)
+
+	def __str__(self):
+		return f"Facets for {self.restaurant_id}"
+
+
+class UserSearchEntry(models.Model):
+	"""Denormalized copy of what user search matches on, kept current by restaurants.user_search"""
+	user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, primary_key=True, related_name='search_entry')
+	# Casefolded, so prefix lookups are plain index range scans
+	username = models.CharField(max_length=150, db_index=True)
+	display_name = models.CharField(max_length=100, blank=True, db_index=True)
+	follower_count = models.PositiveIntegerField(default=0)
+
+	def __str__(self):
+		return self.username
+
+
+class UserSearchTrigram(models.Model):
+	"""One three-letter slice of a user's username or display name"""
+	trigram = models.CharField(max_length=3)
+	entry = models.ForeignKey(UserSearchEntry, on_delete=models.CASCADE, related_name='trigrams')
+
+	class Meta:
+		# Also the index that trigram lookups group by
+		unique_together = ('trigram', 'entry')
+
+	def __str__(self):
+		return self.trigram
+
+
+class FollowSuggestion(models.Model):
+	"""One of a user's top "people you may know", precomputed by restaurants.suggestions"""
+	user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='follow_suggestions')
+	suggested = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='+')
+	rank = models.PositiveSmallIntegerField()
+	score = models.FloatField()
+	# What the score is made of, for the "why" line
+	shared_followees = models.PositiveIntegerField(default=0)
+	followed_by_followees = models.PositiveIntegerField(default=0)
+	shared_restaurants = models.PositiveIntegerField(default=0)
+	shared_dishes = models.PositiveIntegerField(default=0)
+	computed_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		unique_together = ('user', 'suggested')
+		indexes = [
+			models.Index(fields=['user', 'rank'], name='followsuggestion_rank_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.suggested_id} for {self.user_id} (#{self.rank})"
+
+
+class DishSimilarity(models.Model):
+	"""One of a dish's nearest neighbours in the review matrix, trained by restaurants.recommendations"""
+	menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+	similar_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+	score = models.FloatField()
+
+	class Meta:
+		unique_together = ('menu_item', 'similar_item')
+
+	def __str__(self):
+		return f"{self.menu_item_id} ~ {self.similar_item_id} ({self.score:.2f})"
+
+
+class DishRecommendation(models.Model):
+	"""One of a user's top "dishes you'll like", with its predicted rating"""
+	user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='dish_recommendations')
+	menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+	rank = models.PositiveSmallIntegerField()
+	predicted_rating = models.FloatField()
+	computed_at = models.DateTimeField()
+
+	class Meta:
+		unique_together = ('user', 'menu_item')
+		indexes = [
+			models.Index(fields=['user', 'rank'], name='dishrec_rank_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.menu_item_id} for {self.user_id} (#{self.rank})"
+
+
+class SimilarRestaurant(models.Model):
+	"""One of a restaurant's top "people who saved this also saved" neighbours, from restaurants.similar"""
+	restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='+')
+	similar = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='+')
+	rank = models.PositiveSmallIntegerField()
+	score = models.FloatField()
+	# People and lists that saved both
+	shared_saves = models.PositiveIntegerField(default=0)
+	computed_at = models.DateTimeField()
+
+	class Meta:
+		unique_together = ('restaurant', 'similar')
+		indexes = [
+			models.Index(fields=['restaurant', 'rank'], name='similarrestaurant_rank_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.similar_id} for {self.restaurant_id} (#{self.rank})"
+
+
+class TasteProfile(models.Model):
+	"""
+	Per-cuisine taste statistics of one user, kept current by restaurants.taste.
+	Each list has one number per Restaurant.CUISINE_CHOICES entry, in order.
+	"""
+	user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, primary_key=True, related_name='taste_profile')
+	favourite_counts = models.JSONField(default=list)
+	review_counts = models.JSONField(default=list)
+	rating_sums = models.JSONField(default=list)
+	price_sums = models.JSONField(default=list)
+	# Unit-length affinity per cuisine; compatibility is a dot product of two of these
+	vector = models.JSONField(default=list)
+	# 1-4 ($ to $$$$) from the average price of reviewed dishes, null before any review
+	price_level = models.PositiveSmallIntegerField(null=True, blank=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	def __str__(self):
+		return f"Taste profile of {self.user_id}"
+
+
+class Affinity(models.Model):
+	"""
+	How often a user has liked and commented on another user's reviews and
+	posts, kept current by restaurants.counters. The ranked feed leans
+	towards authors the viewer engages with.
+	"""
+	user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='affinities')
+	author = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='+')
+	likes = models.PositiveIntegerField(default=0)
+	comments = models.PositiveIntegerField(default=0)
+
+	class Meta:
+		unique_together = ('user', 'author')
+		verbose_name_plural = 'affinities'
+
+	def __str__(self):
+		return f"{self.user_id} -> {self.author_id}: {self.likes} likes, {self.comments} comments"
+
+
+class PurgeJob(models.Model):
+	"""
+	The removal of one soft-deleted restaurant, post, list or account and
+	everything depending on it, run a batch at a time by restaurants.purge.
+	``step`` is the next step of the plan to run, so a job interrupted
+	part-way resumes where it stopped.
+	"""
+	STATUS_CHOICES = [
+		('pending', 'Pending'),
+		('running', 'Running'),
+		('done', 'Done'),
+		('failed', 'Failed'),
+	]
+	# app_label.ModelName of the deleted row
+	model = models.CharField(max_length=100)
+	object_id = models.PositiveBigIntegerField()
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+	step = models.PositiveIntegerField(default=0)
+	total_steps = models.PositiveIntegerField(default=0)
+	deleted_rows = models.PositiveIntegerField(default=0)
+	# Rows removed so far per model label
+	progress = models.JSONField(default=dict)
+	error = models.TextField(blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		indexes = [
+			# Jobs still to run, oldest first
+			models.Index(fields=['status', 'created_at'], name='purgejob_status_idx'),
+		]
+
+	def __str__(self):
+		return f"Purge {self.model} {self.object_id} ({self.status}, step {self.step}/{self.total_steps})"
+
+
+class Job(models.Model):
+	"""
+	One call of a background task, queued in the database and run by the
+	``run_jobs`` worker; see restaurants.jobs.
+	"""
+	STATUS_CHOICES = [
+		('queued', 'Queued'),
+		('running', 'Running'),
+		('done', 'Done'),
+		('failed', 'Failed'),
+	]
+	# Dotted path of the task function
+	name = models.CharField(max_length=200)
+	args = models.JSONField(default=list)
+	kwargs = models.JSONField(default=dict)
+	# Higher runs first
+	priority = models.SmallIntegerField(default=0)
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+	# Not before this time: delayed, scheduled and retried jobs
+	run_at = models.DateTimeField(default=timezone.now)
+	attempts = models.PositiveSmallIntegerField(default=0)
+	max_attempts = models.PositiveSmallIntegerField(default=3)
+	# At most one queued job per key
+	unique_key = models.CharField(max_length=200, null=True, blank=True)
+	worker = models.CharField(max_length=100, blank=True)
+	# A running job past this is taken to be abandoned by a dead worker
+	expires_at = models.DateTimeField(null=True, blank=True)
+	error = models.TextField(blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+	# Time spent waiting past run_at, and running, on the last attempt
+	wait_ms = models.PositiveIntegerField(null=True, blank=True)
+	duration_ms = models.PositiveIntegerField(null=True, blank=True)
+
+	class Meta:
+		indexes = [
+			# The claim query: due jobs, most urgent first
+			models.Index(fields=['status', '-priority', 'run_at'], name='job_claim_idx'),
+			# Timing reports and pruning
+			models.Index(fields=['finished_at'], name='job_finished_idx'),
+		]
+		constraints = [
+			models.UniqueConstraint(
+				fields=['unique_key'], condition=models.Q(status='queued'), name='job_queued_unique_key',
+			),
+		]
+
+	def __str__(self):
+		return f"{self.name} ({self.status}, attempt {self.attempts}/{self.max_attempts})"
@@ -0,0 +1,152 @@
+"""
+Full-page cache for logged-out visitors.
+
+Restaurant search, restaurant pages and menus are public, and crawlers and
+logged-out visitors send most of their traffic. For them a page is the same
+for everyone, so ``anonymous_page`` caches the whole response and serves it
+without running the view or its queries.
+
+Entries are keyed by path, the AJAX header (full pages and their partials
+share a URL) and the query string reduced to the filters the views read:
+blank values dropped, repeated ones sorted and ``page=1`` dropped, so
+equivalent searches share an entry. Requests with any other parameter are
+not cached, and neither are responses that set a cookie or embed a CSRF
+token, since those belong to one visitor.
+
+An entry records the version stamps of what it shows (restaurants.cache):
+the restaurant's own stamp, bumped by every restaurant, menu, review and
+happy hour write, or for search the stamp all of those bump. It is stale
+once a stamp moves or after ``FRESH_FOR``. The first request to find it
+stale takes a short lock and rebuilds it; requests arriving meanwhile are
+given the stale copy instead of piling onto the database, or, if there is
+no copy yet, wait up to ``WAIT`` for the rebuild to land.
+"""
+import hashlib
+import time
+from functools import wraps
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+
+from .cache import ANY_RESTAURANT_KEY, SIMILAR_KEY, get_stamps, version_key
+
+CACHED_PARAMS = {'q', 'cuisine_type', 'location', 'happy_hour_mode', 'hh_days', 'hh_time', 'rating', 'page'}
+KEPT_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+# Bounds what the stamps do not cover, e.g. a similar restaurant's new name
+FRESH_FOR = 10 * 60
+# Stale entries stay around to be served while they are rebuilt
+PAGE_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 30
+WAIT = 2.0
+POLL_INTERVAL = 0.05
+
+
+def page_key(request) -> Optional[str]:
+    """Cache key for the request, or None when its query string has parameters the cache does not know."""
+    params = []
+    for name in sorted(request.GET):
+        if name not in CACHED_PARAMS:
+            return None
+        values = sorted(value.strip() for value in request.GET.getlist(name) if value.strip())
+        if values and not (name == 'page' and values == ['1']):
+            params.append((name, values))
+    raw = repr((request.path, request.headers.get('X-Requested-With'), params))
+    return 'page:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _store(key: str, version: str, response: Optional[HttpResponse]) -> None:
+    """Cache the response, or with None, a marker telling others to render for themselves."""
+    entry = {'version': version, 'built_at': time.time(), 'content': None}
+    if response is not None:
+        if not response.has_header('ETag'):
+            set_response_etag(response)
+        entry.update(
+            content=response.content,
+            content_type=response['Content-Type'],
+            headers={header: response[header] for header in KEPT_HEADERS if response.has_header(header)},
+        )
+    cache.set(key, entry, PAGE_TIMEOUT)
+
+
+def _cacheable(request, response) -> bool:
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # Set when the page rendered {% csrf_token %}
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def _wait_for(key: str) -> Optional[Dict]:
+    deadline = time.monotonic() + WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _respond(request, entry: Dict) -> HttpResponse:
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    return get_conditional_response(request, etag=response.get('ETag'), response=response)
+
+
+def anonymous_page(stamps_func):
+    """
+    Serve the view's GET responses to logged-out visitors from the page
+    cache. ``stamps_func(request, *args, **kwargs)`` lists the stamp keys
+    whose change makes the page stale.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            key = page_key(request)
+            if key is None:
+                return view(request, *args, **kwargs)
+
+            version = repr(sorted(get_stamps(stamps_func(request, *args, **kwargs)).items()))
+            entry = cache.get(key)
+            fresh = entry is not None and entry['version'] == version and time.time() - entry['built_at'] < FRESH_FOR
+            if not fresh and cache.add(key + ':lock', 1, LOCK_TIMEOUT):
+                try:
+                    try:
+                        response = view(request, *args, **kwargs)
+                    except Exception:
+                        # e.g. a 404: nobody should wait for this page
+                        _store(key, version, None)
+                        raise
+                    if response.status_code != 304:
+                        _store(key, version, response if _cacheable(request, response) else None)
+                    return response
+                finally:
+                    cache.delete(key + ':lock')
+
+            if entry is None:
+                # Someone else is building the first copy
+                entry = _wait_for(key)
+            if entry is None or entry['content'] is None:
+                return view(request, *args, **kwargs)
+            return _respond(request, entry)
+        return wrapper
+    return decorator
+
+
+def search_page_stamps(request) -> List[str]:
+    return [ANY_RESTAURANT_KEY]
+
+
+def restaurant_page_stamps(request, restaurant_id) -> List[str]:
+    return [version_key(restaurant_id), SIMILAR_KEY]
+
+
+def menu_page_stamps(request, restaurant_id) -> List[str]:
+    return [version_key(restaurant_id)]
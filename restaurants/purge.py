@@ -0,0 +1,215 @@
+"""
+Soft delete and background purge.
+
+Deleting a popular restaurant used to cascade through its menu, reviews,
+likes, comments, posts, list entries and notifications in one transaction,
+holding SQLite's write lock for seconds. Now ``soft_delete`` only marks the
+row (and whatever would show it elsewhere: the posts about a restaurant's
+dishes, an account's posts and lists) as deleted, which the default
+managers hide at once (see restaurants.managers), and queues a PurgeJob for
+the job workers (restaurants.jobs).
+
+``run_job`` then removes the dependent rows. Its plan is derived from the
+foreign keys pointing at the model, leaves first, so every table is drained
+in batches of ``BATCH_SIZE`` rows, each in its own short transaction, before
+the tables they hang off. By the time the row itself is deleted nothing is
+left for the cascade to do. Foreign keys declared SET_NULL are cleared in
+batches the same way, except ``Post.user``: an account's posts go with it.
+The job records the step it is on and the rows removed per model, so a
+restarted job carries on where it stopped.
+
+Likes, comments and follows that belong to other people's content are
+removed through the same counter bookkeeping as restaurants.counters, so
+the like, comment and follower counts of what survives stay right.
+"""
+import logging
+import time
+from typing import List, Tuple
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from posts.models import Post, PostComment, PostLike
+
+from .cache import bump_versions
+from .counters import remove_comment, uncount_affinities
+from .db import retry_on_lock
+from .facets import refresh_facet
+from .jobs import enqueue
+from .models import Comment, CustomList, Follow, Profile, PurgeJob, Restaurant, ReviewLike, UserSearchEntry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# Breathing room between batches for other writers
+PAUSE = 0.05
+
+# (model, foreign key) pairs removed with what they point at even though
+# the key says SET_NULL
+DELETE_WITH = {(Post, 'user')}
+
+# Likes and comments whose target's counters must be kept when the target
+# itself is not being purged: model -> foreign key to the Review or Post
+COUNTED = {ReviewLike: 'review', PostLike: 'post', Comment: 'review', PostComment: 'post'}
+
+Step = Tuple[type, str, str]
+
+
+def plan(model, path: Tuple[str, ...] = ()) -> List[Step]:
+    """
+    ``(model, lookup, action)`` steps that remove everything depending on a
+    row of ``model``, leaves first. ``lookup`` leads from the step's model
+    to the root; ``action`` is 'delete' or 'unlink' (clear a SET_NULL key).
+    """
+    steps = []
+    for relation in model._meta.related_objects:
+        child, field = relation.related_model, relation.field
+        if relation.many_to_many or child is model:
+            # Replies go with the comment they answer
+            continue
+        lookup = '__'.join((field.name,) + path)
+        if field.remote_field.on_delete is models.CASCADE or (child, field.name) in DELETE_WITH:
+            steps.extend(plan(child, (field.name,) + path))
+            steps.append((child, lookup, 'delete'))
+        elif field.remote_field.on_delete is models.SET_NULL:
+            steps.append((child, lookup, 'unlink'))
+    return steps
+
+
+def _forget_follows(lookup: str, rows) -> None:
+    """Keep the other side's follow counters right as Follow rows go."""
+    if lookup == 'follower':
+        followed = [following_id for _, following_id in rows]
+        Profile.objects.filter(user_id__in=followed).update(followers_count=F('followers_count') - 1)
+        UserSearchEntry.objects.filter(user_id__in=followed).update(follower_count=F('follower_count') - 1)
+    elif lookup == 'following':
+        Profile.objects.filter(user_id__in=[follower_id for follower_id, _ in rows]).update(
+            following_count=F('following_count') - 1,
+        )
+
+
+def _run_batch(model, lookup: str, action: str, object_id: int) -> int:
+    """Remove or unlink up to BATCH_SIZE rows of one step; returns how many."""
+    rows = model._base_manager.filter(**{lookup: object_id}).order_by('pk')
+    target = COUNTED.get(model)
+    if target and not lookup.startswith(target + '__'):
+        if model in (Comment, PostComment):
+            # Each one takes its replies with it and fixes the thread's counts
+            removed = 0
+            for comment in list(rows.select_related(target).order_by('path')[:BATCH_SIZE]):
+                removed += remove_comment(getattr(comment, target), comment)
+            return removed
+        batch = list(rows.values_list('pk', f'{target}_id')[:BATCH_SIZE])
+        if not batch:
+            return 0
+        pks, target_ids = zip(*batch)
+        target_model = model._meta.get_field(target).related_model
+        # One like per user and target, so each target loses exactly one
+        target_model._base_manager.filter(pk__in=target_ids).update(like_count=F('like_count') - 1)
+        return model._base_manager.filter(pk__in=pks).delete()[1].get(model._meta.label, 0)
+
+    if target:
+        # Their target is going too; replies first, so no comment takes
+        # uncounted replies with it
+        rows = rows.order_by('-depth', 'pk') if model in (Comment, PostComment) else rows
+    pks = list(rows.values_list('pk', flat=True)[:BATCH_SIZE])
+    if not pks:
+        return 0
+    if target:
+        uncount_affinities(
+            model._base_manager.filter(pk__in=pks).values_list('user_id', f'{target}__user_id'),
+            'likes' if model in (ReviewLike, PostLike) else 'comments',
+        )
+    if action == 'unlink':
+        return model._base_manager.filter(pk__in=pks).update(**{lookup.split('__')[0]: None})
+    if model is Follow:
+        _forget_follows(lookup, Follow.objects.filter(pk__in=pks).values_list('follower_id', 'following_id'))
+    return model._base_manager.filter(pk__in=pks).delete()[1].get(model._meta.label, 0)
+
+
+def run_job(job_id: int, resume: bool = False) -> PurgeJob:
+    """
+    Run a pending or failed purge job to the end. A job already marked
+    running is left to whoever runs it, unless ``resume`` says that runner
+    has died.
+    """
+    claimable = ['pending', 'failed'] + (['running'] if resume else [])
+    claimed = PurgeJob.objects.filter(pk=job_id, status__in=claimable).update(status='running', error='')
+    job = PurgeJob.objects.get(pk=job_id)
+    if not claimed:
+        return job
+    model = apps.get_model(job.model)
+    steps = plan(model)
+    job.total_steps = len(steps)
+    job.started_at = job.started_at or timezone.now()
+    job.save(update_fields=['total_steps', 'started_at'])
+
+    def batch(job, step):
+        child, lookup, action = step
+        # A retried batch starts again from what was committed
+        job.refresh_from_db(fields=['deleted_rows', 'progress'])
+        removed = _run_batch(child, lookup, action, job.object_id)
+        if removed:
+            job.deleted_rows += removed
+            job.progress[child._meta.label] = job.progress.get(child._meta.label, 0) + removed
+            job.save(update_fields=['deleted_rows', 'progress'])
+        return removed
+
+    try:
+        while job.step < len(steps):
+            while retry_on_lock(batch)(job, steps[job.step]):
+                time.sleep(PAUSE)
+            job.step += 1
+            job.save(update_fields=['step'])
+        with transaction.atomic():
+            # Only the row and a handful of one-to-one rows are left
+            model._base_manager.filter(pk=job.object_id).delete()
+            job.status, job.finished_at = 'done', timezone.now()
+            job.save(update_fields=['status', 'finished_at'])
+    except Exception as error:
+        logger.exception('Purge of %s %s failed at step %s', job.model, job.object_id, job.step)
+        job.status, job.error = 'failed', str(error)
+        job.save(update_fields=['status', 'error'])
+    return job
+
+
+def schedule(job: PurgeJob) -> None:
+    """Queue the purge; workers see it once the current transaction commits."""
+    from .tasks import purge
+
+    enqueue(purge, job.pk)
+
+
+@transaction.atomic
+def soft_delete(instance) -> PurgeJob:
+    """Hide a Restaurant, Post, CustomList or user account now and queue its purge."""
+    now = timezone.now()
+    pk = instance.pk
+    if isinstance(instance, Restaurant):
+        # Free the address at once so the place can be added again
+        Restaurant.objects.filter(pk=pk).update(deleted_at=now, normalized_address=f'deleted:{pk}')
+        Post.objects.filter(menu_item__menu__restaurant_id=pk).update(deleted_at=now)
+
+        def refresh():
+            bump_versions([pk])
+            refresh_facet(pk)
+        transaction.on_commit(refresh)
+    elif isinstance(instance, Post):
+        Post.objects.filter(pk=pk).update(deleted_at=now)
+    elif isinstance(instance, CustomList):
+        CustomList.objects.filter(pk=pk).update(deleted_at=now)
+        Post.objects.filter(custom_list_id=pk).update(deleted_at=now)
+    elif isinstance(instance, get_user_model()):
+        # Inactive accounts cannot sign in and existing sessions stop resolving
+        get_user_model().objects.filter(pk=pk).update(is_active=False)
+        UserSearchEntry.objects.filter(user_id=pk).delete()
+        Post.objects.filter(user_id=pk).update(deleted_at=now)
+        CustomList.objects.filter(user_id=pk).update(deleted_at=now)
+    else:
+        raise TypeError(f'{type(instance).__name__} cannot be soft-deleted')
+    job = PurgeJob.objects.create(model=instance._meta.label, object_id=pk, total_steps=len(plan(instance._meta.model)))
+    schedule(job)
+    return job
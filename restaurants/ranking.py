@@ -0,0 +1,162 @@
+"""
+Ranked mode for the home feed.
+
+The candidates are the newest ``CANDIDATES`` posts from the people the
+viewer follows. Each is scored by three signals, all read from stored
+columns so ranking a window is four indexed queries and a few hundred
+multiplications:
+
+* recency, halving every ``HALF_LIFE_HOURS``;
+* velocity, likes plus ``COMMENT_WEIGHT`` times comments per hour since
+  posting (the Review or Post counters; a review post's live on its review);
+* affinity, how often the viewer has liked and commented on the author
+  (Affinity, kept current by restaurants.counters).
+
+``score = recency * (1 + w_v * log(1 + velocity)) * (1 + w_a * log(1 + affinity))``,
+so a post nobody has touched from someone the viewer never engages with
+still ranks purely by age.
+
+``evaluate`` replays past likes and comments in time order, rebuilding the
+counters, affinities and follows as they stood at each one, and asks where
+the post interacted with would have appeared in the viewer's feed under
+each ordering; ``evaluate_feed_ranking`` prints the result.
+"""
+import bisect
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.utils import timezone
+
+from .explore import match_reviews
+from .models import Affinity, Comment, Follow, Review, ReviewLike
+
+CANDIDATES = 300
+PAGE_SIZE = 20
+HALF_LIFE_HOURS = 24.0
+COMMENT_WEIGHT = 2.0
+WEIGHTS = {'velocity': 1.0, 'affinity': 0.5}
+
+
+def score(age_hours: float, likes: int, comments: int, affinity: float, weights: Dict[str, float] = WEIGHTS) -> float:
+    age_hours = max(age_hours, 0.0)
+    recency = 0.5 ** (age_hours / HALF_LIFE_HOURS)
+    velocity = (likes + COMMENT_WEIGHT * comments) / (age_hours + 1)
+    return recency * (1 + weights['velocity'] * math.log1p(velocity)) * (1 + weights['affinity'] * math.log1p(affinity))
+
+
+def affinity_value(likes: int, comments: int) -> float:
+    return likes + COMMENT_WEIGHT * comments
+
+
+def ranked_post_ids(viewer, followed_ids, limit: int = PAGE_SIZE) -> List[int]:
+    """The viewer's best ``limit`` candidate posts, best first."""
+    from posts.models import Post
+
+    now = timezone.now()
+    candidates = list(Post.objects.filter(user__in=followed_ids).order_by('-created_at').only(
+        'pk', 'post_type', 'user_id', 'menu_item_id', 'rating', 'created_at', 'like_count', 'comment_count',
+    )[:CANDIDATES])
+    review_ids = match_reviews(candidates)
+    engagement = {
+        pk: (likes, comments)
+        for pk, likes, comments in Review.objects.filter(pk__in=review_ids.values()).values_list(
+            'pk', 'like_count', 'comment_count',
+        )
+    }
+    affinities = {
+        author_id: affinity_value(likes, comments)
+        for author_id, likes, comments in Affinity.objects.filter(
+            user=viewer, author_id__in={post.user_id for post in candidates},
+        ).values_list('author_id', 'likes', 'comments')
+    }
+
+    def post_score(post):
+        likes, comments = engagement.get(review_ids.get(post.pk), (post.like_count, post.comment_count))
+        age_hours = (now - post.created_at).total_seconds() / 3600
+        return score(age_hours, likes, comments, affinities.get(post.user_id, 0.0))
+
+    return [post.pk for post in heapq.nlargest(limit, candidates, key=lambda post: (post_score(post), post.pk))]
+
+
+def _reciprocal_rank(rank: Optional[int]) -> float:
+    return 1 / rank if rank else 0.0
+
+
+def evaluate(days: int = 30, weights: Dict[str, float] = WEIGHTS, page_size: int = PAGE_SIZE) -> Dict[str, Dict]:
+    """
+    Replay every like and comment of the last ``days`` against the feed as
+    it would have looked just before it, under the chronological and the
+    ranked order. Returns, per order, the number of interactions replayed,
+    their mean reciprocal rank and the share that were on the first page.
+    """
+    from posts.models import Post, PostComment, PostLike
+
+    posts = list(Post.objects.filter(user__isnull=False).only(
+        'pk', 'post_type', 'user_id', 'menu_item_id', 'rating', 'created_at',
+    ))
+    by_pk = {post.pk: post for post in posts}
+    review_posts = {review_id: post_id for post_id, review_id in match_reviews(posts).items()}
+    # Each author's posts, oldest first, for "what had they posted by then"
+    authored = defaultdict(list)
+    for post in sorted(posts, key=lambda post: (post.created_at, post.pk)):
+        authored[post.user_id].append(post)
+    posted_at = {author: [post.created_at for post in items] for author, items in authored.items()}
+
+    def posted_by(author, until):
+        end = bisect.bisect_right(posted_at.get(author, []), until)
+        return authored[author][max(0, end - CANDIDATES):end]
+
+    events = []
+    for model, key, mapping, kind in (
+        (ReviewLike, 'review_id', review_posts, 'like'),
+        (Comment, 'review_id', review_posts, 'comment'),
+        (PostLike, 'post_id', None, 'like'),
+        (PostComment, 'post_id', None, 'comment'),
+    ):
+        for user_id, target_id, created_at in model.objects.values_list('user_id', key, 'created_at').iterator():
+            post_id = mapping.get(target_id) if mapping is not None else target_id
+            if post_id in by_pk:
+                events.append((created_at, kind, user_id, post_id))
+    events.sort(key=lambda event: event[0])
+    follows = sorted(Follow.objects.values_list('created_at', 'follower_id', 'following_id'))
+
+    likes, comments = Counter(), Counter()
+    affinity = defaultdict(Counter)
+    followees = defaultdict(set)
+    since = timezone.now() - timedelta(days=days)
+    ranks = {'chronological': [], 'ranked': []}
+    next_follow = 0
+    for created_at, kind, user_id, post_id in events:
+        while next_follow < len(follows) and follows[next_follow][0] <= created_at:
+            followees[follows[next_follow][1]].add(follows[next_follow][2])
+            next_follow += 1
+        post = by_pk[post_id]
+        if created_at >= since and post.user_id in followees[user_id]:
+            # The window as it stood: each followee's newest posts up to now
+            window = heapq.nlargest(CANDIDATES, (
+                candidate for author in followees[user_id] for candidate in posted_by(author, created_at)
+            ), key=lambda candidate: (candidate.created_at, candidate.pk))
+            ranked = sorted(window, key=lambda candidate: -score(
+                (created_at - candidate.created_at).total_seconds() / 3600,
+                likes[candidate.pk], comments[candidate.pk],
+                affinity_value(affinity[user_id]['likes', candidate.user_id], affinity[user_id]['comments', candidate.user_id]),
+                weights,
+            ))
+            for order, listed in (('chronological', window), ('ranked', ranked)):
+                position = next((i for i, candidate in enumerate(listed, start=1) if candidate.pk == post_id), None)
+                ranks[order].append(position)
+        (likes if kind == 'like' else comments)[post_id] += 1
+        if post.user_id != user_id:
+            affinity[user_id][kind + 's', post.user_id] += 1
+
+    return {
+        order: {
+            'interactions': len(positions),
+            'mrr': sum(map(_reciprocal_rank, positions)) / len(positions) if positions else 0.0,
+            'first_page': sum(1 for rank in positions if rank and rank <= page_size) / len(positions) if positions else 0.0,
+        }
+        for order, positions in ranks.items()
+    }
@@ -0,0 +1,240 @@
+"""
+"Dishes you'll like": item-item collaborative filtering over review ratings.
+
+Training reads every (user, dish) rating once into the review matrix,
+centred on each user's (damped) mean rating so a harsh and a generous
+reviewer agree on what they liked. Two dishes are similar when the same
+people rated both above or below their usual: the adjusted cosine of their
+rating columns, shrunk when it rests on few shared reviewers. Each dish
+keeps its ``NEIGHBOURS`` most similar dishes in DishSimilarity.
+
+A user's predicted rating for an unrated dish is their mean plus the
+similarity-weighted average of how far above their mean they rated its
+neighbours. The ``TOP_N`` dishes predicted above their mean are stored in
+DishRecommendation, so pages read a finished ranking and never touch the
+model.
+
+``refresh_dish_recommendations`` retrains everything; with
+``--incremental`` it keeps the trained neighbours and only re-ranks users
+who reviewed something since their recommendations were computed.
+"""
+import multiprocessing
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Avg, Max
+from django.utils import timezone
+
+from .models import DishRecommendation, DishSimilarity, Review
+from .sparse import CSR, dense_ids
+
+NEIGHBOURS = 30
+TOP_N = 20
+# Pulls the means of users with few reviews towards the global mean, so a
+# single 9/10 still reads as "liked"
+MEAN_DAMPING = 3
+# Similarity resting on n shared reviewers is scaled by n / (n + SHRINKAGE)
+SHRINKAGE = 5
+# Catalogs with more rated dishes than this are trained across a process pool
+POOL_THRESHOLD = 5000
+CHUNK_SIZE = 1000
+
+
+class Ratings:
+    """The centred review matrix, as user -> dish and dish -> user CSR."""
+
+    def __init__(self, user_pks: Iterable[int], item_pks: Iterable[int], ratings: Iterable[float]):
+        self.user_ids, users = dense_ids(user_pks)
+        self.item_ids, items = dense_ids(item_pks)
+        ratings = np.fromiter(ratings, dtype=np.float64)
+        n_users, n_items = len(self.user_ids), len(self.item_ids)
+
+        global_mean = ratings.mean() if len(ratings) else 0.0
+        totals = np.bincount(users, weights=ratings, minlength=n_users)
+        counts = np.bincount(users, minlength=n_users)
+        self.user_means = (totals + MEAN_DAMPING * global_mean) / (counts + MEAN_DAMPING)
+        centred = ratings - self.user_means[users]
+
+        self.by_user = CSR(users, items, n_users, centred)
+        self.by_item = CSR(items, users, n_items, centred)
+        self.item_norms = np.sqrt(np.bincount(items, weights=centred ** 2, minlength=n_items))
+
+    @classmethod
+    def load(cls) -> 'Ratings':
+        # A user who reviewed a dish twice counts once, at their average
+        rows = list(
+            Review.objects.filter(user__isnull=False).values('user_id', 'menu_item_id')
+            .annotate(rating=Avg('rating')).order_by().values_list('user_id', 'menu_item_id', 'rating')
+        )
+        return cls(
+            (row[0] for row in rows), (row[1] for row in rows), (float(row[2]) for row in rows),
+        )
+
+
+def item_neighbours(ratings: Ratings, items: Iterable[int], k: int = NEIGHBOURS):
+    """(item, neighbour, similarity) arrays for the ``k`` nearest neighbours of each given item."""
+    by_user, by_item = ratings.by_user, ratings.by_item
+    sources, targets, scores = [], [], []
+    for item in items:
+        if not ratings.item_norms[item]:
+            continue
+        raters = by_item.row(item)
+        positions = by_user.positions(raters)
+        # Every dish those raters reviewed, weighted by both centred ratings
+        others = by_user.indices[positions]
+        products = by_user.values[positions] * np.repeat(by_item.row_values(item), by_user.lengths(raters))
+        unique, inverse = np.unique(others, return_inverse=True)
+        dots = np.bincount(inverse, weights=products)
+        shared = np.bincount(inverse)
+        similarity = dots / (ratings.item_norms[unique] * ratings.item_norms[item] + 1e-12)
+        similarity *= shared / (shared + SHRINKAGE)
+        similarity[unique == item] = 0
+
+        best = np.flatnonzero(similarity > 0)
+        if len(best) > k:
+            best = best[np.argpartition(-similarity[best], k - 1)[:k]]
+        sources.append(np.full(len(best), item))
+        targets.append(unique[best])
+        scores.append(similarity[best])
+    if not sources:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(sources), np.concatenate(targets), np.concatenate(scores)
+
+
+# Set in each pool worker; forked workers share the parent's arrays
+_pool_ratings: Optional[Ratings] = None
+
+
+def _init_worker(ratings: Ratings) -> None:
+    global _pool_ratings
+    _pool_ratings = ratings
+
+
+def _neighbours_chunk(bounds: Tuple[int, int]):
+    return item_neighbours(_pool_ratings, range(*bounds))
+
+
+def train(ratings: Ratings, workers: int = 1) -> CSR:
+    """Nearest-neighbour lists for every dish, as a dish -> dish CSR of similarities."""
+    n_items = len(ratings.item_ids)
+    chunks = [(start, min(start + CHUNK_SIZE, n_items)) for start in range(0, n_items, CHUNK_SIZE)]
+    if workers > 1 and n_items > POOL_THRESHOLD and 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers, initializer=_init_worker, initargs=(ratings,)) as pool:
+            parts = pool.map(_neighbours_chunk, chunks)
+    else:
+        parts = [item_neighbours(ratings, range(*bounds)) for bounds in chunks]
+    if parts:
+        sources, targets, scores = (np.concatenate(column) for column in zip(*parts))
+    else:
+        sources = targets = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0)
+    return CSR(sources, targets, n_items, scores)
+
+
+def recommend(ratings: Ratings, neighbours: CSR, user: int, n: int = TOP_N) -> List[Tuple[int, float]]:
+    """(dish, predicted rating) for the user's ``n`` best unrated dishes, best first, in dense ids."""
+    rated = ratings.by_user.row(user)
+    positions = neighbours.positions(rated)
+    if not len(positions):
+        return []
+    candidates = neighbours.indices[positions]
+    similarity = neighbours.values[positions]
+    liked = np.repeat(ratings.by_user.row_values(user), neighbours.lengths(rated))
+
+    unique, inverse = np.unique(candidates, return_inverse=True)
+    lift = np.bincount(inverse, weights=similarity * liked) / np.bincount(inverse, weights=similarity)
+    # Only dishes they have not rated and are expected to like more than usual
+    lift[np.isin(unique, rated) | (lift <= 0)] = 0
+    best = np.flatnonzero(lift > 0)
+    if len(best) > n:
+        best = best[np.argpartition(-lift[best], n - 1)[:n]]
+    best = best[np.argsort(-lift[best], kind='stable')]
+    predicted = np.clip(ratings.user_means[user] + lift[best], 1.0, 10.0)
+    return list(zip(unique[best].tolist(), predicted.tolist()))
+
+
+def _store_recommendations(ratings: Ratings, neighbours: CSR, users: Iterable[int], computed_at,
+                           replace_all: bool = False) -> int:
+    users = list(users)
+    rows = [
+        DishRecommendation(
+            user_id=int(ratings.user_ids[user]), menu_item_id=int(ratings.item_ids[item]),
+            rank=rank, predicted_rating=round(predicted, 2), computed_at=computed_at,
+        )
+        for user in users
+        for rank, (item, predicted) in enumerate(recommend(ratings, neighbours, user), start=1)
+    ]
+    with transaction.atomic():
+        if replace_all:
+            DishRecommendation.objects.all().delete()
+        else:
+            DishRecommendation.objects.filter(user_id__in=ratings.user_ids[users].tolist()).delete()
+        DishRecommendation.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _stored_neighbours(ratings: Ratings) -> CSR:
+    """The trained DishSimilarity rows, mapped onto this load's dense dish ids."""
+    rows = np.array(
+        list(DishSimilarity.objects.values_list('menu_item_id', 'similar_item_id', 'score')), dtype=np.float64,
+    ).reshape(-1, 3)
+    n_items = len(ratings.item_ids)
+    if not n_items:
+        return CSR(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0, np.zeros(0))
+    pks = rows[:, :2].astype(np.int64)
+    dense = np.minimum(np.searchsorted(ratings.item_ids, pks), n_items - 1)
+    # Dishes that have lost all their reviews since training drop out
+    known = (ratings.item_ids[dense] == pks).all(axis=1)
+    return CSR(dense[known, 0], dense[known, 1], n_items, rows[known, 2])
+
+
+def _users_with_new_reviews(ratings: Ratings) -> List[int]:
+    computed = dict(
+        DishRecommendation.objects.values('user_id').annotate(at=Max('computed_at')).order_by()
+        .values_list('user_id', 'at')
+    )
+    latest = Review.objects.filter(user__isnull=False).values('user_id').annotate(at=Max('created_at')).order_by()
+    changed = [
+        row['user_id'] for row in latest
+        if row['user_id'] not in computed or row['at'] > computed[row['user_id']]
+    ]
+    dense = np.searchsorted(ratings.user_ids, changed)
+    return dense[dense < len(ratings.user_ids)].tolist()
+
+
+def refresh(incremental: bool = False, workers: int = 1) -> Tuple[int, int, float]:
+    """Retrain (or, incrementally, re-rank changed users); returns (users, rows, seconds)."""
+    started = time.perf_counter()
+    computed_at = timezone.now()
+    ratings = Ratings.load()
+    if incremental:
+        neighbours = _stored_neighbours(ratings)
+        users = _users_with_new_reviews(ratings)
+    else:
+        neighbours = train(ratings, workers)
+        sources = np.repeat(np.arange(neighbours.n_rows), np.diff(neighbours.indptr))
+        with transaction.atomic():
+            DishSimilarity.objects.all().delete()
+            DishSimilarity.objects.bulk_create([
+                DishSimilarity(
+                    menu_item_id=int(ratings.item_ids[source]), similar_item_id=int(ratings.item_ids[target]),
+                    score=round(float(score), 4),
+                )
+                for source, target, score in zip(sources, neighbours.indices, neighbours.values)
+            ], batch_size=1000)
+        users = range(len(ratings.user_ids))
+    rows = _store_recommendations(ratings, neighbours, users, computed_at, replace_all=not incremental)
+    return len(users), rows, time.perf_counter() - started
+
+
+def recommendations_for(user, limit: int = 6):
+    """A user's stored dish recommendations, best first, minus dishes they have reviewed or that were deleted since."""
+    return (
+        DishRecommendation.objects.filter(user=user, menu_item__menu__restaurant__deleted_at__isnull=True)
+        .exclude(menu_item__reviews__user=user)
+        .select_related('menu_item__menu__restaurant')
+        .order_by('rank')[:limit]
+    )
@@ -0,0 +1,148 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default``. Reads go to a random alias from
+``DATABASE_REPLICAS`` unless the current request has to see its own writes:
+after a write in this request, inside a transaction, or while the client
+carries the pin cookie set by ``ReplicaPinMiddleware`` after an earlier
+write. With no replicas configured everything stays on ``default``.
+
+The database cache table lives on ``default`` only. Writing it (hit
+counters, cached pages) is not a change the client has to read back, so
+it does not pin the request.
+"""
+import contextvars
+import random
+import re
+from contextlib import contextmanager
+from typing import List, Set
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+PIN_COOKIE = 'pin_primary'
+
+_pinned = contextvars.ContextVar('pinned_to_primary', default=False)
+_wrote = contextvars.ContextVar('wrote_to_primary', default=False)
+
+# The statement kind and the table it writes to
+WRITE_STATEMENT = re.compile(
+    r'\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+["`]?(\w+)', re.IGNORECASE,
+)
+
+
+def replica_aliases() -> List[str]:
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def wrote_to_primary() -> bool:
+    return _wrote.get()
+
+
+def cache_tables() -> Set[str]:
+    """Tables of the configured database cache backends."""
+    return {caches[alias]._table for alias in settings.CACHES if isinstance(caches[alias], DatabaseCache)}
+
+
+def _is_cache(model) -> bool:
+    # DatabaseCache routes through a stand-in model in this app label
+    return model._meta.app_label == 'django_cache'
+
+
+@contextmanager
+def routing_scope(pinned: bool = False):
+    """
+    Fresh read-your-writes state, as for a new request. Outside any scope
+    (shell, management commands) a write pins reads for the rest of the
+    thread, which is the safe default for scripts.
+    """
+    pinned_token = _pinned.set(pinned)
+    wrote_token = _wrote.set(False)
+    try:
+        yield
+    finally:
+        _wrote.reset(wrote_token)
+        _pinned.reset(pinned_token)
+
+
+def _record_writes(execute, sql, params, many, context):
+    write = WRITE_STATEMENT.match(sql)
+    if write and write.group(1) not in cache_tables():
+        _wrote.set(True)
+    return execute(sql, params, many, context)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or _pinned.get() or _wrote.get() or _is_cache(model):
+            return DEFAULT_DB_ALIAS
+        if transaction.get_connection(DEFAULT_DB_ALIAS).in_atomic_block:
+            # Reads inside a transaction must see the rows it has written
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Lookups go through here too (get_or_create, select_for_update), so
+        # the pin waits for a statement that actually writes. Placed first:
+        # execute_wrapper() blocks remove the last wrapper when they exit.
+        wrappers = connections[DEFAULT_DB_ALIAS].execute_wrappers
+        if _record_writes not in wrappers:
+            wrappers.insert(0, _record_writes)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary along with the data
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes for replicas. A request that writes sets a short-lived
+    cookie, and requests carrying it read from the primary until the replicas
+    have had REPLICA_PIN_SECONDS to catch up.
+
+    Sits above SessionMiddleware so session saves count as writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing_scope(pinned=PIN_COOKIE in request.COOKIES):
+            response = self.get_response(request)
+            if wrote_to_primary() and replica_aliases():
+                response.set_cookie(
+                    PIN_COOKIE, '1',
+                    max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                    httponly=True,
+                    samesite='Lax',
+                )
+        return response
+
+
+def replicate(alias: str) -> None:
+    """
+    Copy the primary SQLite database onto a replica with the online backup
+    API. This is how replicas are kept up to date when both are local SQLite
+    files; run it on an interval (``sync_replicas``) to mimic replication lag.
+    """
+    for name in (DEFAULT_DB_ALIAS, alias):
+        if connections[name].vendor != 'sqlite':
+            raise ValueError(f"Database '{name}' is not SQLite; use the server's own replication.")
+    source = connections[DEFAULT_DB_ALIAS]
+    target = connections[alias]
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
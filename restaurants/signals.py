@@ -0,0 +1,121 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_versions
+from .facets import refresh_facet
+from .jobs import enqueue
+from .models import HappyHour, Menu, MenuItem, Profile, Restaurant, RestaurantList, Review
+from .tasks import refresh_taste
+from .user_search import refresh_entry
+
+
+def _release(storage, name):
+    """Drop this row's reference to a stored upload once the write commits, so a rollback keeps it."""
+    if name:
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_delete, sender=Review)
+def release_review_image(sender, instance, **kwargs):
+    _release(instance.image.storage, instance.image.name)
+
+
+@receiver(post_delete, sender=Profile)
+def release_profile_picture(sender, instance, **kwargs):
+    _release(instance.profile_picture.storage, instance.profile_picture.name)
+
+
+@receiver(pre_save, sender=Profile)
+def release_replaced_profile_picture(sender, instance, **kwargs):
+    if not instance.pk:
+        return
+    old = Profile.objects.filter(pk=instance.pk).values_list('profile_picture', flat=True).first()
+    if old and old != instance.profile_picture.name:
+        _release(instance.profile_picture.storage, old)
+
+
+def _restaurant_changed(restaurant_id, facets=True):
+    """
+    Bump the restaurant's card version and refresh its search facets once the
+    write commits, so readers that see the new stamp also see the new rows and
+    a cascading delete has finished before the facets are recomputed.
+    """
+    if not restaurant_id:
+        return
+
+    def apply():
+        bump_versions([restaurant_id])
+        if facets:
+            refresh_facet(restaurant_id)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def restaurant_changed(sender, instance, **kwargs):
+    _restaurant_changed(instance.pk)
+
+
+@receiver(post_save, sender=HappyHour)
+@receiver(post_delete, sender=HappyHour)
+def happy_hour_changed(sender, instance, **kwargs):
+    _restaurant_changed(instance.restaurant_id)
+
+
+@receiver(post_save, sender=Menu)
+def menu_changed(sender, instance, **kwargs):
+    # A restaurant's page links to its menu once it has one
+    _restaurant_changed(instance.restaurant_id, facets=False)
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def menu_item_changed(sender, instance, **kwargs):
+    # Deleting an item deletes its reviews, which refresh the facets themselves
+    _restaurant_changed(
+        Menu.objects.filter(pk=instance.menu_id).values_list('restaurant_id', flat=True).first(),
+        facets=False,
+    )
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    _restaurant_changed(
+        MenuItem.objects.filter(pk=instance.menu_item_id).values_list('menu__restaurant_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and 'username' not in update_fields:
+        # e.g. last_login on every sign-in
+        return
+    refresh_entry(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, **kwargs):
+    refresh_entry(instance.user_id)
+
+
+def _taste_changed(user_id):
+    if user_id:
+        # However many of their rows change, one recomputation is queued
+        enqueue(refresh_taste, user_id, unique_key=f'taste:{user_id}')
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_taste_changed(sender, instance, **kwargs):
+    _taste_changed(instance.user_id)
+
+
+@receiver(post_save, sender=RestaurantList)
+@receiver(post_delete, sender=RestaurantList)
+def favourite_taste_changed(sender, instance, **kwargs):
+    if instance.list_type == 'favorite':
+        _taste_changed(instance.user_id)
@@ -0,0 +1,139 @@
+"""
+"People who saved this also saved…" for the restaurant detail page.
+
+Every place a restaurant can be saved is a basket: a user's favourites and
+want-to-try entries (one basket per user, favourites weighing more) and
+each custom restaurant list. Two restaurants are similar when they share
+baskets, scored as the weighted co-occurrence normalised by how often each
+is saved, so popular places do not top every list. The score is then
+nudged towards the same cuisine and, when both have coordinates, towards
+places nearby.
+
+``compute_similar_restaurants`` scores every restaurant in one batch over
+CSR arrays (see restaurants.sparse) and stores the top ``TOP_K`` in
+SimilarRestaurant, so the detail page reads them with one indexed lookup.
+"""
+import time
+from typing import Tuple
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import SIMILAR_KEY, bump_stamp
+from .models import CustomListItem, Restaurant, RestaurantList, SimilarRestaurant
+from .sparse import CSR
+
+TOP_K = 12
+SAVE_WEIGHTS = {'favorite': 1.0, 'want_to_try': 0.5, 'custom_list': 0.75}
+# Lists bigger than this are directories rather than taste and are skipped
+MAX_BASKET_SIZE = 200
+# Multiplier on the co-occurrence score of places with the same cuisine
+SAME_CUISINE_BOOST = 1.25
+# The distance multiplier runs from 1 next door down to 0.5 far away, closing
+# half the remaining gap every DISTANCE_HALF_KM
+DISTANCE_HALF_KM = 25.0
+
+
+def _haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = (np.radians(value) for value in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 6371.0 * 2 * np.arcsin(np.sqrt(a))
+
+
+def _baskets():
+    """(basket key, restaurant pk, weight) for every save."""
+    saves = {}
+    for user_id, restaurant_id, list_type in RestaurantList.objects.filter(
+        restaurant__deleted_at__isnull=True,
+    ).values_list('user_id', 'restaurant_id', 'list_type'):
+        key = ('user', user_id, restaurant_id)
+        saves[key] = max(saves.get(key, 0.0), SAVE_WEIGHTS.get(list_type, 0.0))
+    for list_id, restaurant_id in CustomListItem.objects.filter(
+        restaurant__isnull=False, restaurant__deleted_at__isnull=True, custom_list__list_type='restaurant',
+    ).values_list('custom_list_id', 'restaurant_id'):
+        saves[('list', list_id, restaurant_id)] = SAVE_WEIGHTS['custom_list']
+    baskets = {}
+    rows = []
+    for (kind, owner, restaurant_id), weight in saves.items():
+        basket = baskets.setdefault((kind, owner), len(baskets))
+        rows.append((basket, restaurant_id, weight))
+    return rows, len(baskets)
+
+
+def compute_similar_restaurants(top_k: int = TOP_K) -> Tuple[int, float]:
+    """Recompute and store every restaurant's neighbours; returns (rows written, seconds)."""
+    started = time.perf_counter()
+    computed_at = timezone.now()
+    rows, n_baskets = _baskets()
+    restaurants = list(Restaurant.objects.values_list('pk', 'cuisine_type', 'lat', 'lng'))
+    restaurant_ids = np.array(sorted(row[0] for row in restaurants), dtype=np.int64)
+    info = {row[0]: row[1:] for row in restaurants}
+    n = len(restaurant_ids)
+
+    baskets = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    saved_ids = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+    items = np.searchsorted(restaurant_ids, saved_ids)
+    weights = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    # Saves of restaurants deleted since the baskets were read would land
+    # on the next pk
+    known = items < n
+    known[known] = restaurant_ids[items[known]] == saved_ids[known]
+    baskets, items, weights = baskets[known], items[known], weights[known]
+    if len(baskets):
+        keep = np.bincount(baskets, minlength=n_baskets)[baskets] <= MAX_BASKET_SIZE
+        baskets, items, weights = baskets[keep], items[keep], weights[keep]
+    by_basket = CSR(baskets, items, n_baskets, weights)
+    by_item = CSR(items, baskets, n, weights)
+    popularity = np.sqrt(np.bincount(items, weights=weights ** 2, minlength=n))
+
+    cuisine_codes = np.unique(np.array([info[pk][0] for pk in restaurant_ids], dtype=str), return_inverse=True)[1].reshape(-1)
+    coordinates = np.array([
+        (float(info[pk][1]), float(info[pk][2])) if info[pk][1] is not None and info[pk][2] is not None else (np.nan, np.nan)
+        for pk in restaurant_ids
+    ], dtype=np.float64).reshape(-1, 2)
+
+    results = []
+    for item in range(n):
+        containing = by_item.row(item)
+        if not len(containing):
+            continue
+        positions = by_basket.positions(containing)
+        others = by_basket.indices[positions]
+        products = by_basket.values[positions] * np.repeat(by_item.row_values(item), by_basket.lengths(containing))
+        unique, inverse = np.unique(others, return_inverse=True)
+        scores = np.bincount(inverse, weights=products) / (popularity[unique] * popularity[item] + 1e-12)
+        shared = np.bincount(inverse)
+        scores[unique == item] = 0
+
+        scores *= np.where(cuisine_codes[unique] == cuisine_codes[item], SAME_CUISINE_BOOST, 1.0)
+        distance = _haversine_km(coordinates[item, 0], coordinates[item, 1], coordinates[unique, 0], coordinates[unique, 1])
+        # Unknown distances (nan) leave the score alone
+        scores *= np.where(np.isnan(distance), 1.0, 0.5 + 0.5 * np.exp2(-np.nan_to_num(distance) / DISTANCE_HALF_KM))
+
+        best = np.flatnonzero(scores > 0)
+        if len(best) > top_k:
+            best = best[np.argpartition(-scores[best], top_k - 1)[:top_k]]
+        best = best[np.lexsort((unique[best], -scores[best]))]
+        results.extend(
+            SimilarRestaurant(
+                restaurant_id=int(restaurant_ids[item]), similar_id=int(restaurant_ids[unique[i]]),
+                rank=rank, score=round(float(scores[i]), 4), shared_saves=int(shared[i]), computed_at=computed_at,
+            )
+            for rank, i in enumerate(best, start=1)
+        )
+
+    with transaction.atomic():
+        SimilarRestaurant.objects.all().delete()
+        SimilarRestaurant.objects.bulk_create(results, batch_size=1000)
+    # Cached restaurant pages show the neighbours
+    bump_stamp(SIMILAR_KEY)
+    return len(results), time.perf_counter() - started
+
+
+def similar_restaurants(restaurant_id: int, limit: int = 6):
+    return (
+        SimilarRestaurant.objects.filter(restaurant_id=restaurant_id, similar__deleted_at__isnull=True)
+        .select_related('similar')
+        .order_by('rank')[:limit]
+    )
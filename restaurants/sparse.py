@@ -0,0 +1,57 @@
+"""
+Compact sparse matrices for the offline recommendation jobs.
+
+Rows are stored CSR-style: an ``indptr`` offsets array and a flat
+``indices`` array of dense integer column ids, with an optional parallel
+``values`` array. Gathering many rows at once is a handful of vectorized
+array operations, which is what keeps the batch jobs fast without pulling
+in scipy.
+"""
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+
+class CSR:
+    """Rows of a sparse matrix: row ``r`` holds ``indices[indptr[r]:indptr[r + 1]]``."""
+
+    def __init__(self, rows: np.ndarray, cols: np.ndarray, n_rows: int, values: Optional[np.ndarray] = None):
+        order = np.argsort(rows, kind='stable')
+        self.indices = cols[order]
+        self.values = values[order] if values is not None else None
+        self.indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=self.indptr[1:])
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    def row(self, r: int) -> np.ndarray:
+        return self.indices[self.indptr[r]:self.indptr[r + 1]]
+
+    def row_values(self, r: int) -> np.ndarray:
+        return self.values[self.indptr[r]:self.indptr[r + 1]]
+
+    def lengths(self, rows: np.ndarray) -> np.ndarray:
+        return self.indptr[rows + 1] - self.indptr[rows]
+
+    def positions(self, rows: np.ndarray) -> np.ndarray:
+        """Offsets into ``indices``/``values`` of every element of the given rows, in order."""
+        if not len(rows):
+            return np.zeros(0, dtype=np.int64)
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        # Without a Python loop: each row's start, shifted back by where its
+        # block begins in the output, plus a running counter
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    def gather(self, rows: np.ndarray) -> np.ndarray:
+        """Concatenation of the given rows."""
+        return self.indices[self.positions(rows)]
+
+
+def dense_ids(ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted distinct primary keys and each input's position among them."""
+    ids = np.fromiter(ids, dtype=np.int64)
+    unique, inverse = np.unique(ids, return_inverse=True)
+    return unique, inverse.reshape(-1)
@@ -0,0 +1,222 @@
+"""
+Storage backends: content-addressed media and compressed static bundles.
+
+Uploads are named by the SHA-256 of their bytes, so identical photos are
+written to disk once and shared by every row that references them. Each
+stored file has a MediaBlob row that keeps a reference count and a
+perceptual hash used to find near-duplicate photos.
+"""
+import gzip
+import hashlib
+import os
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from django.contrib.staticfiles.storage import HashedFilesMixin, ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+if TYPE_CHECKING:
+    from .models import MediaBlob
+
+PHASH_BANDS = 4
+PHASH_BAND_BITS = 64 // PHASH_BANDS
+# With four 16-bit bands, any two hashes within this Hamming distance share
+# at least one band exactly (pigeonhole), so the band lookup can't miss them.
+NEAR_DUPLICATE_DISTANCE = PHASH_BANDS - 1
+
+
+def hash_content(content) -> Tuple[str, int]:
+    """SHA-256 hex digest and size of a File, read in chunks."""
+    sha = hashlib.sha256()
+    size = 0
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        sha.update(chunk)
+        size += len(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return sha.hexdigest(), size
+
+
+def perceptual_hash(content) -> Optional[int]:
+    """
+    64-bit difference hash (dHash) of an image, or None for non-images.
+    Visually similar photos (re-encoded, resized, lightly edited) produce
+    hashes with a small Hamming distance.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        content.seek(0)
+        with Image.open(content) as image:
+            # Let the JPEG decoder downscale while decoding; far cheaper than a full decode
+            image.draft('L', (64, 64))
+            image = ImageOps.exif_transpose(image)
+            small = image.convert('L').resize((9, 8), Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    finally:
+        content.seek(0)
+
+    pixels = small.load()
+    value = 0
+    for y in range(8):
+        for x in range(8):
+            value = (value << 1) | (pixels[x, y] > pixels[x + 1, y])
+    return value
+
+
+def phash_fields(phash: Optional[int]) -> dict:
+    """Column values for a perceptual hash: the signed 64-bit value plus its bands."""
+    if phash is None:
+        return {}
+    fields = {'phash': phash - (1 << 64) if phash >= 1 << 63 else phash}
+    mask = (1 << PHASH_BAND_BITS) - 1
+    for band in range(PHASH_BANDS):
+        fields[f'phash_band_{band}'] = (phash >> (band * PHASH_BAND_BITS)) & mask
+    return fields
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return ((a ^ b) & ((1 << 64) - 1)).bit_count()
+
+
+def find_similar(phash: int, max_distance: int = NEAR_DUPLICATE_DISTANCE) -> List[Tuple[int, 'MediaBlob']]:
+    """
+    Blobs whose perceptual hash is within ``max_distance`` bits of ``phash``,
+    closest first. Candidates come from indexed band lookups, so this doesn't
+    scan the whole table.
+    """
+    from .models import MediaBlob
+
+    bands = phash_fields(phash)
+    condition = Q()
+    for band in range(PHASH_BANDS):
+        condition |= Q(**{f'phash_band_{band}': bands[f'phash_band_{band}']})
+    matches = []
+    for blob in MediaBlob.objects.filter(condition):
+        distance = hamming_distance(phash, blob.phash)
+        if distance <= max_distance:
+            matches.append((distance, blob))
+    matches.sort(key=lambda match: match[0])
+    return matches
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that stores each distinct upload once.
+
+    ``upload_to`` is kept as a prefix, so a review photo becomes
+    ``review_images/ab/abcdef....jpg``. Saving bytes that already exist only
+    bumps the blob's reference count; ``delete()`` releases a reference and
+    removes the file when nothing points at it anymore.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Two uploads of the same bytes may race to write the same name; the
+        # content is identical, so letting the second one overwrite is safe.
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(*args, **kwargs)
+
+    def content_name(self, name: str, digest: str) -> str:
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], f"{digest}{ext}")
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        digest, size = hash_content(content)
+        hashed_name = self.content_name(name, digest)
+
+        blob = MediaBlob.objects.filter(sha256=digest).first()
+        if blob is None:
+            try:
+                with transaction.atomic():
+                    blob = MediaBlob.objects.create(
+                        sha256=digest,
+                        name=hashed_name,
+                        size=size,
+                        **phash_fields(perceptual_hash(content)),
+                    )
+            except IntegrityError:
+                blob = MediaBlob.objects.get(sha256=digest)
+
+        if not self.exists(blob.name):
+            super()._save(blob.name, content)
+        MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return blob.name
+
+    def delete(self, name):
+        from .models import MediaBlob
+
+        if not name:
+            return
+        blob = MediaBlob.objects.filter(name=name).first()
+        if blob is None:
+            # Files from before content addressing are left alone, as they
+            # always were; the dedupe_media command migrates them.
+            return
+        MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+        # Only the caller that drops the last reference removes the file
+        if MediaBlob.objects.filter(pk=blob.pk, ref_count__lte=0).delete()[0]:
+            self.purge(name)
+
+    def purge(self, name):
+        """Remove a file and its image variants without touching reference counts."""
+        from .images import FORMATS, VARIANTS, variant_name
+
+        super().delete(name)
+        for variant in VARIANTS:
+            for fmt in FORMATS:
+                super().delete(variant_name(name, variant, fmt))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage (content-hashed static names) that also writes
+    precompressed ``.gz`` and ``.br`` siblings during collectstatic, so the
+    static middleware can serve them without compressing per request.
+    """
+    compress_extensions = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.ico')
+    # Below this, compression overhead outweighs the saving
+    min_compress_size = 256
+
+    def url(self, name, force=False):
+        if not self.hashed_files and not force:
+            # Nothing collected yet (development, tests): use the source names
+            return super(HashedFilesMixin, self).url(name)
+        return super().url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if name.endswith(self.compress_extensions):
+                for compressed in self.compress(name):
+                    yield name, compressed, True
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < self.min_compress_size:
+            return
+        # mtime=0 keeps the .gz output identical between builds
+        gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(gzipped) < len(data):
+            with open(f"{path}.gz", 'wb') as f:
+                f.write(gzipped)
+            yield f"{name}.gz"
+        try:
+            import brotli
+        except ImportError:
+            return
+        brotlied = brotli.compress(data, quality=11)
+        if len(brotlied) < len(data):
+            with open(f"{path}.br", 'wb') as f:
+                f.write(brotlied)
+            yield f"{name}.br"
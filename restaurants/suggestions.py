@@ -0,0 +1,149 @@
+"""
+"People you may know" follow suggestions.
+
+Candidates for a user are scored by four overlaps, each an intersection
+count between two users' adjacency lists:
+
+* followees they share with the user,
+* how many of the user's followees follow them (friend of a friend),
+* restaurants both have favourited,
+* dishes both have reviewed.
+
+``compute_suggestions`` scores everyone in one batch. Each relation is
+loaded once into CSR form (see restaurants.sparse) together with its
+transpose, so a user's two-hop neighbourhood is a concatenation of array
+slices and the overlap counts fall out of one ``np.unique``. Only the top
+``TOP_K`` candidates are stored, ranked, in FollowSuggestion, so serving
+them is one indexed read of ``(user, rank)``.
+"""
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Follow, FollowSuggestion, RestaurantList, Review
+from .sparse import CSR
+
+TOP_K = 20
+WEIGHTS = {
+    'shared_followees': 1.0,
+    'followed_by_followees': 2.0,
+    'shared_restaurants': 0.5,
+    'shared_dishes': 0.5,
+}
+# Accounts, restaurants and dishes shared by more people than this say little
+# about taste and would make every two-hop neighbourhood huge, so overlaps
+# through them are not counted
+MAX_ITEM_DEGREE = 1000
+
+
+class Relation:
+    """A bipartite relation (user -> item) and its transpose (item -> users)."""
+
+    def __init__(self, users: np.ndarray, items: np.ndarray, n_users: int, max_item_degree: int = MAX_ITEM_DEGREE):
+        items = items.astype(np.int64)
+        n_items = int(items.max()) + 1 if len(items) else 0
+        self.forward = CSR(users, items, n_users)
+        if len(items):
+            # Popular items stay in the forward rows but link nobody
+            keep = np.bincount(items, minlength=n_items)[items] <= max_item_degree
+            users, items = users[keep], items[keep]
+        self.backward = CSR(items, users, n_items)
+
+    def two_hop(self, user: int) -> np.ndarray:
+        """Users sharing an item with ``user``, once per shared item."""
+        return self.backward.gather(self.forward.row(user))
+
+
+def _dense_pairs(pairs: Iterable[Tuple[int, int]], user_ids: np.ndarray, items_are_users: bool = False):
+    """Map (user pk, item pk) pairs onto dense indices."""
+    pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+    users = np.searchsorted(user_ids, pairs[:, 0])
+    if items_are_users:
+        items = np.searchsorted(user_ids, pairs[:, 1])
+    else:
+        items = np.unique(pairs[:, 1], return_inverse=True)[1].reshape(-1)
+    return users, items
+
+
+def score_all(follows: Relation, favourites: Relation, dishes: Relation, n_users: int,
+              top_k: int = TOP_K) -> Dict[int, List[Tuple[int, float, Dict[str, int]]]]:
+    """
+    Top ``top_k`` candidates for every user as ``(candidate, score, parts)``,
+    all in dense indices. ``follows`` is the user -> followee relation.
+    """
+    results = {}
+    for user in range(n_users):
+        followees = follows.forward.row(user)
+        signals = {
+            'shared_followees': follows.two_hop(user),
+            'followed_by_followees': follows.forward.gather(followees),
+            'shared_restaurants': favourites.two_hop(user),
+            'shared_dishes': dishes.two_hop(user),
+        }
+        candidates = np.concatenate(list(signals.values()))
+        if not len(candidates):
+            continue
+        kinds = np.repeat(np.arange(len(signals)), [len(hits) for hits in signals.values()])
+        unique, inverse = np.unique(candidates, return_inverse=True)
+        # counts[signal, candidate]: the overlap of each kind with each candidate
+        counts = np.bincount(
+            kinds * len(unique) + inverse.reshape(-1), minlength=len(signals) * len(unique),
+        ).reshape(len(signals), len(unique))
+        scores = np.array(list(WEIGHTS.values())) @ counts
+
+        # Never suggest the user or someone they already follow
+        scores[np.isin(unique, followees) | (unique == user)] = 0
+        best = np.flatnonzero(scores > 0)
+        if len(best) > top_k:
+            best = best[np.argpartition(-scores[best], top_k - 1)[:top_k]]
+        best = best[np.lexsort((unique[best], -scores[best]))]
+        results[user] = [
+            (int(unique[i]), float(scores[i]), {name: int(counts[k, i]) for k, name in enumerate(signals)})
+            for i in best
+        ]
+    return results
+
+
+def compute_suggestions(top_k: int = TOP_K, batch_size: int = 1000) -> Tuple[int, float]:
+    """Recompute and store everyone's suggestions; returns (rows written, seconds)."""
+    started = time.perf_counter()
+    user_ids = np.array(sorted(get_user_model().objects.values_list('pk', flat=True)), dtype=np.int64)
+    n_users = len(user_ids)
+
+    follows = Relation(*_dense_pairs(
+        Follow.objects.values_list('follower_id', 'following_id'), user_ids, items_are_users=True,
+    ), n_users)
+    favourites = Relation(*_dense_pairs(
+        RestaurantList.objects.filter(list_type='favorite').values_list('user_id', 'restaurant_id'), user_ids,
+    ), n_users)
+    dishes = Relation(*_dense_pairs(
+        Review.objects.filter(user__isnull=False).values_list('user_id', 'menu_item_id').distinct(), user_ids,
+    ), n_users)
+
+    results = score_all(follows, favourites, dishes, n_users, top_k)
+
+    rows = [
+        FollowSuggestion(
+            user_id=int(user_ids[user]), suggested_id=int(user_ids[candidate]),
+            rank=rank, score=score, **parts,
+        )
+        for user, candidates in results.items()
+        for rank, (candidate, score, parts) in enumerate(candidates, start=1)
+    ]
+    with transaction.atomic():
+        FollowSuggestion.objects.all().delete()
+        FollowSuggestion.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows), time.perf_counter() - started
+
+
+def suggestions_for(user, limit: int = 5):
+    """A user's stored suggestions, best first, minus anyone they have followed or who has left since."""
+    return (
+        FollowSuggestion.objects.filter(user=user, suggested__is_active=True)
+        .exclude(suggested__followers__follower=user)
+        .select_related('suggested__profile')
+        .order_by('rank')[:limit]
+    )
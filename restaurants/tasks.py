@@ -0,0 +1,114 @@
+"""
+Background tasks, run by the ``run_jobs`` worker (see restaurants.jobs).
+
+Workers import this module when they start, which registers the periodic
+batch jobs below; the batch modules themselves are only imported when their
+task runs, since they pull in numpy.
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .db import retry_on_lock
+from .jobs import task
+from .models import Job, MenuItem, Notification, RestaurantList
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Finished jobs are kept this long for job_stats and for looking into failures
+KEEP_FINISHED = timedelta(days=14)
+
+
+@task(priority=10)
+@retry_on_lock
+def notify_favourites(menu_item_id: int, triggered_by_id: int) -> None:
+    """Tell everyone who favourited the dish's restaurant that it has a new menu item."""
+    menu_item = MenuItem.objects.select_related('menu').filter(pk=menu_item_id).first()
+    if menu_item is None:
+        return
+    restaurant_id = menu_item.menu.restaurant_id
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=user_id, notification_type='menu_item_added', restaurant_id=restaurant_id,
+            menu_item=menu_item, triggered_by_id=triggered_by_id,
+        )
+        for user_id in RestaurantList.objects.filter(
+            restaurant_id=restaurant_id, list_type='favorite',
+        ).exclude(user_id=triggered_by_id).values_list('user_id', flat=True)
+    ], batch_size=500)
+
+
+@task(priority=5, max_attempts=2, timeout=2 * MINUTE)
+def build_image_variants(model: str, pk: int, field_name: str, variants_field: str, name: str) -> None:
+    """Build the resized variants of one upload and record them on its row."""
+    from .images import generate_variants
+
+    variants = generate_variants(default_storage.path(name), name, str(settings.MEDIA_ROOT))
+    # Only if the row still points at the same upload
+    apps.get_model(model)._base_manager.filter(pk=pk, **{field_name: name}).update(**{variants_field: variants})
+
+
+@task
+def refresh_taste(user_id: int) -> None:
+    from .taste import refresh_taste_profile
+
+    # The account may have been purged since
+    if get_user_model().objects.filter(pk=user_id).exists():
+        refresh_taste_profile(user_id)
+
+
+@task(priority=-10, timeout=HOUR)
+def purge(purge_job_id: int) -> None:
+    """Run a PurgeJob; one left running by a lost worker carries on from its last step."""
+    from .purge import run_job
+
+    purge_job = run_job(purge_job_id, resume=True)
+    if purge_job.status == 'failed':
+        # Let the queue retry it after a backoff
+        raise RuntimeError(purge_job.error)
+
+
+@task(priority=-5, every=5 * MINUTE)
+def refresh_explore() -> None:
+    from .explore import refresh_snapshot
+
+    refresh_snapshot()
+
+
+@task(priority=-20, timeout=HOUR, every=HOUR)
+def refresh_recommendations_incremental() -> None:
+    from .recommendations import refresh
+
+    refresh(incremental=True)
+
+
+@task(priority=-20, timeout=4 * HOUR, every=DAY)
+def refresh_recommendations() -> None:
+    from .recommendations import refresh
+
+    refresh()
+
+
+@task(priority=-20, timeout=4 * HOUR, every=DAY)
+def refresh_follow_suggestions() -> None:
+    from .suggestions import compute_suggestions
+
+    compute_suggestions()
+
+
+@task(priority=-20, timeout=4 * HOUR, every=DAY)
+def refresh_similar_restaurants() -> None:
+    from .similar import compute_similar_restaurants
+
+    compute_similar_restaurants()
+
+
+@task(priority=-20, every=HOUR)
+def prune_jobs() -> None:
+    Job.objects.filter(finished_at__lt=timezone.now() - KEEP_FINISHED).delete()
@@ -0,0 +1,106 @@
+"""
+Taste profiles.
+
+A user's TasteProfile keeps, per cuisine, how many restaurants they have
+favourited, how many dishes they have reviewed, the sum of those ratings and
+the sum of those dishes' prices. Signal handlers recompute a user's row when
+one of their reviews or favourites changes, which is two grouped queries
+over that user's own rows.
+
+From those sums the profile derives an affinity per cuisine: favourites
+count ``FAVOURITE_WEIGHT`` each, and each review adds how far its rating
+sits above or below ``NEUTRAL_RATING`` (so a cuisine reviewed often but
+rated poorly sinks). The affinities are stored as a unit vector, so the
+compatibility of two people is a dot product of two stored rows.
+"""
+from typing import Dict, List, Optional
+
+from django.db.models import Count, Sum
+
+from .models import Restaurant, RestaurantList, Review, TasteProfile
+
+CUISINES = [value for value, _ in Restaurant.CUISINE_CHOICES]
+FAVOURITE_WEIGHT = 2.0
+NEUTRAL_RATING = 5.5
+# Upper bounds of the average dish price for $, $$ and $$$; anything above is $$$$
+PRICE_LEVELS = [15, 30, 50]
+# Weight of price-level closeness in compatibility; the rest is cuisine taste
+PRICE_WEIGHT = 0.2
+
+
+def _slot(cuisine: str) -> int:
+    return CUISINES.index(cuisine) if cuisine in CUISINES else CUISINES.index('Other')
+
+
+def price_level(average_price) -> Optional[int]:
+    if average_price is None:
+        return None
+    return 1 + sum(average_price > bound for bound in PRICE_LEVELS)
+
+
+def affinity_vector(favourites: List[float], reviews: List[float], rating_sums: List[float]) -> List[float]:
+    affinities = [
+        max(0.0, FAVOURITE_WEIGHT * favourite + (rating_sum - NEUTRAL_RATING * count) / (10 - NEUTRAL_RATING))
+        for favourite, count, rating_sum in zip(favourites, reviews, rating_sums)
+    ]
+    norm = sum(value * value for value in affinities) ** 0.5
+    return [round(value / norm, 4) if norm else 0.0 for value in affinities]
+
+
+def refresh_taste_profile(user_id: int) -> None:
+    """Recompute one user's taste profile from their current reviews and favourites."""
+    size = len(CUISINES)
+    favourites, reviews, rating_sums, price_sums = [0] * size, [0] * size, [0.0] * size, [0.0] * size
+    for row in RestaurantList.objects.filter(user_id=user_id, list_type='favorite').values(
+        'restaurant__cuisine_type',
+    ).annotate(count=Count('pk')).order_by():
+        favourites[_slot(row['restaurant__cuisine_type'])] += row['count']
+    for row in Review.objects.filter(user_id=user_id).values('menu_item__menu__restaurant__cuisine_type').annotate(
+        count=Count('pk'), rating_sum=Sum('rating'), price_sum=Sum('menu_item__price'),
+    ).order_by():
+        slot = _slot(row['menu_item__menu__restaurant__cuisine_type'])
+        reviews[slot] += row['count']
+        rating_sums[slot] += float(row['rating_sum'])
+        price_sums[slot] += float(row['price_sum'])
+
+    total_reviews = sum(reviews)
+    TasteProfile.objects.update_or_create(user_id=user_id, defaults={
+        'favourite_counts': favourites,
+        'review_counts': reviews,
+        'rating_sums': [round(value, 1) for value in rating_sums],
+        'price_sums': [round(value, 2) for value in price_sums],
+        'vector': affinity_vector(favourites, reviews, rating_sums),
+        'price_level': price_level(sum(price_sums) / total_reviews if total_reviews else None),
+    })
+
+
+def breakdown(profile: Optional[TasteProfile], limit: int = 3) -> List[Dict]:
+    """The profile's strongest cuisines with their share of the taste and the average rating given."""
+    if profile is None or not any(profile.vector):
+        return []
+    total = sum(profile.vector)
+    rows = []
+    for slot, weight in enumerate(profile.vector):
+        if weight <= 0:
+            continue
+        count = profile.review_counts[slot]
+        rows.append({
+            'cuisine': CUISINES[slot],
+            'share': round(100 * weight / total),
+            'favourites': profile.favourite_counts[slot],
+            'reviews': count,
+            'avg_rating': round(profile.rating_sums[slot] / count, 1) if count else None,
+        })
+    rows.sort(key=lambda row: -row['share'])
+    return rows[:limit]
+
+
+def compatibility(a: Optional[TasteProfile], b: Optional[TasteProfile]) -> Optional[int]:
+    """How alike two people's tastes are, 0-100, or None when either has no signal yet."""
+    if a is None or b is None or not any(a.vector) or not any(b.vector):
+        return None
+    taste = sum(x * y for x, y in zip(a.vector, b.vector))
+    if a.price_level is None or b.price_level is None:
+        return round(100 * taste)
+    price = 1 - abs(a.price_level - b.price_level) / (len(PRICE_LEVELS))
+    return round(100 * ((1 - PRICE_WEIGHT) * taste + PRICE_WEIGHT * price))
@@ -0,0 +1,43 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from restaurants import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def variant_url(field_file, variants, variant='full', fmt='jpeg'):
+    """URL of a single image variant, e.g. for modals and JSON responses"""
+    return images.variant_url(field_file, variants, variant, fmt)
+
+
+@register.simple_tag
+def responsive_image(field_file, variants, variant='card', sizes=None, **attrs):
+    """
+    Render a <picture> with a WebP source and a JPEG fallback for an uploaded
+    image. Falls back to the original upload until its variants are ready.
+
+    Usage: {% responsive_image review.image review.image_variants 'card' alt="Review photo" style="..." %}
+    """
+    if not field_file:
+        return ''
+    # Template kwargs can't contain hyphens, so data_full=... becomes data-full
+    attrs = {key.replace('_', '-') if key.startswith('data_') else key: value for key, value in attrs.items()}
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    webp_srcset = images.srcset(variants, variant, 'webp')
+    if not webp_srcset:
+        return format_html('<img src="{}"{}>', field_file.url, flatatt(attrs))
+
+    if sizes is None:
+        sizes = f"{images.VARIANTS[variant][0]}px"
+    img_attrs = dict(attrs, srcset=images.srcset(variants, variant, 'jpeg'), sizes=sizes)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}"><img src="{}"{}></picture>',
+        webp_srcset,
+        sizes,
+        images.variant_url(field_file, variants, variant),
+        flatatt(img_attrs),
+    )
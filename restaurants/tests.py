@@ -1,3 +1,1225 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from datetime import time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from posts.models import Post
+
+from . import explore, images, menus, purge, ranking, recommendations, taste
+from .cache import fragment_stats, render_restaurant_cards
+from .comments import MAX_DEPTH, comment_page, cursor, latest_comments, parse_cursor, subtree
+from .counters import (
+    add_follow, add_like, comment_on, reconcile_affinities, reconcile_engagement_counts, reconcile_follow_counts,
+    remove_comment, remove_follow, remove_like,
+)
+from .db import retry_on_lock
+from .facets import facet_counts, search_restaurants
+from .hot_queries import HOT_QUERIES, explain, full_scans
+from .jobs import enqueue, run_next, task
+from .management.commands.dedupe_media import format_bytes
+from .metrics import overrun_counts
+from .middleware import FAR_FUTURE, SHORT_LIVED, StaticAssetMiddleware
+from .models import (
+    Affinity, Comment, Follow, FollowSuggestion, HappyHour, Job, MediaBlob, Menu, MenuItem, Profile, Restaurant,
+    RestaurantList, Review, ReviewLike, SimilarRestaurant, TasteProfile,
+)
+from .routers import PIN_COOKIE, ReplicaPinMiddleware, replicate, routing_scope
+from .similar import compute_similar_restaurants
+from .storage import NEAR_DUPLICATE_DISTANCE, find_similar, hamming_distance, perceptual_hash, phash_fields
+from .suggestions import compute_suggestions
+from .user_search import refresh_entry, search_users
+
+REPLICA = 'replica'
+
+
+def make_restaurant(name, **fields):
+    return Restaurant.objects.create(**{
+        'name': name, 'cuisine_type': 'Thai', 'address_line1': f'1 {name} St', 'city': 'Ottawa',
+        'province': 'ON', 'postal_code': 'K1A 0A1', 'country': 'Canada', **fields,
+    })
+
+
+def make_image(name='photo.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+def make_dish(restaurant, name='Curry'):
+    return MenuItem.objects.create(menu=Menu.objects.get_or_create(restaurant=restaurant)[0], name=name, price=12)
+
+
+class ReplicationLag:
+    """
+    Stands in for asynchronous replication between two SQLite files: the
+    replica only sees the primary as it was at the last ``catch_up()``.
+    """
+
+    def __init__(self, alias=REPLICA):
+        self.alias = alias
+
+    def catch_up(self):
+        replicate(self.alias)
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTests(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # A second SQLite file for this class only. The lag simulator fills it
+        # from the primary, so it is kept out of the runner's database setup.
+        cls.databases = {'default', REPLICA}
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings[REPLICA] = connections.configure_settings({
+            'default': connections.settings['default'],
+            REPLICA: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3')},
+        })[REPLICA]
+        cls.addClassCleanup(cls.remove_replica)
+        super().setUpClass()
+
+    @classmethod
+    def remove_replica(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls.replica_dir)
+
+    def setUp(self):
+        self.enterContext(routing_scope())
+        self.lag = ReplicationLag()
+        self.lag.catch_up()
+        self.user = get_user_model().objects.create_user('writer', password='pw')
+        self.factory = RequestFactory()
+
+    def create_restaurant(self, name):
+        return Restaurant.objects.create(
+            name=name, cuisine_type='Thai', address_line1=f'{name} St', city='Ottawa',
+            province='ON', postal_code='K1A 0A1', country='Canada',
+        )
+
+    def test_writes_go_to_primary_and_reads_to_lagging_replica(self):
+        restaurant = self.create_restaurant('Basil')
+        self.assertEqual(restaurant._state.db, 'default')
+        self.assertTrue(Restaurant.objects.using('default').filter(pk=restaurant.pk).exists())
+
+        # The writer now reads from the primary and sees its row
+        self.assertTrue(Restaurant.objects.filter(pk=restaurant.pk).exists())
+
+        with routing_scope():
+            # Anyone else reads the lagging replica until it catches up
+            self.assertFalse(Restaurant.objects.filter(pk=restaurant.pk).exists())
+            self.lag.catch_up()
+            self.assertEqual(Restaurant.objects.get(pk=restaurant.pk)._state.db, REPLICA)
+
+    def test_reads_inside_a_transaction_use_primary(self):
+        with transaction.atomic():
+            restaurant = self.create_restaurant('Lime')
+            self.assertTrue(Restaurant.objects.filter(pk=restaurant.pk).exists())
+
+    def test_write_pins_the_rest_of_the_request_and_sets_cookie(self):
+        seen = {}
+
+        def write_view(request):
+            restaurant = self.create_restaurant('Chili')
+            seen['visible'] = Restaurant.objects.filter(pk=restaurant.pk).exists()
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(write_view)(self.factory.post('/'))
+        self.assertTrue(seen['visible'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_pinned_client_reads_its_own_write_before_replica_catches_up(self):
+        self.create_restaurant('Ginger')
+
+        def list_view(request):
+            return HttpResponse(','.join(Restaurant.objects.values_list('name', flat=True)))
+
+        middleware = ReplicaPinMiddleware(list_view)
+        unpinned = middleware(self.factory.get('/'))
+        self.assertEqual(unpinned.content, b'')
+        self.assertNotIn(PIN_COOKIE, unpinned.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(middleware(request).content, b'Ginger')
+
+        self.lag.catch_up()
+        self.assertEqual(middleware(self.factory.get('/')).content, b'Ginger')
+
+    def test_lookups_that_write_nothing_do_not_pin(self):
+        Profile.objects.create(user=self.user)
+
+        def profile_view(request):
+            Profile.objects.get_or_create(user=self.user)
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(profile_view)(self.factory.get('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'router_test_cache',
+    }})
+    def test_cache_writes_do_not_pin(self):
+        # Created after the replica last caught up, so only the primary has it
+        call_command('createcachetable', verbosity=0)
+
+        def cached_view(request):
+            cache.set('visits', 1)
+            cache.incr('visits')
+            return HttpResponse(cache.get('visits'))
+
+        response = ReplicaPinMiddleware(cached_view)(self.factory.get('/'))
+        self.assertEqual(response.content, b'2')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        restaurant = self.create_restaurant('Mint')
+        self.assertTrue(Restaurant.objects.filter(pk=restaurant.pk).exists())
+        response = ReplicaPinMiddleware(lambda request: HttpResponse())(self.factory.post('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class HotQueryPlanTests(TestCase):
+    def test_hot_queries_do_not_scan_whole_tables(self):
+        for name, build in HOT_QUERIES.items():
+            with self.subTest(query=name):
+                plan = explain(build())
+                self.assertEqual(full_scans(plan), [], f"{name} scans a whole table:\n{plan}")
+
+    def test_full_scan_detection(self):
+        self.assertEqual(full_scans('2 0 0 SCAN restaurants_review'), ['restaurants_review'])
+        self.assertEqual(full_scans('5 0 0 SCAN restaurants_restaurant USING INDEX restaurant_created_idx'), [])
+        self.assertEqual(full_scans('3 0 0 SEARCH restaurants_review USING INDEX review_created_idx (created_at>?)'), [])
+
+
+@task(max_attempts=2)
+def failing_task():
+    raise ValueError('boom')
+
+
+@task
+def requeueing_task():
+    enqueue(requeueing_task, unique_key='again')
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def test_failed_job_is_retried_after_a_backoff_then_given_up(self):
+        job = enqueue(failing_task)
+        with self.assertLogs('restaurants.jobs', 'ERROR'):
+            self.assertEqual(run_next('worker'), job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.error)
+
+        # Not due yet
+        self.assertIsNone(run_next('worker'))
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('restaurants.jobs', 'ERROR'):
+            run_next('worker')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_claimed_job_is_not_handed_out_twice(self):
+        from .jobs import _claim
+        job = enqueue(failing_task)
+        self.assertEqual(_claim('first'), job)
+        self.assertIsNone(_claim('second'))
+
+    def test_unique_key_keeps_one_queued_job(self):
+        first = enqueue(failing_task, unique_key='once')
+        self.assertEqual(enqueue(failing_task, unique_key='once'), first)
+        self.assertEqual(Job.objects.filter(unique_key='once').count(), 1)
+
+    def test_retry_folds_into_a_job_queued_under_the_same_key(self):
+        job = enqueue(requeueing_task, unique_key='again')
+        with self.assertLogs('restaurants.jobs', 'ERROR'):
+            run_next('worker')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('boom', job.error)
+        self.assertEqual(Job.objects.filter(unique_key='again', status='queued').count(), 1)
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(
+            name='Basil', cuisine_type='Thai', address_line1='1 Basil St', city='Ottawa',
+            province='ON', postal_code='K1A 0A1', country='Canada',
+        )
+        self.item = MenuItem.objects.create(menu=Menu.objects.create(restaurant=self.restaurant), name='Curry', price=12)
+        self.url = f'/restaurants/{self.restaurant.pk}/menu/'
+
+    def get(self, url, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **extra)
+        return response, len(queries)
+
+    def test_repeat_visit_runs_no_queries_until_a_review_is_written(self):
+        first, _ = self.get(self.url)
+        repeat, queries = self.get(self.url)
+        self.assertEqual(queries, 0)
+        self.assertEqual(repeat.content, first.content)
+
+        self.assertNotIn(b'3.0', first.content)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(menu_item=self.item, rating=3)
+        fresh, queries = self.get(self.url)
+        self.assertGreater(queries, 0)
+        self.assertIn(b'3.0', fresh.content)
+
+    def test_equivalent_query_strings_share_an_entry(self):
+        self.get('/restaurants/?q=basil&cuisine_type=Thai&cuisine_type=Asian')
+        _, queries = self.get('/restaurants/?cuisine_type=Asian&cuisine_type=Thai&q=basil&page=1')
+        self.assertEqual(queries, 0)
+        # Parameters the cache does not know about always reach the view
+        _, queries = self.get('/restaurants/?sort=name')
+        self.assertGreater(queries, 0)
+
+    def test_signed_in_visitors_are_not_served_from_the_cache(self):
+        self.get(self.url)
+        self.client.force_login(get_user_model().objects.create_user('reader', password='pw'))
+        _, queries = self.get(self.url)
+        self.assertGreater(queries, 0)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_user('reader', password='pw'))
+
+    def test_server_timing_reports_the_queries_run(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/notifications/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn(f'desc="{len(queries)} queries', response['Server-Timing'])
+
+    def test_overruns_are_counted_per_view(self):
+        with self.assertLogs('restaurants.metrics', 'INFO') as logs, override_settings(QUERY_BUDGETS={'notifications': 1}):
+            self.client.get('/notifications/')
+            self.client.get('/notifications/')
+        self.assertEqual(overrun_counts(), {'notifications': 2})
+        self.assertEqual(sum(record.levelname == 'WARNING' for record in logs.records), 2)
+
+
+class SimilarRestaurantTests(TestCase):
+    def setUp(self):
+        self.first, self.middle, self.last = (make_restaurant(name) for name in ('Basil', 'Clove', 'Dill'))
+        for i in range(3):
+            user = get_user_model().objects.create_user(f'saver{i}', password='pw')
+            for restaurant in (self.first, self.middle, self.last):
+                RestaurantList.objects.create(user=user, restaurant=restaurant, list_type='favorite')
+
+    def shared_saves(self, restaurant, similar):
+        return SimilarRestaurant.objects.get(restaurant=restaurant, similar=similar).shared_saves
+
+    def test_saves_of_deleted_restaurants_are_ignored(self):
+        Restaurant.objects.filter(pk=self.middle.pk).update(deleted_at=timezone.now())
+        compute_similar_restaurants()
+        self.assertEqual(self.shared_saves(self.first, self.last), 3)
+        self.assertFalse(SimilarRestaurant.objects.filter(similar=self.middle).exists())
+
+        Restaurant.objects.filter(pk=self.last.pk).update(deleted_at=timezone.now())
+        compute_similar_restaurants()
+        self.assertFalse(SimilarRestaurant.objects.exists())
+
+
+class FollowSuggestionTests(TestCase):
+    def test_friends_of_friends_and_shared_dishes_are_suggested(self):
+        reader, friend, friend_of_friend, diner = (
+            get_user_model().objects.create_user(name, password='pw') for name in ('reader', 'friend', 'fof', 'diner')
+        )
+        Follow.objects.create(follower=reader, following=friend)
+        Follow.objects.create(follower=friend, following=friend_of_friend)
+        dish = MenuItem.objects.create(menu=Menu.objects.create(restaurant=make_restaurant('Basil')), name='Curry', price=12)
+        Review.objects.create(menu_item=dish, user=reader, rating=4)
+        Review.objects.create(menu_item=dish, user=diner, rating=5)
+        # Private reviews are stored without their author
+        Review.objects.create(menu_item=dish, user=None, rating=3)
+
+        compute_suggestions()
+        suggestions = {row.suggested: row for row in FollowSuggestion.objects.filter(user=reader)}
+        self.assertEqual(set(suggestions), {friend_of_friend, diner})
+        self.assertEqual(suggestions[friend_of_friend].followed_by_followees, 1)
+        self.assertEqual(suggestions[diner].shared_dishes, 1)
+
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        self.author, self.fan, self.follower = (
+            get_user_model().objects.create_user(name, password='pw') for name in ('author', 'fan', 'follower')
+        )
+        self.doomed = make_restaurant('Basil')
+        self.kept = make_restaurant('Clove')
+        self.doomed_review = Review.objects.create(menu_item=make_dish(self.doomed), user=self.author, rating=4)
+        self.kept_review = Review.objects.create(menu_item=make_dish(self.kept), user=self.author, rating=4)
+        for review in (self.doomed_review, self.kept_review):
+            add_like(review, self.fan)
+            comment = comment_on(review, self.fan, 'Good')
+            comment_on(review, self.author, 'Thanks', parent=comment)
+
+    def assertCountersConsistent(self):
+        self.assertEqual(reconcile_engagement_counts(), 0)
+        self.assertEqual(reconcile_affinities(), 0)
+        self.assertEqual(reconcile_follow_counts(), 0)
+
+    def test_soft_deleted_restaurant_is_hidden_then_purged(self):
+        job = purge.soft_delete(self.doomed)
+        self.assertFalse(Restaurant.objects.filter(pk=self.doomed.pk).exists())
+        self.assertFalse(MenuItem.objects.filter(menu__restaurant=self.doomed).exists())
+        self.assertTrue(Job.objects.filter(name='restaurants.tasks.purge', args=[job.pk]).exists())
+
+        job = purge.run_job(job.pk)
+        self.assertEqual(job.status, 'done')
+        self.assertFalse(Restaurant.all_objects.filter(pk=self.doomed.pk).exists())
+        self.assertFalse(Review.objects.filter(pk=self.doomed_review.pk).exists())
+        self.assertEqual(ReviewLike.objects.get().review, self.kept_review)
+        self.assertEqual(Comment.objects.filter(review=self.kept_review).count(), 2)
+        affinity = Affinity.objects.get(user=self.fan, author=self.author)
+        self.assertEqual((affinity.likes, affinity.comments), (1, 1))
+        self.assertCountersConsistent()
+
+    def test_purged_account_leaves_other_counters_right(self):
+        add_follow(self.fan, self.author)
+        add_follow(self.follower, self.fan)
+        job = purge.run_job(purge.soft_delete(self.fan).pk)
+        self.assertEqual(job.status, 'done')
+        self.assertFalse(get_user_model().objects.filter(pk=self.fan.pk).exists())
+
+        # The fan's comments took the author's replies with them
+        self.kept_review.refresh_from_db()
+        self.assertEqual((self.kept_review.like_count, self.kept_review.comment_count), (0, 0))
+        self.assertEqual(Profile.objects.get(user=self.author).followers_count, 0)
+        self.assertEqual(Profile.objects.get(user=self.follower).following_count, 0)
+        self.assertCountersConsistent()
+
+    def test_failed_job_resumes_from_its_step(self):
+        run_batch = purge._run_batch
+        calls = []
+
+        def fail_on_third(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError('disk full')
+            return run_batch(*args)
+
+        job = purge.soft_delete(self.doomed)
+        with mock.patch.object(purge, '_run_batch', fail_on_third), self.assertLogs('restaurants.purge', 'ERROR'):
+            job = purge.run_job(job.pk)
+        self.assertEqual(job.status, 'failed')
+        self.assertGreater(job.step, 0)
+        self.assertTrue(Restaurant.all_objects.filter(pk=self.doomed.pk).exists())
+
+        failed_at = job.step
+        with mock.patch.object(purge, '_run_batch', wraps=run_batch) as batches:
+            job = purge.run_job(job.pk)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(batches.call_args_list[0].args[:3], purge.plan(Restaurant)[failed_at])
+        self.assertFalse(Restaurant.all_objects.filter(pk=self.doomed.pk).exists())
+        self.assertCountersConsistent()
+
+
+class FollowCounterTests(TestCase):
+    def setUp(self):
+        self.fan, self.star = (get_user_model().objects.create_user(name, password='pw') for name in ('fan', 'star'))
+
+    def counts(self):
+        return (
+            Profile.objects.get(user=self.fan).following_count,
+            Profile.objects.get(user=self.star).followers_count,
+        )
+
+    def test_following_twice_or_unfollowing_twice_counts_once(self):
+        self.assertTrue(add_follow(self.fan, self.star))
+        self.assertFalse(add_follow(self.fan, self.star))
+        self.assertEqual(self.counts(), (1, 1))
+        self.assertTrue(remove_follow(self.fan, self.star))
+        self.assertFalse(remove_follow(self.fan, self.star))
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reconcile_recounts_from_the_follow_rows(self):
+        add_follow(self.fan, self.star)
+        Profile.objects.filter(user=self.star).update(followers_count=5)
+        self.assertEqual(reconcile_follow_counts(), 1)
+        self.assertEqual(self.counts(), (1, 1))
+        self.assertEqual(reconcile_follow_counts(), 0)
+
+
+class EngagementCounterTests(TestCase):
+    def setUp(self):
+        self.author, self.fan = (get_user_model().objects.create_user(name, password='pw') for name in ('author', 'fan'))
+        self.review = Review.objects.create(menu_item=make_dish(make_restaurant('Basil')), user=self.author, rating=4)
+        self.post = Post.objects.create(post_type='diary', user=self.author, title='Lunch')
+
+    def test_likes_are_set_not_toggled(self):
+        for target in (self.review, self.post):
+            self.assertTrue(add_like(target, self.fan))
+            self.assertFalse(add_like(target, self.fan))
+            self.assertEqual(target.like_count, 1)
+            self.assertTrue(remove_like(target, self.fan))
+            self.assertFalse(remove_like(target, self.fan))
+            self.assertEqual(target.like_count, 0)
+
+    def test_counts_and_affinity_follow_likes_and_comments(self):
+        add_like(self.review, self.fan)
+        comment = comment_on(self.post, self.fan, 'Nice')
+        self.post.refresh_from_db()
+        self.assertEqual((self.review.like_count, self.post.comment_count), (1, 1))
+        affinity = Affinity.objects.get(user=self.fan, author=self.author)
+        self.assertEqual((affinity.likes, affinity.comments), (1, 1))
+
+        remove_comment(self.post, comment)
+        self.assertEqual(self.post.comment_count, 0)
+        self.assertEqual(Affinity.objects.get(user=self.fan, author=self.author).comments, 0)
+
+    def test_counts_of_a_soft_deleted_post_still_follow(self):
+        add_like(self.post, self.fan)
+        comment = comment_on(self.post, self.fan, 'Nice')
+        purge.soft_delete(self.post)
+        # Awaiting purge: likes and comments can still be taken back
+        remove_like(self.post, self.fan)
+        remove_comment(self.post, comment)
+        counts = Post.all_objects.values_list('like_count', 'comment_count').get(pk=self.post.pk)
+        self.assertEqual(counts, (0, 0))
+
+    def test_reconcile_recounts_from_the_rows(self):
+        add_like(self.review, self.fan)
+        Review.objects.filter(pk=self.review.pk).update(like_count=7, comment_count=2)
+        self.assertEqual(reconcile_engagement_counts(), 1)
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.like_count, self.review.comment_count), (1, 0))
+        self.assertEqual(reconcile_engagement_counts(), 0)
+
+
+class CommentPagingTests(TestCase):
+    def setUp(self):
+        self.reader = get_user_model().objects.create_user('reader', password='pw')
+        self.review = Review.objects.create(menu_item=make_dish(make_restaurant('Basil')), rating=4)
+        self.comments = [comment_on(self.review, self.reader, f'Comment {i}') for i in range(7)]
+
+    def test_preview_is_the_newest_comments_oldest_first(self):
+        other = Review.objects.create(menu_item=self.review.menu_item, rating=5)
+        previews = latest_comments(Comment, 'review', [self.review.pk, other.pk], n=3)
+        comments, earlier = previews[self.review.pk]
+        self.assertEqual(comments, self.comments[-3:])
+        self.assertEqual(earlier, cursor(self.comments[-3]))
+        self.assertNotIn(other.pk, previews)
+
+    def test_pages_walk_back_to_the_start_of_the_thread(self):
+        first, earlier = comment_page(self.review.comments.all(), size=3)
+        self.assertEqual(first, self.comments[4:])
+        second, earlier = comment_page(self.review.comments.all(), before=parse_cursor(earlier), size=3)
+        self.assertEqual(second, self.comments[1:4])
+        # Comments added meanwhile do not shift the pages
+        comment_on(self.review, self.reader, 'Late')
+        last, earlier = comment_page(self.review.comments.all(), before=parse_cursor(earlier), size=3)
+        self.assertEqual((last, earlier), (self.comments[:1], None))
+
+    def test_cursor_outlives_its_comment(self):
+        _, earlier = comment_page(self.review.comments.all(), size=3)
+        remove_comment(self.review, self.comments[4])
+        self.client.force_login(self.reader)
+        response = self.client.get(f'/reviews/{self.review.pk}/comments/', {'before': earlier})
+        self.assertEqual(list(response.context['comments']), self.comments[:4])
+        self.assertIsNone(parse_cursor('12-x'))
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.reader = get_user_model().objects.create_user('reader', password='pw')
+        self.review = Review.objects.create(menu_item=make_dish(make_restaurant('Basil')), rating=4)
+
+    def reply(self, parent, text):
+        return comment_on(self.review, self.reader, text, parent=parent)
+
+    def refreshed(self, *comments):
+        return [Comment.objects.get(pk=comment.pk) for comment in comments]
+
+    def test_thread_lists_replies_under_their_parent(self):
+        first = self.reply(None, 'first')
+        second = self.reply(None, 'second')
+        late_reply = self.reply(first, 'reply to first')
+        nested = self.reply(late_reply, 'nested')
+        thread, _ = comment_page(self.review.comments.all())
+        self.assertEqual(thread, [first, late_reply, nested, second])
+        self.assertEqual([comment.depth for comment in thread], [0, 1, 2, 0])
+        self.assertEqual(subtree(self.review.comments.all(), first), [late_reply, nested])
+
+    def test_replies_stop_nesting_at_max_depth(self):
+        comment = self.reply(None, 'root')
+        chain = [comment]
+        for i in range(MAX_DEPTH + 2):
+            comment = self.reply(comment, f'reply {i}')
+            chain.append(comment)
+        self.assertEqual(max(comment.depth for comment in chain), MAX_DEPTH)
+        # Too-deep replies sit alongside the deepest comment, under the same parent
+        self.assertEqual(chain[-1].parent_id, chain[MAX_DEPTH - 1].pk)
+        self.assertEqual(self.refreshed(chain[0])[0].reply_count, MAX_DEPTH + 2)
+
+    def test_removing_a_comment_takes_its_subtree_and_fixes_the_counts(self):
+        root = self.reply(None, 'root')
+        middle = self.reply(root, 'middle')
+        self.reply(self.reply(middle, 'leaf'), 'deeper leaf')
+        sibling = self.reply(root, 'sibling')
+        self.assertEqual(self.refreshed(root)[0].reply_count, 4)
+
+        self.assertEqual(remove_comment(self.review, middle), 3)
+        root, sibling = self.refreshed(root, sibling)
+        self.assertEqual(root.reply_count, 1)
+        self.assertEqual(self.review.comment_count, 2)
+        self.assertEqual(list(self.review.comments.order_by('path')), [root, sibling])
+        self.assertEqual(reconcile_engagement_counts(), 0)
+
+    def test_reconcile_recounts_replies_from_the_paths(self):
+        root = self.reply(None, 'root')
+        self.reply(self.reply(root, 'reply'), 'nested')
+        Comment.objects.filter(pk=root.pk).update(reply_count=9)
+        self.assertEqual(reconcile_engagement_counts(), 1)
+        self.assertEqual(self.refreshed(root)[0].reply_count, 2)
+
+
+class ExploreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author, self.fan = (get_user_model().objects.create_user(name, password='pw') for name in ('author', 'fan'))
+
+    def post(self, hours_ago, title):
+        post = Post.objects.create(post_type='diary', user=self.author, title=title)
+        Post.objects.filter(pk=post.pk).update(created_at=timezone.now() - timedelta(hours=hours_ago))
+        return post
+
+    def test_engagement_outweighs_a_little_age(self):
+        self.assertGreater(explore.score(10, 0, 10), explore.score(0, 0, 1))
+        self.assertGreater(explore.score(0, 0, 1), explore.score(0, 0, 10))
+
+        liked = self.post(10, 'liked')
+        fresh = self.post(1, 'fresh')
+        stale = self.post(24 * (explore.WINDOW_DAYS + 1), 'stale')
+        for i in range(10):
+            add_like(liked, get_user_model().objects.create_user(f'liker{i}', password='pw'))
+        pages = explore.build_snapshot()['pages']
+        self.assertEqual([entry[0] for entry in pages[0]], [liked.pk, fresh.pk])
+        self.assertNotIn(stale.pk, [entry[0] for page in pages for entry in page])
+
+    def test_snapshot_is_shared_until_stale(self):
+        first = self.post(1, 'first')
+        snapshot = explore.current_snapshot()
+        self.post(0, 'second')
+        self.assertEqual(explore.current_snapshot(), snapshot)
+
+        cache.set(explore.SNAPSHOT_KEY, {**snapshot, 'computed_at': 0}, None)
+        self.assertEqual(len(explore.current_snapshot()['pages'][0]), 2)
+
+        # Deleted posts drop out of the stored pages, and likes are per viewer
+        add_like(first, self.fan)
+        cards, next_page = explore.explore_page(1, self.fan)
+        self.assertEqual({card['post'].title: card['user_has_liked'] for card in cards}, {'first': True, 'second': False})
+        Post.objects.filter(pk=first.pk).update(deleted_at=timezone.now())
+        cards, next_page = explore.explore_page(1, self.fan)
+        self.assertEqual(([card['post'].title for card in cards], next_page), (['second'], None))
+
+
+class FeedRankingTests(TestCase):
+    def setUp(self):
+        self.viewer, self.friend, self.acquaintance = (
+            get_user_model().objects.create_user(name, password='pw') for name in ('viewer', 'friend', 'acquaintance')
+        )
+        add_follow(self.viewer, self.friend)
+        add_follow(self.viewer, self.acquaintance)
+
+    def test_untouched_posts_rank_by_age_and_engagement_lifts_them(self):
+        self.assertGreater(ranking.score(1, 0, 0, 0), ranking.score(2, 0, 0, 0))
+        self.assertGreater(ranking.score(2, 5, 0, 0), ranking.score(1, 0, 0, 0))
+        self.assertGreater(ranking.score(2, 0, 0, 5), ranking.score(1, 0, 0, 0))
+        self.assertEqual(ranking.score(-1, 0, 0, 0), ranking.score(0, 0, 0, 0))
+
+    def test_authors_the_viewer_engages_with_rank_higher(self):
+        older = Post.objects.create(post_type='diary', user=self.friend, title='older')
+        newer = Post.objects.create(post_type='diary', user=self.acquaintance, title='newer')
+        followed = [self.friend.pk, self.acquaintance.pk]
+        self.assertEqual(ranking.ranked_post_ids(self.viewer, followed), [newer.pk, older.pk])
+
+        for i in range(3):
+            comment_on(Post.objects.create(post_type='diary', user=self.friend, title=f'old {i}'), self.viewer, 'Yum')
+        Post.objects.filter(title__startswith='old ').update(created_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(ranking.ranked_post_ids(self.viewer, followed, limit=2), [older.pk, newer.pk])
+
+    def test_evaluate_replays_interactions_against_the_feed_of_the_time(self):
+        liked = Post.objects.create(post_type='diary', user=self.friend, title='liked')
+        Post.objects.create(post_type='diary', user=self.acquaintance, title='newer')
+        add_like(liked, self.viewer)
+        # Not replayed: the friend does not follow the viewer
+        add_like(Post.objects.create(post_type='diary', user=self.viewer, title='own'), self.friend)
+
+        results = ranking.evaluate()
+        self.assertEqual(results['chronological'], {'interactions': 1, 'mrr': 0.5, 'first_page': 1.0})
+        self.assertEqual(results['ranked']['interactions'], 1)
+
+    def test_posts_deleted_after_ranking_are_left_out(self):
+        kept = Post.objects.create(post_type='diary', user=self.friend, title='kept')
+        gone = Post.objects.create(post_type='diary', user=self.friend, title='gone')
+        purge.soft_delete(gone)
+        self.client.force_login(self.viewer)
+        with mock.patch.object(ranking, 'ranked_post_ids', return_value=[gone.pk, kept.pk]):
+            response = self.client.get('/feed/', {'order': 'ranked'})
+        self.assertEqual([item['post'] for item in response.context['posts_with_likes']], [kept])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProfilePictureTests(TestCase):
+    def test_new_picture_drops_the_old_variants(self):
+        user = get_user_model().objects.create_user('reader', password='pw')
+        Profile.objects.create(user=user, picture_variants={'thumb': {'jpeg': 'old.jpg'}})
+        self.client.force_login(user)
+        self.client.post('/profile/edit/', {'display_name': 'Reader', 'profile_picture': make_image()})
+        profile = Profile.objects.get(user=user)
+        self.assertTrue(profile.profile_picture)
+        self.assertEqual(profile.picture_variants, {})
+        self.assertTrue(Job.objects.filter(name='restaurants.tasks.build_image_variants').exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ContentAddressedStorageTests(TestCase):
+    def make_profile(self, name):
+        user = get_user_model().objects.create_user(name, password='pw')
+        return Profile.objects.create(user=user, profile_picture=make_image())
+
+    def stored(self, blob):
+        return os.path.exists(os.path.join(settings.MEDIA_ROOT, blob.name))
+
+    def test_identical_uploads_share_a_blob_until_the_last_reference_goes(self):
+        first, second = self.make_profile('first'), self.make_profile('second')
+        self.assertEqual(first.profile_picture.name, second.profile_picture.name)
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get(pk=blob.pk).ref_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(self.stored(blob))
+
+    def test_a_rolled_back_replacement_keeps_the_old_file(self):
+        profile = self.make_profile('reader')
+        blob = MediaBlob.objects.get()
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError), transaction.atomic():
+            profile.profile_picture = None
+            profile.save()
+            raise RuntimeError('retried')
+        self.assertEqual(MediaBlob.objects.get(pk=blob.pk).ref_count, 1)
+        self.assertTrue(self.stored(blob))
+
+
+class ImageVariantTests(SimpleTestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.name = 'review_images/dish.jpg'
+        # Stored landscape, tagged to be shown rotated a quarter turn
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'PhoneCam'
+        os.makedirs(os.path.join(self.media, 'review_images'))
+        Image.new('RGB', (2000, 1000), 'blue').save(os.path.join(self.media, self.name), 'JPEG', exif=exif)
+
+    def test_variants_are_upright_resized_and_stripped(self):
+        variants = images.generate_variants(os.path.join(self.media, self.name), self.name, self.media)
+        expected = {'avatar': (128, 128), 'card': (240, 480), 'full': (800, 1600)}
+        self.assertEqual({variant: (entry['width'], entry['height']) for variant, entry in variants.items()}, expected)
+        for variant, size in expected.items():
+            for fmt in images.FORMATS:
+                name = variants[variant][fmt]
+                self.assertEqual(name, images.variant_name(self.name, variant, fmt))
+                with Image.open(os.path.join(self.media, name)) as variant_image:
+                    self.assertEqual(variant_image.size, size)
+                    self.assertEqual(dict(variant_image.getexif()), {})
+        # An identical upload reuses the files already written
+        self.assertEqual(images.generate_variants('missing.jpg', self.name, self.media), variants)
+
+    def test_srcset_offers_larger_variants_of_the_same_shape(self):
+        variants = images.generate_variants(os.path.join(self.media, self.name), self.name, self.media)
+        self.assertEqual(
+            images.srcset(variants, 'card', 'webp'),
+            '/media/review_images/variants/dish-card.webp 240w, /media/review_images/variants/dish-full.webp 800w',
+        )
+        self.assertEqual(images.srcset(variants, 'avatar', 'jpeg'), '/media/review_images/variants/dish-avatar.jpg 128w')
+        self.assertEqual(images.srcset({}, 'card', 'webp'), '')
+
+    def render(self, variants):
+        picture = Profile(profile_picture=self.name).profile_picture
+        return Template(
+            "{% load media_tags %}{% responsive_image picture variants 'card' alt='Dish' %}"
+        ).render(Context({'picture': picture, 'variants': variants}))
+
+    def test_tag_falls_back_to_the_original_until_variants_exist(self):
+        self.assertHTMLEqual(
+            self.render({}), '<img src="/media/review_images/dish.jpg" alt="Dish" loading="lazy" decoding="async">',
+        )
+        original = Profile(profile_picture=self.name).profile_picture
+        self.assertEqual(images.variant_url(original, None, 'full'), '/media/review_images/dish.jpg')
+
+        variants = images.generate_variants(os.path.join(self.media, self.name), self.name, self.media)
+        html = self.render(variants)
+        self.assertIn('<source type="image/webp" srcset="/media/review_images/variants/dish-card.webp 240w', html)
+        self.assertIn('src="/media/review_images/variants/dish-card.jpg"', html)
+        self.assertIn('sizes="640px"', html)
+
+
+def gradient(size=64, fmt='PNG'):
+    """Bytes of a horizontal grey ramp, so resized copies hash alike."""
+    image = Image.linear_gradient('L').rotate(-90).resize((size, size)).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class NearDuplicateTests(TestCase):
+    base = 0xF0F0_1234_ABCD_5678
+
+    def make_blob(self, name, phash):
+        return MediaBlob.objects.create(sha256=name * 8, name=name, size=1, **phash_fields(phash))
+
+    def test_phash_fields_store_signed_values_with_unsigned_bands(self):
+        fields = phash_fields(self.base)
+        self.assertEqual(fields['phash'], self.base - (1 << 64))
+        self.assertEqual(
+            [fields[f'phash_band_{band}'] for band in range(4)], [0x5678, 0xABCD, 0x1234, 0xF0F0],
+        )
+        # Bands of the stored (signed) value match those of the original
+        self.assertEqual(phash_fields(fields['phash']), fields)
+        self.assertEqual(hamming_distance(fields['phash'], self.base), 0)
+        self.assertEqual(phash_fields(None), {})
+
+    def test_find_similar_reads_only_band_matches_closest_first(self):
+        base = self.make_blob('base', self.base)
+        three_bits = self.make_blob('three', self.base ^ 0b111)
+        one_bit = self.make_blob('one', self.base ^ (1 << 40))
+        # Shares a band but differs in 48 bits
+        self.make_blob('band', self.base ^ 0xFFFF_FFFF_FFFF_0000)
+        # Within four bits, but no band survives intact
+        self.make_blob('spread', self.base ^ 0x0001_0001_0001_0001)
+        with self.assertNumQueries(1):
+            matches = find_similar(self.base)
+        self.assertEqual(matches, [(0, base), (1, one_bit), (3, three_bits)])
+        self.assertEqual(base.similar(), [(1, one_bit), (3, three_bits)])
+        # One bit plus three bits apart
+        self.assertEqual(one_bit.similar(max_distance=4), [(1, base), (4, three_bits)])
+
+    def test_resized_copies_hash_alike(self):
+        original = perceptual_hash(io.BytesIO(gradient(64)))
+        resized = perceptual_hash(io.BytesIO(gradient(40, 'JPEG')))
+        self.assertLessEqual(hamming_distance(original, resized), NEAR_DUPLICATE_DISTANCE)
+        self.assertGreater(hamming_distance(original, perceptual_hash(make_image())), NEAR_DUPLICATE_DISTANCE)
+        self.assertIsNone(perceptual_hash(io.BytesIO(b'not an image')))
+
+
+class DedupeMediaTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        override = self.settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.red, self.ramp = make_image().read(), gradient()
+        # a.png and b.png hold the same bytes; two reviews share a.png
+        self.legacy = {
+            'review_images/a.png': self.red, 'review_images/b.png': self.red,
+            'review_images/ramp.png': self.ramp, 'profile_pictures/me.png': self.red,
+        }
+        for name, content in self.legacy.items():
+            os.makedirs(os.path.join(self.media, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(self.media, name), 'wb') as f:
+                f.write(content)
+        dish = make_dish(make_restaurant('Saffron'))
+        self.reviews = [Review.objects.create(menu_item=dish, rating=8) for _ in range(4)]
+        for review, name in zip(self.reviews, ('a.png', 'a.png', 'b.png', 'ramp.png')):
+            Review.objects.filter(pk=review.pk).update(image=f'review_images/{name}')
+        user = get_user_model().objects.create_user('reader', password='pw')
+        self.profile = Profile.objects.create(user=user)
+        Profile.objects.filter(pk=self.profile.pk).update(profile_picture='profile_pictures/me.png')
+
+    def dedupe(self, *args):
+        out = io.StringIO()
+        call_command('dedupe_media', *args, stdout=out)
+        return out.getvalue()
+
+    def stored(self, name):
+        return os.path.exists(os.path.join(self.media, name))
+
+    def test_merges_identical_legacy_files(self):
+        output = self.dedupe()
+        self.assertIn('Rows migrated: 5', output)
+        self.assertIn('Legacy files: 4, distinct contents: 2', output)
+        self.assertIn(f'Reclaimed {format_bytes(2 * len(self.red))}', output)
+
+        red = MediaBlob.objects.get(size=len(self.red))
+        self.assertEqual(red.ref_count, 4)
+        self.assertEqual(MediaBlob.objects.get(size=len(self.ramp)).ref_count, 1)
+        names = [review.image.name for review in Review.objects.order_by('pk')]
+        self.assertEqual(names[:3], [red.name] * 3)
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).profile_picture.name, red.name)
+        self.assertTrue(Review.objects.get(pk=self.reviews[0].pk).image_variants)
+        self.assertTrue(self.stored(red.name))
+        self.assertFalse(any(self.stored(name) for name in self.legacy))
+
+        # A second run finds nothing left to move
+        self.assertIn('Rows migrated: 0', self.dedupe())
+        self.assertEqual(MediaBlob.objects.get(pk=red.pk).ref_count, 4)
+
+    def test_dry_run_only_reports(self):
+        output = self.dedupe('--dry-run')
+        self.assertIn(f'Would reclaim {format_bytes(2 * len(self.red))}', output)
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertTrue(all(self.stored(name) for name in self.legacy))
+        self.assertEqual(Review.objects.get(pk=self.reviews[0].pk).image.name, 'review_images/a.png')
+
+    def test_similar_lists_near_duplicates(self):
+        path = os.path.join(self.media, 'review_images/ramp-small.jpg')
+        with open(path, 'wb') as f:
+            f.write(gradient(40, 'JPEG'))
+        Review.objects.filter(pk=self.reviews[1].pk).update(image='review_images/ramp-small.jpg')
+        output = self.dedupe('--similar')
+        ramp, small = (MediaBlob.objects.get(size=len(self.ramp)), MediaBlob.objects.get(name__endswith='.jpg'))
+        # The JPEG was migrated first, so it leads its group
+        self.assertRegex(output, rf'{small.name} \(1 refs\) looks like:\n  {ramp.name} \(distance \d, 1 refs\)\n$')
+
+
+class RestaurantCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurants = [make_restaurant(name) for name in ('Basil', 'Clove')]
+
+    def test_cards_are_reused_until_their_restaurant_changes(self):
+        first = render_restaurant_cards(self.restaurants)
+        with self.assertNumQueries(0):
+            self.assertEqual(render_restaurant_cards(self.restaurants), first)
+        self.assertEqual((fragment_stats()['hits'], fragment_stats()['misses']), (2, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(menu_item=make_dish(self.restaurants[0]), rating=7)
+        cards = render_restaurant_cards(self.restaurants)
+        self.assertIn('7.0', cards[0])
+        self.assertEqual(cards[1], first[1])
+
+
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user('reader', password='pw'))
+        self.restaurant = make_restaurant('Basil')
+        self.dish = make_dish(self.restaurant)
+        self.url = f'/restaurants/{self.restaurant.pk}/'
+        # The first visit sets the CSRF cookie, which is part of the ETag
+        self.client.get(self.url)
+
+    def test_repeat_visit_is_not_modified_until_the_page_changes(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+        repeat = self.client.get(self.url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(repeat.status_code, 304)
+
+        Review.objects.create(menu_item=self.dish, rating=6)
+        changed = self.client.get(self.url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_saving_the_restaurant_changes_the_viewers_page(self):
+        first = self.client.get(self.url)
+        self.client.post(f'/restaurants/{self.restaurant.pk}/list/favorite/')
+        again = self.client.get(self.url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(again.status_code, 200)
+
+    def test_editing_a_menu_item_changes_the_menu_page(self):
+        url = f'/restaurants/{self.restaurant.pk}/menu/'
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': first['ETag']}).status_code, 304)
+        self.dish.name = 'Green curry'
+        self.dish.save()
+        edited = self.client.get(url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(edited.status_code, 200)
+        self.assertContains(edited, 'Green curry')
+
+
+class RetryOnLockTests(TransactionTestCase):
+    def test_locked_attempts_are_rolled_back_and_retried(self):
+        calls = []
+
+        @retry_on_lock
+        def view(request):
+            calls.append(request)
+            make_restaurant(f'Basil {len(calls)}')
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return HttpResponse()
+
+        view('request')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(list(Restaurant.objects.values_list('name', flat=True)), ['Basil 3'])
+
+    def test_other_errors_and_the_last_attempt_are_raised(self):
+        @retry_on_lock(attempts=2)
+        def view(request):
+            raise OperationalError('database is locked')
+
+        with self.assertRaises(OperationalError):
+            view('request')
+        with self.assertRaisesMessage(OperationalError, 'no such table'):
+            retry_on_lock(mock.Mock(side_effect=OperationalError('no such table')))('request')
+
+
+class FacetedSearchTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.basil = make_restaurant('Basil')
+            make_restaurant('Clove', cuisine_type='Indian')
+            make_restaurant('Dill', city='Toronto')
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(menu_item=make_dish(self.basil), rating=9)
+            HappyHour.objects.create(
+                restaurant=self.basil, day_of_week='friday', start_time=time(16), end_time=time(18), specials='$5 wings',
+            )
+
+    def test_each_facet_is_counted_without_its_own_filter(self):
+        counts = facet_counts(cuisine_types=['Thai'], location='Ottawa')
+        self.assertEqual(counts['cuisine'], {'Thai': 1, 'Indian': 1})
+        self.assertEqual(counts['city'], {'Ottawa': 1, 'Toronto': 1})
+        self.assertEqual(counts['rating'], {8: 1})
+        self.assertEqual(counts['day']['friday'], 1)
+        self.assertEqual(list(search_restaurants(cuisine_types=['Thai'], location='Ottawa')), [self.basil])
+
+    def test_cities_match_and_count_regardless_of_case(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sage = make_restaurant('Sage', city='ottawa ')
+        self.assertEqual(facet_counts()['city'], {'Ottawa': 3, 'Toronto': 1})
+        found = search_restaurants(location='OTTAWA')
+        self.assertEqual(set(found.values_list('name', flat=True)), {'Basil', 'Clove', sage.name})
+
+        response = self.client.get('/restaurants/', {'location': 'ottawa'})
+        self.assertEqual(response.context['selected_location'], 'Ottawa')
+        self.assertEqual(response.context['locations'], [('Ottawa', 3), ('Toronto', 1)])
+
+    def test_happy_hour_filters(self):
+        found = search_restaurants(happy_hour_mode=True, days=['friday'], time=time(17))
+        self.assertEqual(list(found), [self.basil])
+        self.assertFalse(search_restaurants(happy_hour_mode=True, days=['monday']).exists())
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        self.jax, self.jaxon, self.pat = (
+            get_user_model().objects.create_user(name, password='pw') for name in ('jax', 'jaxon', 'pat')
+        )
+        Profile.objects.create(user=self.pat, display_name='Jaxon Pat')
+        add_follow(self.pat, self.jaxon)
+
+    def test_exact_then_prefix_by_followers_then_similar(self):
+        self.assertEqual(search_users('JAX'), [self.jax, self.jaxon, self.pat])
+        # Typos are caught by shared trigrams
+        self.assertEqual(search_users('jaxom')[:2], [self.jaxon, self.pat])
+
+    def test_deactivated_users_drop_out(self):
+        get_user_model().objects.filter(pk=self.jaxon.pk).update(is_active=False)
+        refresh_entry(self.jaxon.pk)
+        self.assertNotIn(self.jaxon, search_users('jax'))
+
+
+
+class DishRecommendationTests(TestCase):
+    def setUp(self):
+        restaurant = make_restaurant('Saffron')
+        self.curry, self.dal, self.salad, self.soup = (
+            make_dish(restaurant, name) for name in ('Curry', 'Dal', 'Salad', 'Soup')
+        )
+        for index in range(4):
+            rater = get_user_model().objects.create_user(f'rater{index}', password='pw')
+            for dish, rating in ((self.curry, 9), (self.dal, 9), (self.salad, 3), (self.soup, 3)):
+                Review.objects.create(menu_item=dish, user=rater, rating=rating)
+        self.diner = get_user_model().objects.create_user('diner', password='pw')
+        Review.objects.create(menu_item=self.curry, user=self.diner, rating=10)
+        Review.objects.create(menu_item=self.salad, user=self.diner, rating=2)
+
+    def test_recommends_dishes_like_the_ones_they_rated_highly(self):
+        recommendations.refresh()
+        dishes = [row.menu_item for row in recommendations.recommendations_for(self.diner)]
+        # Dal goes with the curry they loved; soup only with the salad they did not
+        self.assertEqual(dishes, [self.dal])
+
+    def test_dishes_reviewed_since_drop_out(self):
+        recommendations.refresh()
+        Review.objects.create(menu_item=self.dal, user=self.diner, rating=8)
+        self.assertFalse(recommendations.recommendations_for(self.diner).exists())
+        recommendations.refresh(incremental=True)
+        self.assertFalse(recommendations.recommendations_for(self.diner).exists())
+
+
+class TasteProfileTests(TestCase):
+    def setUp(self):
+        self.thai, self.italian = make_restaurant('Saffron'), make_restaurant('Nonna', cuisine_type='Italian')
+        self.diner, self.friend, self.stranger = (
+            get_user_model().objects.create_user(name, password='pw') for name in ('diner', 'friend', 'stranger')
+        )
+        Review.objects.create(menu_item=make_dish(self.thai), user=self.diner, rating=9)
+        # Rated below neutral, so it adds nothing to their taste
+        Review.objects.create(menu_item=make_dish(self.italian, 'Lasagna'), user=self.diner, rating=2)
+        RestaurantList.objects.create(user=self.friend, restaurant=self.thai, list_type='favorite')
+        RestaurantList.objects.create(user=self.stranger, restaurant=self.italian, list_type='favorite')
+        for user in (self.diner, self.friend, self.stranger):
+            taste.refresh_taste_profile(user.pk)
+
+    def profile(self, user):
+        return TasteProfile.objects.get(user=user)
+
+    def test_breakdown_keeps_the_cuisines_they_liked(self):
+        self.assertEqual(taste.breakdown(self.profile(self.diner)), [
+            {'cuisine': 'Thai', 'share': 100, 'favourites': 0, 'reviews': 1, 'avg_rating': 9.0},
+        ])
+        self.assertEqual(self.profile(self.diner).price_level, 1)
+
+    def test_compatibility(self):
+        diner = self.profile(self.diner)
+        self.assertEqual(taste.compatibility(diner, self.profile(self.friend)), 100)
+        self.assertEqual(taste.compatibility(diner, self.profile(self.stranger)), 0)
+        self.assertIsNone(taste.compatibility(diner, None))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MenuStatsTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_restaurant('Saffron')
+        self.curry, self.dal = make_dish(self.restaurant), make_dish(self.restaurant, 'Dal')
+        self.diner = get_user_model().objects.create_user('diner', password='pw')
+        self.liked = Review.objects.create(menu_item=self.curry, user=self.diner, rating=8, image=make_image())
+        Review.objects.create(menu_item=self.curry, rating=4)
+        Review.objects.create(menu_item=self.dal, rating=5)
+
+    def test_stats_for_every_dish_in_one_query(self):
+        with self.assertNumQueries(1):
+            curry, dal = menus.with_stats(MenuItem.objects.filter(menu__restaurant=self.restaurant))
+        self.assertEqual((curry.review_count, curry.avg_rating, curry.has_photos), (2, 6, True))
+        self.assertEqual((dal.review_count, dal.avg_rating, dal.has_photos), (1, 5, False))
+
+    def test_menu_page_queries_do_not_grow_with_the_menu(self):
+        def page_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(f'/restaurants/{self.restaurant.pk}/menu/').status_code, 200)
+            return len(queries)
+
+        page_queries()
+        before = page_queries()
+        for name in ('Soup', 'Salad', 'Naan'):
+            Review.objects.create(menu_item=make_dish(self.restaurant, name), user=self.diner, rating=7)
+        self.assertEqual(page_queries(), before)
+
+    def test_review_list_marks_the_viewers_likes(self):
+        add_like(self.liked, self.diner)
+        reviews = menus.review_list(self.curry, self.diner)
+        self.assertEqual([review.user_has_liked for review in reviews], [False, True])
+        self.assertEqual(list(menus.review_list(self.curry, self.diner, photos=True)), [self.liked])
+
+
+class CompressedStaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        source, self.root = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.root)
+        self.files = {
+            'css/site.css': ''.join(f'.card-{n} {{ margin: {n}px; padding: 4px; }}\n' for n in range(60)).encode(),
+            # Under min_compress_size
+            'css/tiny.css': b'body { margin: 0; }',
+            # Random bytes don't compress
+            'img/noise.ico': os.urandom(2048),
+            'img/dot.png': make_image().read(),
+        }
+        for name, content in self.files.items():
+            os.makedirs(os.path.join(source, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(source, name), 'wb') as f:
+                f.write(content)
+        override = self.settings(
+            STATIC_ROOT=self.root, STATICFILES_DIRS=[source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def collect(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        return staticfiles_storage.hashed_files
+
+    def exists(self, name):
+        return os.path.isfile(os.path.join(self.root, name))
+
+    def test_writes_compressed_siblings_of_hashed_files(self):
+        hashed = self.collect()['css/site.css']
+        with open(os.path.join(self.root, f'{hashed}.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), self.files['css/site.css'])
+        self.assertTrue(self.exists(f'{hashed}.br'))
+        self.assertFalse(self.exists('css/site.css.gz'))
+
+    def test_small_and_incompressible_files_are_left_alone(self):
+        hashed = self.collect()
+        for name in ('css/tiny.css', 'img/noise.ico', 'img/dot.png'):
+            self.assertFalse(self.exists(f'{hashed[name]}.gz'), name)
+            self.assertFalse(self.exists(f'{hashed[name]}.br'), name)
+
+    def test_url_uses_source_names_until_collected(self):
+        self.assertEqual(staticfiles_storage.url('css/site.css'), '/static/css/site.css')
+        hashed = self.collect()['css/site.css']
+        self.assertEqual(staticfiles_storage.url('css/site.css'), f'/static/{hashed}')
+
+    def serve(self, name, accept_encoding=''):
+        middleware = StaticAssetMiddleware(lambda request: HttpResponse('app'))
+        response = middleware(RequestFactory().get(f'/static/{name}', HTTP_ACCEPT_ENCODING=accept_encoding))
+        self.addCleanup(response.close)
+        return response
+
+    def test_middleware_prefers_brotli_then_gzip(self):
+        hashed = self.collect()['css/site.css']
+        for accept_encoding, encoding in (
+            ('gzip, deflate, br', 'br'),
+            ('gzip, br;q=0', 'gzip'),
+            ('*', 'br'),
+            ('x-gzip, identity', None),
+            ('br;q=0, gzip;q=0.0', None),
+            ('', None),
+        ):
+            response = self.serve(hashed, accept_encoding)
+            self.assertEqual(response.get('Content-Encoding'), encoding, accept_encoding)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(response['Cache-Control'], FAR_FUTURE)
+
+    def test_unhashed_names_are_served_uncompressed_and_short_lived(self):
+        self.collect()
+        response = self.serve('css/site.css', 'br, gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], SHORT_LIVED)
+        self.assertEqual(self.serve('css/missing.css').content, b'app')
+
+    def test_images_are_not_gzipped_on_the_way_out(self):
+        hashed = self.collect()['img/dot.png']
+        response = self.client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip')
+        self.addCleanup(response.close)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content), self.files['img/dot.png'])
@@ -0,0 +1,114 @@
+"""
+User search.
+
+Every user has a UserSearchEntry holding their casefolded username and
+display name and their follower count, plus one UserSearchTrigram row per
+three-letter slice of those names. Signal handlers rewrite a user's rows on
+signup and profile edits; restaurants.counters keeps the follower count.
+
+A query is answered from two indexed lookups, neither of which reads the
+whole user table: a range scan for names starting with the query, and a
+GROUP BY over the trigram index for names sharing most of its trigrams
+(which also catches typos and matches in the middle of a name). Results are
+ranked exact match, then prefix, then trigram similarity, with follower
+count breaking ties.
+"""
+from typing import List, Set
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+
+from .models import Follow, Profile, UserSearchEntry, UserSearchTrigram
+
+# Share of the query's trigrams a name needs to count as a match
+MIN_SIMILARITY = 0.5
+# Rows fetched from each lookup before ranking
+CANDIDATES = 50
+
+EXACT, PREFIX, SIMILAR = 3, 2, 1
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.casefold().split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of each word, padded so the start of a word weighs more, as pg_trgm does."""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def refresh_entry(user_id: int) -> None:
+    """Rewrite one user's search entry and trigrams from their current names."""
+    User = get_user_model()
+    username = User.objects.filter(pk=user_id, is_active=True).values_list('username', flat=True).first()
+    if username is None:
+        # Deleted or deactivated; nobody should find them
+        UserSearchEntry.objects.filter(user_id=user_id).delete()
+        return
+    display_name = Profile.objects.filter(user_id=user_id).values_list('display_name', flat=True).first() or ''
+    entry, created = UserSearchEntry.objects.get_or_create(
+        user_id=user_id,
+        defaults={
+            'username': normalize(username),
+            'display_name': normalize(display_name),
+            'follower_count': Follow.objects.filter(following_id=user_id).count(),
+        },
+    )
+    if not created:
+        if (entry.username, entry.display_name) == (normalize(username), normalize(display_name)):
+            return
+        entry.username = normalize(username)
+        entry.display_name = normalize(display_name)
+        entry.save(update_fields=['username', 'display_name'])
+        entry.trigrams.all().delete()
+    UserSearchTrigram.objects.bulk_create([
+        UserSearchTrigram(trigram=gram, entry=entry) for gram in trigrams(f'{username} {display_name}')
+    ])
+
+
+def _prefix(field: str, prefix: str) -> Q:
+    # A range rather than LIKE 'x%', which SQLite can only serve from an
+    # index on a NOCASE column
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\U0010ffff'})
+
+
+def search_user_ids(query: str, limit: int = 10) -> List[int]:
+    """Ids of the users best matching ``query``, best first."""
+    query = normalize(query)
+    if not query:
+        return []
+    scores = {}
+
+    prefixed = UserSearchEntry.objects.filter(
+        _prefix('username', query) | _prefix('display_name', query)
+    ).order_by('-follower_count').values_list('user_id', 'username', 'display_name', 'follower_count')[:CANDIDATES]
+    for user_id, username, display_name, followers in prefixed:
+        rank = EXACT if query in (username, display_name) else PREFIX
+        scores[user_id] = (rank, 1.0, followers)
+
+    grams = trigrams(query)
+    needed = max(1, round(len(grams) * MIN_SIMILARITY))
+    similar = dict(
+        UserSearchTrigram.objects.filter(trigram__in=grams)
+        .values('entry_id').annotate(shared=Count('pk')).filter(shared__gte=needed)
+        .order_by('-shared').values_list('entry_id', 'shared')[:CANDIDATES]
+    )
+    followers = dict(
+        UserSearchEntry.objects.filter(pk__in=[pk for pk in similar if pk not in scores])
+        .values_list('user_id', 'follower_count')
+    )
+    for user_id, count in followers.items():
+        scores[user_id] = (SIMILAR, similar[user_id] / len(grams), count)
+
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+def search_users(query: str, limit: int = 10) -> list:
+    """Users best matching ``query``, best first, with their profiles loaded."""
+    ids = search_user_ids(query, limit)
+    users = get_user_model().objects.select_related('profile').in_bulk(ids)
+    return [users[pk] for pk in ids if pk in users]
@@ -2,11 +2,26 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from .models import Restaurant, Menu, MenuItem, Review, Profile, Follow, ReviewLike, RestaurantList, Comment, CustomList, CustomListItem, HappyHour, Notification
-from posts.models import Post
+from .models import Restaurant, Menu, MenuItem, Review, Profile, Follow, RestaurantList, Comment, CustomList, CustomListItem, HappyHour, Notification, TasteProfile
+from posts.models import Post, PostComment
 from django import forms
 from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
 from django.db import models
+from .images import schedule_variants, variant_url
+from .cache import render_restaurant_cards
+from .facets import RATING_BANDS, city_key, facet_counts, search_restaurants
+from .user_search import search_users
+from .comments import comment_page, latest_comments, parse_cursor, subtree
+from .menus import review_list, with_stats
+from .counters import add_follow, add_like, comment_on, remove_comment, remove_follow, remove_like
+from .taste import breakdown as taste_breakdown, compatibility as taste_compatibility
+from .db import retry_on_lock
+from .purge import soft_delete
+from .jobs import enqueue
+from .tasks import notify_favourites
+from .page_cache import anonymous_page, menu_page_stamps, restaurant_page_stamps, search_page_stamps
+from .conditional import conditional_page, menu_item_reviews_state, restaurant_detail_state, user_lists_state, view_list_state, view_menu_state
 
 class RestaurantForm(forms.ModelForm):
 	class Meta:
@@ -54,12 +69,8 @@ def search(request):
 	restaurants = []
 	
 	if query:
-		User = get_user_model()
-		# Search for users by username or display name
-		users = User.objects.filter(
-			models.Q(username__icontains=query) |
-			models.Q(profile__display_name__icontains=query)
-		).distinct()[:10]
+		# Search for users by username or display name, best matches first
+		users = search_users(query, limit=10)
 		
 		# Search for restaurants by name or city
 		restaurants = Restaurant.objects.filter(
@@ -84,12 +95,8 @@ def live_search(request):
 	}
 	
 	if query:
-		User = get_user_model()
-		# Search for users by username or display name
-		users = User.objects.filter(
-			models.Q(username__icontains=query) |
-			models.Q(profile__display_name__icontains=query)
-		).distinct()[:5]
+		# Search for users by username or display name, best matches first
+		users = search_users(query, limit=5)
 		
 		results['users'] = [
 			{
@@ -131,8 +138,8 @@ from django.db.models import Q
 from django.core.paginator import Paginator
 
 
+@anonymous_page(search_page_stamps)
 def restaurant_search(request):
-	from django.db.models import Avg
 	from django.conf import settings
 	query = request.GET.get('q', '')
 	page_number = request.GET.get('page', 1)
@@ -142,64 +149,34 @@ def restaurant_search(request):
 	selected_days = request.GET.get('hh_days', '').split(',') if request.GET.get('hh_days') else []
 	selected_days = [day.strip() for day in selected_days if day.strip()]  # Clean up the list
 	selected_time = request.GET.get('hh_time', '')
+	selected_rating = request.GET.get('rating', '')
 	
-	restaurants = Restaurant.objects.all()
-	if query:
-		restaurants = restaurants.filter(
-			Q(name__icontains=query) |
-			Q(cuisine_type__icontains=query) |
-			Q(address_line1__icontains=query) |
-			Q(address_line2__icontains=query) |
-			Q(city__icontains=query) |
-			Q(province__icontains=query) |
-			Q(postal_code__icontains=query) |
-			Q(country__icontains=query)
-		)
-	if selected_types:
-		restaurants = restaurants.filter(cuisine_type__in=selected_types)
-	if selected_location:
-		restaurants = restaurants.filter(city__iexact=selected_location)
+	filters = {
+		'query': query,
+		'cuisine_types': selected_types,
+		'location': selected_location,
+		'happy_hour_mode': happy_hour_mode,
+		'days': selected_days,
+	}
+	if selected_rating.isdigit():
+		filters['rating'] = int(selected_rating)
+	if happy_hour_mode and selected_time:
+		# Filter by specific time (format: HH:MM)
+		from datetime import datetime
+		try:
+			filters['time'] = datetime.strptime(selected_time, '%H:%M').time()
+		except ValueError:
+			pass
 	
-	# Handle happy hour mode filters
-	if happy_hour_mode:
-		# Start with restaurants that have happy hours
-		restaurants = restaurants.filter(happy_hours__isnull=False).distinct()
-		
-		if selected_days:
-			# Filter by multiple days (OR logic - match any of the selected days)
-			restaurants = restaurants.filter(happy_hours__day_of_week__in=selected_days).distinct()
-		
-		if selected_time:
-			# Filter by specific time (format: HH:MM)
-			from datetime import datetime
-			try:
-				filter_time = datetime.strptime(selected_time, '%H:%M').time()
-				restaurants = restaurants.filter(
-					happy_hours__start_time__lte=filter_time,
-					happy_hours__end_time__gte=filter_time
-				).distinct()
-			except ValueError:
-				pass
+	# Filtering and counting both run against the precomputed facet table
+	restaurants = search_restaurants(**filters)
+	facets = facet_counts(**filters)
 	
 	paginator = Paginator(restaurants.order_by('-created_at'), 10)
 	page_obj = paginator.get_page(page_number)
 	
-	# Calculate ratings for each restaurant
-	restaurants_with_ratings = []
-	for restaurant in page_obj:
-		avg_rating = None
-		review_count = 0
-		if hasattr(restaurant, 'menu'):
-			menu_items = restaurant.menu.items.all()
-			reviews = Review.objects.filter(menu_item__in=menu_items)
-			review_count = reviews.count()
-			if review_count > 0:
-				avg_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-		restaurants_with_ratings.append({
-			'restaurant': restaurant,
-			'avg_rating': round(avg_rating, 1) if avg_rating else None,
-			'review_count': review_count
-		})
+	# Cards are cached per restaurant and only re-rendered after a change
+	restaurant_cards = render_restaurant_cards(page_obj)
 	
 	form_errors = None
 	if request.method == 'POST':
@@ -216,29 +193,42 @@ def restaurant_search(request):
 			form_errors = form.non_field_errors()
 	else:
 		form = RestaurantForm()
-	# Get all cuisine types in use for the filter dropdown
+	# Every filter option with the number of results picking it would give
 	cuisine_choices = Restaurant.CUISINE_CHOICES
-	# Get unique cities for location filter
-	locations = Restaurant.objects.values_list('city', flat=True).distinct().order_by('city')
+	cuisine_options = [(value, label, facets['cuisine'].get(value, 0)) for value, label in cuisine_choices]
+	cities = dict(facets['city'])
+	if selected_location:
+		# Show the selected city under the spelling its option uses
+		selected_location = next(
+			(city for city in cities if city_key(city) == city_key(selected_location)), selected_location,
+		)
+		cities.setdefault(selected_location, 0)
+	locations = sorted(cities.items())
+	rating_choices = [(lower, label, facets['rating'].get(lower, 0)) for lower, label in RATING_BANDS]
 	
 	# Check if this is an AJAX request
 	if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
 		# Return only the restaurant list HTML
 		return render(request, 'restaurants_list_partial.html', {
-			'restaurants_with_ratings': restaurants_with_ratings,
+			'restaurant_cards': restaurant_cards,
 			'page_obj': page_obj,
 			'query': query,
+			'facets': facets,
 		})
 	
 	return render(request, 'restaurant_search.html', {
 		'form': form,
-		'restaurants_with_ratings': restaurants_with_ratings,
+		'restaurant_cards': restaurant_cards,
 		'page_obj': page_obj,
 		'query': query,
 		'cuisine_choices': cuisine_choices,
+		'cuisine_options': cuisine_options,
 		'locations': locations,
 		'selected_types': selected_types,
 		'selected_location': selected_location,
+		'rating_choices': rating_choices,
+		'selected_rating': selected_rating,
+		'day_counts': facets['day'],
 		'form_errors': form_errors,
 		'happy_hour_mode': happy_hour_mode,
 		'selected_day': ','.join(selected_days),  # Convert list back to comma-separated string for template
@@ -247,6 +237,8 @@ def restaurant_search(request):
 	})
 
 
+@anonymous_page(restaurant_page_stamps)
+@conditional_page(restaurant_detail_state)
 def restaurant_detail(request, restaurant_id):
 	restaurant = get_object_or_404(Restaurant, id=restaurant_id)
 	
@@ -289,13 +281,17 @@ def restaurant_detail(request, restaurant_id):
 	# Get happy hour information
 	happy_hours = restaurant.happy_hours.all()
 	
+	# Precomputed by compute_similar_restaurants
+	from .similar import similar_restaurants
+	
 	return render(request, 'restaurant_detail.html', {
 		'restaurant': restaurant,
 		'rating_stats': rating_stats,
 		'review_count': review_count,
 		'is_favorite': is_favorite,
 		'is_want_to_try': is_want_to_try,
-		'happy_hours': happy_hours
+		'happy_hours': happy_hours,
+		'similar_restaurants': similar_restaurants(restaurant.id),
 	})
 
 
@@ -320,22 +316,10 @@ def add_menu(request, restaurant_id):
 					menu_item = MenuItem.objects.create(menu=menu, name=name, description=description, price=price)
 					created_items.append(menu_item)
 		
-		# Create notifications for users who have favorited this restaurant
+		# Notify users who have favorited this restaurant, about the first
+		# item only (to avoid spam), in the background
 		if created_items:
-			favorite_users = RestaurantList.objects.filter(
-				restaurant=restaurant,
-				list_type='favorite'
-			).exclude(user=request.user).select_related('user')
-			
-			for fav in favorite_users:
-				# Notify about first item (to avoid spam)
-				Notification.objects.create(
-					user=fav.user,
-					notification_type='menu_item_added',
-					restaurant=restaurant,
-					menu_item=created_items[0],
-					triggered_by=request.user
-				)
+			enqueue(notify_favourites, created_items[0].pk, request.user.pk)
 		
 		# Save happy hour entries
 		from datetime import datetime
@@ -369,6 +353,8 @@ def add_menu(request, restaurant_id):
 	return render(request, 'add_menu.html', {'restaurant': restaurant})
 
 
+@anonymous_page(menu_page_stamps)
+@conditional_page(view_menu_state)
 def view_menu(request, restaurant_id):
 	restaurant = get_object_or_404(Restaurant, id=restaurant_id)
 	menu = getattr(restaurant, 'menu', None)
@@ -393,20 +379,8 @@ def view_menu(request, restaurant_id):
 			if name and price:
 				menu_item = MenuItem.objects.create(menu=menu, name=name, description=description, price=price)
 				
-				# Create notifications for users who have favorited this restaurant
-				favorite_users = RestaurantList.objects.filter(
-					restaurant=restaurant,
-					list_type='favorite'
-				).exclude(user=request.user).select_related('user')
-				
-				for fav in favorite_users:
-					Notification.objects.create(
-						user=fav.user,
-						notification_type='menu_item_added',
-						restaurant=restaurant,
-						menu_item=menu_item,
-						triggered_by=request.user
-					)
+				# Notify users who have favorited this restaurant in the background
+				enqueue(notify_favourites, menu_item.pk, request.user.pk)
 		
 		elif action == 'add_happy_hour':
 			# Handle adding happy hour
@@ -446,28 +420,21 @@ def view_menu(request, restaurant_id):
 			Q(description__icontains=search_query)
 		)
 	
-	# Calculate rating stats for each menu item
 	menu_items_with_stats = []
-	for item in menu_items:
-		has_photos = item.reviews.filter(image__isnull=False).exists()
-		
-		# Add like information for each review
-		reviews_with_likes = []
-		for review in item.reviews.all():
-			review_data = {
-				'review': review,
-				'like_count': review.likes.count(),
-				'user_has_liked': review.likes.filter(user=request.user).exists() if request.user.is_authenticated else False
+	for item in with_stats(menu_items):
+		rating_stats = None
+		if item.review_count:
+			rating_stats = {
+				'avg': round(item.avg_rating, 1),
+				'min': round(item.min_rating, 1),
+				'max': round(item.max_rating, 1),
 			}
-			reviews_with_likes.append(review_data)
-		
-		item_data = {
+		menu_items_with_stats.append({
 			'item': item,
-			'rating_stats': item.get_rating_stats(),
-			'has_photos': has_photos,
-			'reviews_with_likes': reviews_with_likes
-		}
-		menu_items_with_stats.append(item_data)
+			'rating_stats': rating_stats,
+			'review_count': item.review_count,
+			'has_photos': item.has_photos,
+		})
 	
 	# Check if this is an AJAX request
 	if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -487,6 +454,24 @@ def view_menu(request, restaurant_id):
 	})
 
 
+REVIEWS_PER_PAGE = 10
+PHOTOS_PER_PAGE = 12
+
+
+@conditional_page(menu_item_reviews_state, full_page=False)
+def menu_item_reviews(request, menu_item_id):
+	"""One page of a dish's reviews (or, with ?photos=1, its review photos), newest first."""
+	menu_item = get_object_or_404(MenuItem, id=menu_item_id)
+	photos = request.GET.get('photos') == '1'
+	reviews = review_list(menu_item, request.user, photos)
+	paginator = Paginator(reviews, PHOTOS_PER_PAGE if photos else REVIEWS_PER_PAGE)
+	page_obj = paginator.get_page(request.GET.get('page', 1))
+	return render(request, 'menu_item_photos_partial.html' if photos else 'menu_item_reviews_partial.html', {
+		'menu_item': menu_item,
+		'page_obj': page_obj,
+	})
+
+
 @login_required
 def add_review(request, menu_item_id):
 	menu_item = get_object_or_404(MenuItem, id=menu_item_id)
@@ -504,6 +489,8 @@ def add_review(request, menu_item_id):
 			is_public=is_public,
 			image=image
 		)
+		if image:
+			schedule_variants(review, 'image', 'image_variants')
 		if is_public:
 			username = request.user.username if is_public else 'Anonymous'
 			title = f"{username} reviewed {menu_item.name}"
@@ -526,9 +513,18 @@ def feed(request):
 	following_users = Follow.objects.filter(follower=request.user).values_list('following', flat=True)
 	
 	# Filter posts to only show from followed users
-	posts = Post.objects.select_related('user', 'user__profile', 'menu_item').filter(
-		user__in=following_users
-	).order_by('-created_at')[:20]
+	order = 'ranked' if request.GET.get('order') == 'ranked' else 'latest'
+	if order == 'ranked':
+		# Scored from stored counters and affinities; see restaurants.ranking
+		from .ranking import ranked_post_ids
+		ranked_ids = ranked_post_ids(request.user, following_users)
+		in_bulk = Post.objects.select_related('user', 'user__profile', 'menu_item').in_bulk(ranked_ids)
+		# A post deleted since it was ranked is simply left out
+		posts = [in_bulk[pk] for pk in ranked_ids if pk in in_bulk]
+	else:
+		posts = Post.objects.select_related('user', 'user__profile', 'menu_item').filter(
+			user__in=following_users
+		).order_by('-created_at')[:20]
 	
 	# For each post, get the associated review and like info
 	posts_with_likes = []
@@ -537,9 +533,9 @@ def feed(request):
 			'post': post,
 			'review': None,
 			'like_count': 0,
+			'comment_count': 0,
 			'user_has_liked': False,
 			'is_top_reviewer': post.user.profile.is_top_reviewer() if hasattr(post.user, 'profile') else False,
-			'comments': []
 		}
 		
 		# Find the associated review if it's a review post
@@ -552,63 +548,98 @@ def feed(request):
 			
 			if review:
 				post_data['review'] = review
-				post_data['like_count'] = review.likes.count()
+				post_data['like_count'] = review.like_count
+				post_data['comment_count'] = review.comment_count
 				post_data['user_has_liked'] = review.likes.filter(user=request.user).exists()
-				post_data['comments'] = review.comments.select_related('user', 'user__profile').all()
 		else:
 			# For non-review posts (diary, list), use PostLike and PostComment
-			post_data['like_count'] = post.likes.count()
+			post_data['like_count'] = post.like_count
+			post_data['comment_count'] = post.comment_count
 			post_data['user_has_liked'] = post.likes.filter(user=request.user).exists()
-			post_data['comments'] = post.comments.select_related('user', 'user__profile').all()
 		
 		posts_with_likes.append(post_data)
 	
+	# Cards preview the newest few comments; one query each for all the
+	# reviews and all the posts on the page
+	review_comments = latest_comments(Comment, 'review', [data['review'].pk for data in posts_with_likes if data['review']])
+	post_comments = latest_comments(
+		PostComment, 'post', [data['post'].pk for data in posts_with_likes if not data['review']],
+	)
+	for post_data in posts_with_likes:
+		if post_data['review']:
+			post_data['comments'], post_data['earlier_comments'] = review_comments.get(post_data['review'].pk, ([], None))
+		else:
+			post_data['comments'], post_data['earlier_comments'] = post_comments.get(post_data['post'].pk, ([], None))
+	
+	# Precomputed nightly; one indexed read
+	from .suggestions import suggestions_for
+	
 	return render(request, 'feed.html', {
 		'posts_with_likes': posts_with_likes,
-		'following_count': len(following_users)
+		'following_count': len(following_users),
+		'follow_suggestions': suggestions_for(request.user),
+		'order': order,
+	})
+
+
+@login_required
+def explore(request):
+	# Ranked once every few minutes for everyone; this reads the shared
+	# snapshot and overlays the viewer's likes
+	from .explore import explore_page
+	
+	page = request.GET.get('page', '1')
+	page = int(page) if page.isdigit() and int(page) > 0 else 1
+	posts_with_likes, next_page = explore_page(page, request.user)
+	
+	return render(request, 'explore.html', {
+		'posts_with_likes': posts_with_likes,
+		'previous_page': page - 1 if page > 1 else None,
+		'next_page': next_page,
 	})
 
 @login_required
 def user_profile(request):
 	user_posts = Post.objects.filter(user=request.user).order_by('-created_at')
-	user_reviews = Review.objects.filter(user=request.user).order_by('-created_at')
+	user_reviews = Review.objects.filter(user=request.user, menu_item__menu__restaurant__deleted_at__isnull=True).order_by('-created_at')
 	profile, created = Profile.objects.get_or_create(user=request.user)
-	following_count = Follow.objects.filter(follower=request.user).count()
-	followers_count = Follow.objects.filter(following=request.user).count()
 	is_top_reviewer = profile.is_top_reviewer()
 	
 	# Get favorite and want-to-try restaurants
 	favorite_restaurants = RestaurantList.objects.filter(
 		user=request.user,
-		list_type='favorite'
+		list_type='favorite',
+		restaurant__deleted_at__isnull=True
 	).select_related('restaurant')
 	
 	want_to_try_restaurants = RestaurantList.objects.filter(
 		user=request.user,
-		list_type='want_to_try'
+		list_type='want_to_try',
+		restaurant__deleted_at__isnull=True
 	).select_related('restaurant')
 	
-	# Calculate flavor profile from favorite restaurants
-	from collections import Counter
-	favorite_cuisines = [fav.restaurant.cuisine_type for fav in favorite_restaurants]
-	cuisine_counts = Counter(favorite_cuisines)
-	# Get top 3 cuisines
-	flavor_profile = cuisine_counts.most_common(3) if cuisine_counts else []
+	# Flavor profile from the stored taste vector
+	taste_profile = TasteProfile.objects.filter(user=request.user).first()
+	flavor_profile = taste_breakdown(taste_profile)
 	
 	# Get user's custom lists
 	user_lists = CustomList.objects.filter(user=request.user).prefetch_related('items')[:6]
 	
+	# Trained offline by refresh_dish_recommendations
+	from .recommendations import recommendations_for
+	
 	return render(request, 'user_profile.html', {
 		'user_posts': user_posts,
 		'user_reviews': user_reviews,
 		'profile': profile,
-		'following_count': following_count,
-		'followers_count': followers_count,
+		'following_count': profile.following_count,
+		'followers_count': profile.followers_count,
 		'is_top_reviewer': is_top_reviewer,
 		'favorite_restaurants': favorite_restaurants,
 		'want_to_try_restaurants': want_to_try_restaurants,
 		'flavor_profile': flavor_profile,
 		'user_lists': user_lists,
+		'dish_recommendations': recommendations_for(request.user),
 	})
 
 @login_required
@@ -617,12 +648,28 @@ def edit_profile(request):
 	if request.method == 'POST':
 		form = ProfileForm(request.POST, request.FILES, instance=profile)
 		if form.is_valid():
-			form.save()
+			profile = form.save(commit=False)
+			if 'profile_picture' in form.changed_data:
+				# The old picture's variants would be shown until the new ones are built
+				profile.picture_variants = {}
+			profile.save()
+			if 'profile_picture' in form.changed_data:
+				schedule_variants(profile, 'profile_picture', 'picture_variants')
 			return redirect('user_profile')
 	else:
 		form = ProfileForm(instance=profile)
 	return render(request, 'edit_profile.html', {'form': form})
 
+
+@login_required
+@require_http_methods(['POST'])
+def delete_account(request):
+	# Deactivated and hidden now; everything they made is purged in the background
+	from django.contrib.auth import logout
+	soft_delete(request.user)
+	logout(request)
+	return redirect('login')
+
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login as auth_login
 
@@ -640,11 +687,11 @@ def signup(request):
 	return render(request, 'registration/signup.html', {'form': form})
 
 @login_required
+@retry_on_lock
 def follow_user(request, username):
-	user_to_follow = get_object_or_404(get_user_model(), username=username)
+	user_to_follow = get_object_or_404(get_user_model(), username=username, is_active=True)
 	if user_to_follow != request.user:
-		follow, created = Follow.objects.get_or_create(follower=request.user, following=user_to_follow)
-		if created:
+		if add_follow(request.user, user_to_follow):
 			# Create notification for the user being followed
 			Notification.objects.create(
 				user=user_to_follow,
@@ -654,19 +701,18 @@ def follow_user(request, username):
 	return redirect('view_user_profile', username=username)
 
 @login_required
+@retry_on_lock
 def unfollow_user(request, username):
-	user_to_unfollow = get_object_or_404(get_user_model(), username=username)
-	Follow.objects.filter(follower=request.user, following=user_to_unfollow).delete()
+	user_to_unfollow = get_object_or_404(get_user_model(), username=username, is_active=True)
+	remove_follow(request.user, user_to_unfollow)
 	return redirect('view_user_profile', username=username)
 
 @login_required
 def view_user_profile(request, username):
-	profile_user = get_object_or_404(get_user_model(), username=username)
+	profile_user = get_object_or_404(get_user_model(), username=username, is_active=True)
 	user_posts = Post.objects.filter(user=profile_user).order_by('-created_at')
-	user_reviews = Review.objects.filter(user=profile_user).order_by('-created_at')
+	user_reviews = Review.objects.filter(user=profile_user, menu_item__menu__restaurant__deleted_at__isnull=True).order_by('-created_at')
 	profile, created = Profile.objects.get_or_create(user=profile_user)
-	following_count = Follow.objects.filter(follower=profile_user).count()
-	followers_count = Follow.objects.filter(following=profile_user).count()
 	is_following = Follow.objects.filter(follower=request.user, following=profile_user).exists()
 	is_own_profile = request.user == profile_user
 	is_top_reviewer = profile.is_top_reviewer()
@@ -674,20 +720,24 @@ def view_user_profile(request, username):
 	# Get favorite and want-to-try restaurants for this user
 	favorite_restaurants = RestaurantList.objects.filter(
 		user=profile_user,
-		list_type='favorite'
+		list_type='favorite',
+		restaurant__deleted_at__isnull=True
 	).select_related('restaurant')
 	
 	want_to_try_restaurants = RestaurantList.objects.filter(
 		user=profile_user,
-		list_type='want_to_try'
+		list_type='want_to_try',
+		restaurant__deleted_at__isnull=True
 	).select_related('restaurant')
 	
-	# Calculate flavor profile from favorite restaurants
-	from collections import Counter
-	favorite_cuisines = [fav.restaurant.cuisine_type for fav in favorite_restaurants]
-	cuisine_counts = Counter(favorite_cuisines)
-	# Get top 3 cuisines
-	flavor_profile = cuisine_counts.most_common(3) if cuisine_counts else []
+	# Flavor profile from the stored taste vectors
+	taste_profile = TasteProfile.objects.filter(user=profile_user).first()
+	flavor_profile = taste_breakdown(taste_profile)
+	compatibility = None
+	if not is_own_profile:
+		compatibility = taste_compatibility(
+			TasteProfile.objects.filter(user=request.user).first(), taste_profile
+		)
 	
 	# Get user's custom lists
 	user_lists = CustomList.objects.filter(user=profile_user).prefetch_related('items')[:6]
@@ -697,44 +747,48 @@ def view_user_profile(request, username):
 		'user_posts': user_posts,
 		'user_reviews': user_reviews,
 		'profile': profile,
-		'following_count': following_count,
-		'followers_count': followers_count,
+		'following_count': profile.following_count,
+		'followers_count': profile.followers_count,
 		'is_following': is_following,
 		'is_own_profile': is_own_profile,
 		'is_top_reviewer': is_top_reviewer,
 		'favorite_restaurants': favorite_restaurants,
 		'want_to_try_restaurants': want_to_try_restaurants,
 		'flavor_profile': flavor_profile,
+		'compatibility': compatibility,
 		'user_lists': user_lists,
 	})
 
 
+def _like_review(request, review):
+	"""Like ``review`` as the current user, notifying its author the first time."""
+	if not add_like(review, request.user):
+		return False
+	if review.user and review.user != request.user:
+		Notification.objects.create(
+			user=review.user,
+			notification_type='review_like',
+			review=review,
+			menu_item=review.menu_item,
+			triggered_by=request.user
+		)
+	return True
+
+
 @login_required
+@retry_on_lock
 def like_review(request, review_id):
 	review = get_object_or_404(Review, id=review_id)
-	like, created = ReviewLike.objects.get_or_create(review=review, user=request.user)
-	
-	if not created:
-		# Unlike if already liked
-		like.delete()
-		liked = False
-	else:
-		liked = True
-		# Create notification for the review author
-		if review.user and review.user != request.user:
-			Notification.objects.create(
-				user=review.user,
-				notification_type='review_like',
-				review=review,
-				menu_item=review.menu_item,
-				triggered_by=request.user
-			)
+	# Toggle: unlike if already liked
+	liked = _like_review(request, review)
+	if not liked:
+		remove_like(review, request.user)
 	
 	# Return JSON for AJAX or redirect for regular requests
 	if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
 		return JsonResponse({
 			'liked': liked,
-			'like_count': review.likes.count()
+			'like_count': review.like_count
 		})
 	
 	# Redirect back to the previous page
@@ -742,6 +796,23 @@ def like_review(request, review_id):
 
 
 @login_required
+@require_http_methods(['POST', 'DELETE'])
+@retry_on_lock
+def review_like(request, review_id):
+	"""Idempotent like (POST) and unlike (DELETE): repeating either changes nothing."""
+	review = get_object_or_404(Review, id=review_id)
+	if request.method == 'POST':
+		_like_review(request, review)
+	else:
+		remove_like(review, request.user)
+	return JsonResponse({
+		'liked': request.method == 'POST',
+		'like_count': review.like_count
+	})
+
+
+@login_required
+@retry_on_lock
 def toggle_restaurant_list(request, restaurant_id, list_type):
 	restaurant = get_object_or_404(Restaurant, id=restaurant_id)
 	
@@ -769,17 +840,16 @@ def toggle_restaurant_list(request, restaurant_id, list_type):
 
 
 @login_required
+@retry_on_lock
 def add_comment(request, review_id):
 	if request.method == 'POST':
 		review = get_object_or_404(Review, id=review_id)
 		text = request.POST.get('text', '').strip()
+		parent_id = request.POST.get('parent', '')
+		parent = review.comments.filter(pk=parent_id).first() if parent_id.isdigit() else None
 		
 		if text:
-			comment = Comment.objects.create(
-				review=review,
-				user=request.user,
-				text=text
-			)
+			comment = comment_on(review, request.user, text, parent)
 			
 			# Create notification for the review author
 			if review.user and review.user != request.user:
@@ -803,7 +873,7 @@ def add_comment(request, review_id):
 					if profile.display_name:
 						display_name = profile.display_name
 					if profile.profile_picture:
-						profile_picture_url = profile.profile_picture.url
+						profile_picture_url = variant_url(profile.profile_picture, profile.picture_variants, 'avatar')
 				
 				return JsonResponse({
 					'success': True,
@@ -821,17 +891,46 @@ def add_comment(request, review_id):
 
 
 @login_required
+def review_comments(request, review_id):
+	"""The page of a review's comments before ``?before=<cursor>``, for "View earlier comments"."""
+	review = get_object_or_404(Review, id=review_id)
+	before = request.GET.get('before', '')
+	comments, earlier = comment_page(review.comments.all(), parse_cursor(before))
+	return render(request, 'comment_thread_partial.html', {
+		'comments': comments,
+		'earlier': earlier,
+		'url_name': 'review_comments',
+		'parent_id': review.id,
+		'kind': 'review',
+		'replies_loaded': True,
+	})
+
+
+@login_required
+def comment_replies(request, comment_id):
+	"""Every reply below one comment on a review, in thread order."""
+	comment = get_object_or_404(Comment.objects.select_related('review'), id=comment_id)
+	return render(request, 'comment_thread_partial.html', {
+		'comments': subtree(comment.review.comments.all(), comment),
+		'kind': 'review',
+		'replies_loaded': True,
+	})
+
+
+@login_required
+@retry_on_lock
 def delete_comment(request, comment_id):
-	comment = get_object_or_404(Comment, id=comment_id)
+	comment = get_object_or_404(Comment.objects.select_related('review'), id=comment_id)
 	
 	# Allow the comment author or staff to delete it
 	if comment.user != request.user and not request.user.is_staff:
 		return JsonResponse({'success': False, 'error': 'Unauthorized'}, status=403)
 	
-	comment.delete()
+	# Replies go with it
+	deleted = remove_comment(comment.review, comment)
 	
 	if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-		return JsonResponse({'success': True})
+		return JsonResponse({'success': True, 'deleted': deleted})
 	
 	return redirect(request.META.get('HTTP_REFERER', 'feed'))
 
@@ -893,9 +992,13 @@ def create_list(request):
 
 
 @login_required
+@conditional_page(view_list_state)
 def view_list(request, list_id):
 	custom_list = get_object_or_404(CustomList, id=list_id)
-	items = custom_list.items.select_related('menu_item__menu__restaurant', 'restaurant').all()
+	# Entries for deleted restaurants and dishes go once the purge reaches them; hide them until then
+	items = custom_list.items.select_related('menu_item__menu__restaurant', 'restaurant').exclude(
+		restaurant__deleted_at__isnull=False
+	).exclude(menu_item__menu__restaurant__deleted_at__isnull=False)
 	is_owner = custom_list.user == request.user
 	
 	# Calculate ratings for each item
@@ -990,11 +1093,12 @@ def remove_from_list(request, list_id, item_id):
 @login_required
 def delete_list(request, list_id):
 	custom_list = get_object_or_404(CustomList, id=list_id, user=request.user)
-	custom_list.delete()
+	soft_delete(custom_list)
 	return redirect('my_lists')
 
 
 @login_required
+@conditional_page(user_lists_state, full_page=False)
 def get_user_lists(request):
 	list_type = request.GET.get('type')
 	
@@ -1080,7 +1184,8 @@ def delete_restaurant(request, restaurant_id):
 	if not request.user.is_staff:
 		return JsonResponse({'success': False, 'error': 'Unauthorized'}, status=403)
 	
-	restaurant.delete()
+	# Hidden now; its menu, reviews and the rest are purged in the background
+	soft_delete(restaurant)
 	
 	if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
 		return JsonResponse({'success': True})
@@ -1099,7 +1204,10 @@ def notifications(request):
 	unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
 	
 	# Get notifications with slice
-	user_notifications = Notification.objects.filter(user=request.user).select_related(
+	# Leave out notifications about things deleted but not yet purged
+	user_notifications = Notification.objects.filter(user=request.user).exclude(
+		restaurant__deleted_at__isnull=False
+	).exclude(post__deleted_at__isnull=False).select_related(
 		'triggered_by', 'restaurant', 'menu_item', 'review'
 	).order_by('-created_at')[:50]
 	
@@ -1110,6 +1218,7 @@ def notifications(request):
 
 
 @login_required
+@retry_on_lock
 def mark_notification_read(request, notification_id):
 	notification = get_object_or_404(Notification, id=notification_id, user=request.user)
 	notification.is_read = True
@@ -0,0 +1,169 @@
+// Real-time search functionality
+let searchTimeout;
+const searchInput = document.getElementById('searchInput');
+const searchDropdown = document.getElementById('searchDropdown');
+const searchForm = document.getElementById('searchForm');
+
+if (searchInput && searchDropdown) {
+    searchInput.addEventListener('input', function(e) {
+        const query = e.target.value.trim();
+
+        // Clear previous timeout
+        clearTimeout(searchTimeout);
+
+        // Hide dropdown if query is empty
+        if (query.length === 0) {
+            searchDropdown.classList.remove('active');
+            return;
+        }
+
+        // Show loading state
+        searchDropdown.innerHTML = '<div class="search-dropdown-loading"><i class="fas fa-spinner fa-spin"></i> Searching...</div>';
+        searchDropdown.classList.add('active');
+
+        // Debounce search requests
+        searchTimeout = setTimeout(() => {
+            fetch(`/api/live-search/?q=${encodeURIComponent(query)}`)
+                .then(response => response.json())
+                .then(data => {
+                    displaySearchResults(data, query);
+                })
+                .catch(error => {
+                    console.error('Search error:', error);
+                    searchDropdown.innerHTML = '<div class="search-dropdown-empty">Error loading results</div>';
+                });
+        }, 300);
+    });
+
+    // Close dropdown when clicking outside
+    document.addEventListener('click', function(e) {
+        if (!searchInput.contains(e.target) && !searchDropdown.contains(e.target)) {
+            searchDropdown.classList.remove('active');
+        }
+    });
+}
+
+function displaySearchResults(data, query) {
+    const dropdown = document.getElementById('searchDropdown');
+    let html = '';
+
+    // Display users
+    if (data.users && data.users.length > 0) {
+        html += '<div class="search-dropdown-section">';
+        html += '<div class="search-dropdown-title">People</div>';
+        data.users.forEach(user => {
+            html += `
+                <a href="/user/${user.username}/" class="search-dropdown-item">
+                    <div class="search-dropdown-icon"><i class="fas fa-user"></i></div>
+                    <div class="search-dropdown-content">
+                        <div class="search-dropdown-primary">${user.display_name}</div>
+                        <div class="search-dropdown-secondary">@${user.username}</div>
+                    </div>
+                </a>
+            `;
+        });
+        html += '</div>';
+    }
+
+    // Display restaurants
+    if (data.restaurants && data.restaurants.length > 0) {
+        html += '<div class="search-dropdown-section">';
+        html += '<div class="search-dropdown-title">Restaurants</div>';
+        data.restaurants.forEach(restaurant => {
+            const ratingDisplay = restaurant.rating > 0 
+                ? `<span style="color: #FB8B24; font-weight: 600;">${restaurant.rating}/10</span> • ` 
+                : '';
+            html += `
+                <a href="/restaurants/${restaurant.id}/" class="search-dropdown-item">
+                    <div class="search-dropdown-icon"><i class="fas fa-utensils"></i></div>
+                    <div class="search-dropdown-content">
+                        <div class="search-dropdown-primary">${restaurant.name}</div>
+                        <div class="search-dropdown-secondary">${ratingDisplay}${restaurant.city}</div>
+                    </div>
+                </a>
+            `;
+        });
+        html += '</div>';
+    }
+
+    // Show message if no results
+    if ((!data.users || data.users.length === 0) && (!data.restaurants || data.restaurants.length === 0)) {
+        html = '<div class="search-dropdown-empty">No results found</div>';
+    }
+
+    dropdown.innerHTML = html;
+    dropdown.classList.add('active');
+}
+
+// Django's CSRF token, for fetch() calls made outside a form
+function csrfToken() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]*)/);
+    return match ? decodeURIComponent(match[1]) : '';
+}
+
+// Replace a "View earlier comments" button with the page of comments before
+// it, which ends with its own button when there are more
+function loadEarlierComments(button) {
+    const placeholder = button.closest('.earlier-comments');
+    fetch(button.dataset.url, {
+        headers: {
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+    })
+        .then(response => response.text())
+        .then(html => {
+            placeholder.insertAdjacentHTML('afterend', html);
+            placeholder.remove();
+        })
+        .catch(error => console.error('Error loading comments:', error));
+}
+
+// Show the replies under a comment in place of its "View replies" button
+function loadReplies(button) {
+    const comment = button.closest('.comment');
+    fetch(button.dataset.url, {
+        headers: {
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+    })
+        .then(response => response.text())
+        .then(html => {
+            comment.insertAdjacentHTML('afterend', html);
+            button.remove();
+        })
+        .catch(error => console.error('Error loading replies:', error));
+}
+
+// Fade out a deleted comment along with the replies listed under it
+function removeCommentThread(comment) {
+    const path = comment.dataset.path;
+    const thread = [comment, ...comment.parentElement.querySelectorAll('.comment')]
+        .filter(el => el.dataset.path.startsWith(path));
+    new Set(thread).forEach(el => {
+        el.style.opacity = '0';
+        el.style.transition = 'opacity 0.3s';
+        setTimeout(() => el.remove(), 300);
+    });
+}
+
+// Fetch and update notification count
+function updateNotificationCount() {
+    fetch('/api/notifications/unread-count/')
+        .then(response => response.json())
+        .then(data => {
+            const badge = document.getElementById('notificationBadge');
+            if (data.count > 0) {
+                badge.textContent = data.count > 99 ? '99+' : data.count;
+                badge.style.display = 'block';
+            } else {
+                badge.style.display = 'none';
+            }
+        })
+        .catch(error => console.error('Error fetching notification count:', error));
+}
+
+// Update count on page load
+updateNotificationCount();
+
+// Update count every 30 seconds
+setInterval(updateNotificationCount, 30000);
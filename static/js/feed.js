@@ -0,0 +1,316 @@
+function toggleComments(reviewId) {
+  const commentsDiv = document.getElementById(`comments-${reviewId}`);
+  if (commentsDiv.style.display === 'none') {
+    commentsDiv.style.display = 'block';
+  } else {
+    commentsDiv.style.display = 'none';
+  }
+}
+
+function toggleCommentsPost(postId) {
+  const commentsDiv = document.getElementById(`comments-post-${postId}`);
+  if (commentsDiv.style.display === 'none') {
+    commentsDiv.style.display = 'block';
+  } else {
+    commentsDiv.style.display = 'none';
+  }
+}
+
+function likePost(event, postId, currentlyLiked) {
+  event.preventDefault();
+
+  fetch(`/posts/${postId}/likes/`, {
+    // Set the state the user sees, so a repeated click cannot undo itself
+    method: currentlyLiked ? 'DELETE' : 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': csrfToken(),
+    },
+  })
+  .then(response => response.json())
+  .then(data => {
+    const icon = document.getElementById(`like-icon-post-${postId}`);
+    const count = document.getElementById(`like-count-post-${postId}`);
+
+    if (data.liked) {
+      icon.setAttribute('fill', '#FB8B24');
+      icon.setAttribute('stroke', '#FB8B24');
+    } else {
+      icon.setAttribute('fill', 'none');
+      icon.setAttribute('stroke', 'rgba(91, 89, 65, 0.6)');
+    }
+
+    count.textContent = data.like_count;
+
+    // Update the onclick handler for next click
+    const btn = document.getElementById(`like-btn-post-${postId}`);
+    btn.setAttribute('onclick', `likePost(event, ${postId}, ${data.liked})`);
+  })
+  .catch(error => console.error('Error:', error));
+}
+
+function addPostComment(event, postId) {
+  event.preventDefault();
+
+  const form = document.getElementById(`comment-form-post-${postId}`);
+  const input = document.getElementById(`comment-input-post-${postId}`);
+  const text = input.value.trim();
+
+  if (!text) return;
+
+  const formData = new FormData(form);
+
+  fetch(form.action, {
+    method: 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': formData.get('csrfmiddlewaretoken')
+    },
+    body: formData
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      const commentsList = document.getElementById(`comments-list-post-${postId}`);
+
+      // Show the comments list if it's hidden
+      if (commentsList.style.display === 'none') {
+        commentsList.style.display = 'block';
+      }
+
+      // Create profile picture HTML
+      let profilePicHtml;
+      if (data.comment.profile_picture_url) {
+        profilePicHtml = `<img src="${data.comment.profile_picture_url}" alt="${data.comment.username}" style="width: 32px; height: 32px; border-radius: 50%; object-fit: cover; border: 1.5px solid #FB8B24;">`;
+      } else {
+        profilePicHtml = `<div style="width: 32px; height: 32px; border-radius: 50%; background-color: #5B5941; display: flex; align-items: center; justify-content: center; color: #F7EDE2; font-weight: bold; font-size: 0.9em; border: 1.5px solid #FB8B24;">${data.comment.username.charAt(0).toUpperCase()}</div>`;
+      }
+
+      // Create new comment HTML
+      const commentHtml = `
+        <div style="display: flex; gap: 10px; margin-bottom: 12px;">
+          <a href="/user/${data.comment.username}/" style="flex-shrink: 0;">
+            ${profilePicHtml}
+          </a>
+          <div style="flex: 1;">
+            <div style="margin-bottom: 3px;">
+              <a href="/user/${data.comment.username}/" style="font-weight: 600; font-size: 0.9em; color: #5B5941;">
+                ${data.comment.display_name}
+              </a>
+              <span style="color: rgba(91, 89, 65, 0.5); font-size: 0.75em; margin-left: 6px;">${data.comment.created_at}</span>
+            </div>
+            <p style="margin: 0; font-size: 0.9em; color: rgba(91, 89, 65, 0.9);">${data.comment.text}</p>
+          </div>
+        </div>
+      `;
+
+      // Add comment to the list
+      commentsList.insertAdjacentHTML('beforeend', commentHtml);
+
+      // Update comment count
+      const countSpan = document.getElementById(`comment-count-post-${postId}`);
+      if (countSpan) {
+        const currentCount = parseInt(countSpan.textContent);
+        countSpan.textContent = currentCount + 1;
+      }
+
+      // Clear the input
+      input.value = '';
+    }
+  })
+  .catch(error => console.error('Error:', error));
+}
+
+function addComment(event, reviewId) {
+  event.preventDefault();
+
+  const form = document.getElementById(`comment-form-${reviewId}`);
+  const input = document.getElementById(`comment-input-${reviewId}`);
+  const text = input.value.trim();
+
+  if (!text) return;
+
+  const formData = new FormData(form);
+
+  fetch(form.action, {
+    method: 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': formData.get('csrfmiddlewaretoken')
+    },
+    body: formData
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      const commentsList = document.getElementById(`comments-list-${reviewId}`);
+
+      // Show the comments list if it's hidden
+      if (commentsList.style.display === 'none') {
+        commentsList.style.display = 'block';
+      }
+
+      // Create profile picture HTML
+      let profilePicHtml;
+      if (data.comment.profile_picture_url) {
+        profilePicHtml = `<img src="${data.comment.profile_picture_url}" alt="${data.comment.username}" style="width: 32px; height: 32px; border-radius: 50%; object-fit: cover; border: 1.5px solid #FB8B24;">`;
+      } else {
+        profilePicHtml = `<div style="width: 32px; height: 32px; border-radius: 50%; background-color: #5B5941; display: flex; align-items: center; justify-content: center; color: #F7EDE2; font-weight: bold; font-size: 0.9em; border: 1.5px solid #FB8B24;">${data.comment.username.charAt(0).toUpperCase()}</div>`;
+      }
+
+      // Create new comment HTML
+      const commentHtml = `
+        <div style="display: flex; gap: 10px; margin-bottom: 12px;">
+          <a href="/user/${data.comment.username}/" style="flex-shrink: 0;">
+            ${profilePicHtml}
+          </a>
+          <div style="flex: 1;">
+            <div style="margin-bottom: 3px;">
+              <a href="/user/${data.comment.username}/" style="font-weight: 600; font-size: 0.9em; color: #5B5941;">
+                ${data.comment.display_name}
+              </a>
+              <span style="color: rgba(91, 89, 65, 0.5); font-size: 0.75em; margin-left: 6px;">${data.comment.created_at}</span>
+            </div>
+            <p style="margin: 0; font-size: 0.9em; color: rgba(91, 89, 65, 0.9);">${data.comment.text}</p>
+          </div>
+        </div>
+      `;
+
+      // Add comment to the list
+      commentsList.insertAdjacentHTML('beforeend', commentHtml);
+
+      // Update comment count
+      const countSpan = document.getElementById(`comment-count-${reviewId}`);
+      if (countSpan) {
+        const currentCount = parseInt(countSpan.textContent);
+        countSpan.textContent = currentCount + 1;
+      }
+
+      // Clear the input
+      input.value = '';
+    }
+  })
+  .catch(error => {
+    console.error('Error adding comment:', error);
+  });
+}
+
+function likeReview(event, reviewId, currentlyLiked) {
+  event.preventDefault();
+
+  const icon = document.getElementById(`like-icon-${reviewId}`);
+  const count = document.getElementById(`like-count-${reviewId}`);
+
+  // Optimistic update
+  if (currentlyLiked) {
+    icon.setAttribute('fill', 'none');
+    icon.setAttribute('stroke', 'rgba(91, 89, 65, 0.6)');
+  } else {
+    icon.setAttribute('fill', '#FB8B24');
+    icon.setAttribute('stroke', '#FB8B24');
+  }
+
+  fetch(`/reviews/${reviewId}/likes/`, {
+    // Set the state the user sees, so a repeated click cannot undo itself
+    method: currentlyLiked ? 'DELETE' : 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': csrfToken(),
+    }
+  })
+  .then(response => response.json())
+  .then(data => {
+    // Update with server response
+    if (data.liked) {
+      icon.setAttribute('fill', '#FB8B24');
+      icon.setAttribute('stroke', '#FB8B24');
+    } else {
+      icon.setAttribute('fill', 'none');
+      icon.setAttribute('stroke', 'rgba(91, 89, 65, 0.6)');
+    }
+    count.textContent = data.like_count;
+
+    // Update the onclick handler for next click
+    const btn = document.getElementById(`like-btn-${reviewId}`);
+    btn.setAttribute('onclick', `likeReview(event, ${reviewId}, ${data.liked})`);
+  })
+  .catch(error => {
+    console.error('Error:', error);
+    // Revert on error
+    if (currentlyLiked) {
+      icon.setAttribute('fill', '#FB8B24');
+      icon.setAttribute('stroke', '#FB8B24');
+    } else {
+      icon.setAttribute('fill', 'none');
+      icon.setAttribute('stroke', 'rgba(91, 89, 65, 0.6)');
+    }
+  });
+}
+
+function deletePost(event, postId) {
+  event.preventDefault();
+
+  if (!confirm('Are you sure you want to delete this post?')) {
+    return;
+  }
+
+  fetch(`/posts/${postId}/delete/`, {
+    method: 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+    }
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      // Remove the post from the page
+      const postElement = event.target.closest('li');
+      if (postElement) {
+        postElement.style.opacity = '0';
+        postElement.style.transition = 'opacity 0.3s';
+        setTimeout(() => postElement.remove(), 300);
+      }
+    } else {
+      alert('Error deleting post: ' + data.error);
+    }
+  })
+  .catch(error => {
+    console.error('Error:', error);
+    alert('Error deleting post');
+  });
+}
+
+function deleteComment(event, commentId, commentType) {
+  event.preventDefault();
+
+  if (!confirm('Are you sure you want to delete this comment?')) {
+    return;
+  }
+
+  const url = commentType === 'review' ? `/comments/${commentId}/delete/` : `/post-comments/${commentId}/delete/`;
+
+  fetch(url, {
+    method: 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+    }
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      // Remove the comment and its replies from the page
+      const commentElement = event.target.closest('.comment');
+      if (commentElement) {
+        removeCommentThread(commentElement);
+      }
+    } else {
+      alert('Error deleting comment: ' + data.error);
+    }
+  })
+  .catch(error => {
+    console.error('Error:', error);
+    alert('Error deleting comment');
+  });
+}
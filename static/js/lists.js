@@ -0,0 +1,64 @@
+let currentItemType = '';
+let currentItemId = '';
+
+function openAddToListModal(itemType, itemId) {
+  currentItemType = itemType;
+  currentItemId = itemId;
+  
+  // Fetch user's lists
+  fetch('/api/get-user-lists/?type=' + itemType)
+    .then(response => response.json())
+    .then(data => {
+      const container = document.getElementById('listsContainer');
+      if (data.lists && data.lists.length > 0) {
+        container.innerHTML = data.lists.map(list => `
+          <div onclick="addToList(${list.id})" style="padding: 15px; border: 1px solid rgba(91, 89, 65, 0.2); border-radius: 8px; margin-bottom: 10px; cursor: pointer; transition: all 0.2s;" onmouseover="this.style.backgroundColor='rgba(251, 139, 36, 0.05)'; this.style.borderColor='#FB8B24'" onmouseout="this.style.backgroundColor=''; this.style.borderColor='rgba(91, 89, 65, 0.2)'">
+            <div style="font-weight: 600; color: #5B5941; margin-bottom: 4px;">${list.title}</div>
+            <div style="font-size: 0.85em; color: rgba(91, 89, 65, 0.6);">${list.item_count} items</div>
+          </div>
+        `).join('');
+      } else {
+        container.innerHTML = '<p style="text-align: center; color: rgba(91, 89, 65, 0.6); padding: 20px;">No lists yet. Create one to get started!</p>';
+      }
+      
+      document.getElementById('addToListModal').style.display = 'flex';
+    });
+}
+
+function closeAddToListModal() {
+  document.getElementById('addToListModal').style.display = 'none';
+}
+
+function addToList(listId) {
+  const formData = new FormData();
+  formData.append('list_id', listId);
+  formData.append('item_type', currentItemType);
+  formData.append('item_id', currentItemId);
+  const modal = document.getElementById('addToListModal');
+  formData.append('csrfmiddlewaretoken', modal.dataset.csrfToken);
+  
+  fetch(modal.dataset.addUrl, {
+    method: 'POST',
+    body: formData
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      closeAddToListModal();
+      alert('Added to list successfully!');
+    } else {
+      alert(data.error || 'Failed to add to list');
+    }
+  })
+  .catch(error => {
+    alert('Error adding to list');
+    console.error(error);
+  });
+}
+
+// Close modal on outside click
+document.getElementById('addToListModal').addEventListener('click', function(e) {
+  if (e.target === this) {
+    closeAddToListModal();
+  }
+});
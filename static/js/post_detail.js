@@ -0,0 +1,146 @@
+function likeReview(event, reviewId, currentlyLiked) {
+  event.preventDefault();
+
+  fetch(`/reviews/${reviewId}/likes/`, {
+    // Set the state the user sees, so a repeated click cannot undo itself
+    method: currentlyLiked ? 'DELETE' : 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': csrfToken(),
+    },
+  })
+  .then(response => response.json())
+  .then(data => {
+    const icon = document.getElementById(`like-icon-${reviewId}`);
+    const count = document.getElementById(`like-count-${reviewId}`);
+
+    if (data.liked) {
+      icon.setAttribute('fill', '#FB8B24');
+      icon.setAttribute('stroke', '#FB8B24');
+    } else {
+      icon.setAttribute('fill', 'none');
+      icon.setAttribute('stroke', 'rgba(91, 89, 65, 0.6)');
+    }
+
+    count.textContent = data.like_count;
+
+    // Update the onclick handler for next click
+    const btn = document.getElementById(`like-btn-${reviewId}`);
+    btn.setAttribute('onclick', `likeReview(event, ${reviewId}, ${data.liked})`);
+  })
+  .catch(error => console.error('Error:', error));
+}
+
+function addComment(event, reviewId) {
+  event.preventDefault();
+  const form = event.target;
+  const formData = new FormData(form);
+
+  fetch(form.action, {
+    method: 'POST',
+    body: formData,
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+    },
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      const commentsList = document.getElementById(`comments-list-${reviewId}`);
+      const emptyMessage = commentsList.querySelector('p[style*="font-style: italic"]');
+      if (emptyMessage) {
+        emptyMessage.remove();
+      }
+
+      const commentHTML = `
+        <div style="display: flex; gap: 10px; margin-bottom: 12px;">
+          <a href="/user/${data.comment.username}/" style="flex-shrink: 0;">
+            ${data.comment.profile_picture_url ? 
+              `<img src="${data.comment.profile_picture_url}" alt="${data.comment.username}" style="width: 32px; height: 32px; border-radius: 50%; object-fit: cover; border: 1.5px solid #FB8B24;">` :
+              `<div style="width: 32px; height: 32px; border-radius: 50%; background-color: #5B5941; display: flex; align-items: center; justify-content: center; color: #F7EDE2; font-weight: bold; font-size: 0.9em; border: 1.5px solid #FB8B24;">
+                ${data.comment.username.charAt(0).toUpperCase()}
+              </div>`
+            }
+          </a>
+          <div style="flex: 1;">
+            <div style="margin-bottom: 3px;">
+              <a href="/user/${data.comment.username}/" style="font-weight: 600; font-size: 0.9em; color: #5B5941;">
+                ${data.comment.display_name}
+              </a>
+              <span style="color: rgba(91, 89, 65, 0.5); font-size: 0.75em; margin-left: 6px;">${data.comment.created_at}</span>
+            </div>
+            <p style="margin: 0; font-size: 0.9em; color: rgba(91, 89, 65, 0.9);">${data.comment.text}</p>
+          </div>
+        </div>
+      `;
+
+      commentsList.insertAdjacentHTML('beforeend', commentHTML);
+
+      // Update comment count
+      const countElement = document.getElementById(`comment-count-${reviewId}`);
+      if (countElement) {
+        countElement.textContent = parseInt(countElement.textContent) + 1;
+      }
+
+      // Clear input
+      document.getElementById(`comment-input-${reviewId}`).value = '';
+    }
+  })
+  .catch(error => console.error('Error:', error));
+}
+
+function deletePostDetail(postId) {
+  if (!confirm('Are you sure you want to delete this post?')) {
+    return;
+  }
+
+  fetch(`/posts/${postId}/delete/`, {
+    method: 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+    }
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      // Redirect to feed after deletion
+      window.location.href = '/feed/';
+    } else {
+      alert('Error deleting post: ' + data.error);
+    }
+  })
+  .catch(error => {
+    console.error('Error:', error);
+    alert('Error deleting post');
+  });
+}
+
+function deleteComment(event, commentId, commentType) {
+  if (!confirm('Are you sure you want to delete this comment?')) {
+    return;
+  }
+
+  const url = commentType === 'review' ? `/comments/${commentId}/delete/` : `/post-comments/${commentId}/delete/`;
+
+  fetch(url, {
+    method: 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+    }
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      // Remove the comment and its replies from the page
+      removeCommentThread(event.target.closest('.comment'));
+    } else {
+      alert('Error deleting comment: ' + data.error);
+    }
+  })
+  .catch(error => {
+    console.error('Error:', error);
+    alert('Error deleting comment');
+  });
+}
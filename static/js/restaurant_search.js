@@ -0,0 +1,499 @@
+var filterTimeout;
+var selectedCuisines = new Set(JSON.parse(document.getElementById('selected-types').textContent).map(String));
+var selectedDays = new Set();
+
+function toggleHappyHourMode() {
+  const input = document.getElementById('happy-hour-mode-input');
+  const filters = document.getElementById('happy-hour-filters');
+  const btn = document.getElementById('happy-hour-toggle-btn');
+
+  if (input.value === 'true') {
+    input.value = 'false';
+    filters.style.display = 'none';
+    btn.style.backgroundColor = '#fff';
+    btn.style.color = '#FB8B24';
+  } else {
+    input.value = 'true';
+    filters.style.display = 'block';
+    btn.style.backgroundColor = '#FB8B24';
+    btn.style.color = '#F7EDE2';
+  }
+
+  filterRestaurants();
+}
+
+function selectDay(day) {
+  // Handle 'Any' button
+  if (day === '') {
+    selectedDays.clear();
+  } else {
+    // Toggle the selected day
+    if (selectedDays.has(day)) {
+      selectedDays.delete(day);
+    } else {
+      selectedDays.add(day);
+    }
+  }
+
+  // Update hidden input with comma-separated days
+  document.getElementById('hh-days-input').value = Array.from(selectedDays).join(',');
+
+  // Update pill styles
+  document.querySelectorAll('.day-pill').forEach(pill => {
+    const pillDay = pill.getAttribute('data-day');
+    if (pillDay === '' && selectedDays.size === 0) {
+      pill.style.backgroundColor = '#5B5941';
+      pill.style.color = '#F7EDE2';
+    } else if (selectedDays.has(pillDay)) {
+      pill.style.backgroundColor = '#5B5941';
+      pill.style.color = '#F7EDE2';
+    } else {
+      pill.style.backgroundColor = '#fff';
+      pill.style.color = '#5B5941';
+    }
+  });
+
+  filterRestaurants();
+}
+
+function setTime(time) {
+  document.getElementById('hh-time-input').value = time;
+  filterRestaurants();
+}
+
+function setQuickFilter(preset) {
+  const now = new Date();
+  const dayNames = ['sunday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday'];
+
+  if (preset === 'now') {
+    // Set current day and time
+    const currentDay = dayNames[now.getDay()];
+    const hours = String(now.getHours()).padStart(2, '0');
+    const minutes = String(now.getMinutes()).padStart(2, '0');
+    selectedDays.clear();
+    selectedDays.add(currentDay);
+    document.getElementById('hh-days-input').value = currentDay;
+    updateDayPillStyles();
+    setTime(`${hours}:${minutes}`);
+  } else if (preset === 'tonight') {
+    // Set current day and 6pm
+    const currentDay = dayNames[now.getDay()];
+    selectedDays.clear();
+    selectedDays.add(currentDay);
+    document.getElementById('hh-days-input').value = currentDay;
+    updateDayPillStyles();
+    setTime('18:00');
+  } else if (preset === 'weekend') {
+    // Set Friday AND Saturday at 5pm
+    selectedDays.clear();
+    selectedDays.add('friday');
+    selectedDays.add('saturday');
+    document.getElementById('hh-days-input').value = 'friday,saturday';
+    updateDayPillStyles();
+    setTime('17:00');
+  }
+}
+
+function updateDayPillStyles() {
+  document.querySelectorAll('.day-pill').forEach(pill => {
+    const pillDay = pill.getAttribute('data-day');
+    if (pillDay === '' && selectedDays.size === 0) {
+      pill.style.backgroundColor = '#5B5941';
+      pill.style.color = '#F7EDE2';
+    } else if (selectedDays.has(pillDay)) {
+      pill.style.backgroundColor = '#5B5941';
+      pill.style.color = '#F7EDE2';
+    } else {
+      pill.style.backgroundColor = '#fff';
+      pill.style.color = '#5B5941';
+    }
+  });
+}
+
+function setCurrentTime() {
+  const now = new Date();
+  const hours = String(now.getHours()).padStart(2, '0');
+  const minutes = String(now.getMinutes()).padStart(2, '0');
+  const timeInput = document.getElementById('hh-time-input');
+  timeInput.value = `${hours}:${minutes}`;
+  filterRestaurants();
+}
+
+function updateCuisineInputs() {
+  const container = document.getElementById('cuisine-inputs');
+  container.innerHTML = '';
+  selectedCuisines.forEach(cuisine => {
+    const input = document.createElement('input');
+    input.type = 'hidden';
+    input.name = 'cuisine_type';
+    input.value = cuisine;
+    container.appendChild(input);
+  });
+}
+
+function updatePillStyles() {
+  document.querySelectorAll('.category-pill').forEach(pill => {
+    const value = pill.getAttribute('data-value');
+    const isSelected = value === '' ? selectedCuisines.size === 0 : selectedCuisines.has(value);
+
+    if (isSelected) {
+      pill.style.backgroundColor = '#FB8B24';
+      pill.style.color = '#F7EDE2';
+      pill.style.borderColor = '#FB8B24';
+    } else {
+      pill.style.backgroundColor = '#fff';
+      pill.style.color = '#5B5941';
+      pill.style.borderColor = 'rgba(91, 89, 65, 0.2)';
+    }
+  });
+}
+
+function updateFacetCounts(facets) {
+  // Options missing from a facet have no results under the other filters
+  document.querySelectorAll('[data-facet]').forEach(el => {
+    const counts = facets[el.getAttribute('data-facet')] || {};
+    const count = counts[el.getAttribute('data-value')] || 0;
+    el.textContent = `${el.getAttribute('data-label')} (${count})`;
+  });
+}
+
+function filterRestaurants() {
+  var form = document.getElementById('filter-form');
+  var formData = new FormData(form);
+  var params = new URLSearchParams(formData);
+
+  fetch('?' + params.toString(), {
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest'
+    }
+  })
+  .then(response => response.text())
+  .then(html => {
+    var newList = document.getElementById('restaurants-list');
+    if (newList) {
+      newList.innerHTML = html;
+      var counts = document.getElementById('facet-counts');
+      if (counts) {
+        updateFacetCounts(JSON.parse(counts.textContent));
+      }
+    }
+  })
+  .catch(error => console.error('Error:', error));
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+  var searchBar = document.getElementById('search-bar');
+  var locationSelect = document.getElementById('location-select');
+  var ratingSelect = document.getElementById('rating-select');
+  var hhTimeInput = document.getElementById('hh-time-input');
+
+  // Category pill click handlers
+  document.querySelectorAll('.category-pill').forEach(pill => {
+    pill.addEventListener('click', function() {
+      const value = this.getAttribute('data-value');
+
+      if (value === '') {
+        // "All" button clicked - clear all selections
+        selectedCuisines.clear();
+      } else {
+        // Toggle this cuisine
+        if (selectedCuisines.has(value)) {
+          selectedCuisines.delete(value);
+        } else {
+          selectedCuisines.add(value);
+        }
+      }
+
+      updateCuisineInputs();
+      updatePillStyles();
+      filterRestaurants();
+    });
+  });
+
+  // Location dropdown change handler
+  if (locationSelect) {
+    locationSelect.addEventListener('change', function() {
+      filterRestaurants();
+    });
+  }
+
+  // Rating dropdown change handler
+  if (ratingSelect) {
+    ratingSelect.addEventListener('change', function() {
+      filterRestaurants();
+    });
+  }
+
+  // Happy hour time input change
+  if (hhTimeInput) {
+    hhTimeInput.addEventListener('change', function() {
+      filterRestaurants();
+    });
+  }
+
+  // Initialize cuisine inputs
+  updateCuisineInputs();
+
+  // Real-time search - trigger on every keystroke
+  if (searchBar) {
+    searchBar.addEventListener('input', function() {
+      clearTimeout(filterTimeout);
+      filterTimeout = setTimeout(function() {
+        filterRestaurants();
+      }, 300);
+    });
+  }
+});
+
+function resetAddForm() {
+  document.getElementById('add-restaurant-form').style.display = 'none';
+  document.getElementById('location-autocomplete').value = '';
+  document.getElementById('google-search-input').value = '';  // Clear Google search input
+  document.getElementById('google-results').style.display = 'none';  // Hide search results
+  document.getElementById('google-results-list').innerHTML = '';  // Clear search results
+  document.getElementById('restaurant-form').reset();
+  document.getElementById('location-step').style.display = 'block';
+  document.getElementById('details-step').style.display = 'none';
+}
+
+function initAutocomplete() {
+  const input = document.getElementById('location-autocomplete');
+  if (!input) {
+    console.error('Location autocomplete input not found');
+    return;
+  }
+
+  const autocomplete = new google.maps.places.Autocomplete(input, {
+    types: ['establishment', 'geocode'],
+    // Uncomment to restrict to specific country: componentRestrictions: { country: 'ca' }
+  });
+
+  autocomplete.addListener('place_changed', function() {
+    console.log('Place changed event triggered');
+    const place = autocomplete.getPlace();
+    console.log('Place object:', place);
+
+    if (!place.address_components) {
+      console.log('No address components found');
+      return;
+    }
+
+    let streetNumber = '';
+    let route = '';
+    let city = '';
+    let province = '';
+    let country = '';
+    let postalCode = '';
+    let addressLine2 = '';
+
+    for (const component of place.address_components) {
+      const types = component.types;
+      if (types.includes('street_number')) {
+        streetNumber = component.long_name;
+      }
+      if (types.includes('route')) {
+        route = component.long_name;
+      }
+      if (types.includes('subpremise')) {
+        addressLine2 = component.long_name;
+      }
+      if (types.includes('locality') || types.includes('postal_town')) {
+        city = component.long_name;
+      }
+      if (types.includes('administrative_area_level_1')) {
+        province = component.short_name;
+      }
+      if (types.includes('country')) {
+        country = component.long_name;
+      }
+      if (types.includes('postal_code')) {
+        postalCode = component.long_name;
+      }
+    }
+
+    const address1 = `${streetNumber} ${route}`.trim();
+    console.log('Parsed address:', { address1, city, province, country, postalCode });
+
+    // Fill hidden fields
+    document.getElementById('hidden-address1').value = address1;
+    document.getElementById('hidden-address2').value = addressLine2;
+    document.getElementById('hidden-city').value = city;
+    document.getElementById('hidden-province').value = province;
+    document.getElementById('hidden-postal').value = postalCode;
+    document.getElementById('hidden-country').value = country;
+
+    // Show selected address
+    const addressDisplay = `${address1}${addressLine2 ? ', ' + addressLine2 : ''}, ${city}, ${province} ${postalCode}, ${country}`;
+    document.getElementById('selected-address').textContent = addressDisplay;
+
+    console.log('About to hide location-step and show details-step');
+    // Hide location step, show details step
+    document.getElementById('location-step').style.display = 'none';
+    document.getElementById('details-step').style.display = 'block';
+    console.log('Steps toggled');
+
+    // Focus on restaurant name field
+    document.querySelector('input[name="name"]').focus();
+  });
+}
+
+// Load Google Maps API after page loads
+window.addEventListener('load', function() {
+  if (typeof google === 'undefined') {
+    const script = document.createElement('script');
+    const apiKey = JSON.parse(document.getElementById('google-maps-api-key').textContent);
+    script.src = 'https://maps.googleapis.com/maps/api/js?key=' + encodeURIComponent(apiKey) + '&libraries=places&callback=initAutocomplete';
+    script.async = true;
+    script.defer = true;
+    document.head.appendChild(script);
+  } else {
+    initAutocomplete();
+  }
+});
+
+// Google Places search function
+function searchGoogleRestaurants() {
+  const query = document.getElementById('google-search-input').value.trim();
+  if (!query) {
+    alert('Please enter a restaurant name or address');
+    return;
+  }
+
+  // Clear previous results
+  document.getElementById('google-results-list').innerHTML = '';
+  document.getElementById('google-results').style.display = 'none';
+
+  // Show loading message
+  document.getElementById('search-loading').style.display = 'block';
+
+  // Fetch results from our API endpoint
+  fetch(`/api/search-google-restaurants/?q=${encodeURIComponent(query)}`)
+    .then(response => response.json())
+    .then(data => {
+      document.getElementById('search-loading').style.display = 'none';
+
+      if (data.error) {
+        alert('Error searching: ' + data.error);
+        return;
+      }
+
+      const results = data.results || [];
+      if (results.length === 0) {
+        alert('No restaurants found. Try a different search.');
+        return;
+      }
+
+      // Display results
+      const resultsList = document.getElementById('google-results-list');
+      resultsList.innerHTML = '';
+
+      results.forEach((result, index) => {
+        const resultDiv = document.createElement('div');
+        resultDiv.style.cssText = `
+          padding: 12px;
+          margin-bottom: 10px;
+          background-color: #fff;
+          border-radius: 6px;
+          border: 1px solid rgba(251, 139, 36, 0.2);
+          cursor: pointer;
+          transition: all 0.2s;
+        `;
+        resultDiv.onmouseover = function() {
+          this.style.backgroundColor = 'rgba(251, 139, 36, 0.1)';
+          this.style.borderColor = '#FB8B24';
+        };
+        resultDiv.onmouseout = function() {
+          this.style.backgroundColor = '#fff';
+          this.style.borderColor = 'rgba(251, 139, 36, 0.2)';
+        };
+
+        const ratingHTML = result.rating ? `<span style="color: #FB8B24; margin-left: 8px;">★ ${result.rating}</span>` : '';
+        resultDiv.innerHTML = `
+          <div style="display: flex; justify-content: space-between; align-items: start; gap: 10px;">
+            <div style="flex: 1;">
+              <div style="font-weight: 600; color: #5B5941; margin-bottom: 4px;">${result.name}${ratingHTML}</div>
+              <div style="font-size: 0.85em; color: rgba(91, 89, 65, 0.7); margin-bottom: 8px;">${result.address}</div>
+              <button 
+                type="button" 
+                onclick="useGoogleRestaurant('${result.place_id}')"
+                style="padding: 6px 12px; background-color: #FB8B24; color: #F7EDE2; border: none; border-radius: 4px; font-size: 0.85em; font-weight: 500; cursor: pointer;"
+              >Use This</button>
+            </div>
+          </div>
+        `;
+        resultsList.appendChild(resultDiv);
+      });
+
+      document.getElementById('google-results').style.display = 'block';
+    })
+    .catch(error => {
+      document.getElementById('search-loading').style.display = 'none';
+      alert('Error searching for restaurants: ' + error);
+    });
+}
+
+// Load restaurant details from Google and pre-fill form
+function useGoogleRestaurant(placeId) {
+  document.getElementById('search-loading').style.display = 'block';
+
+  fetch(`/api/google-restaurant-details/?place_id=${encodeURIComponent(placeId)}`)
+    .then(response => response.json())
+    .then(data => {
+      document.getElementById('search-loading').style.display = 'none';
+
+      if (data.error) {
+        alert('Error loading restaurant details: ' + data.error);
+        return;
+      }
+
+      // Pre-fill hidden address fields
+      document.getElementById('hidden-address1').value = data.address_line1 || '';
+      document.getElementById('hidden-address2').value = '';
+      document.getElementById('hidden-city').value = data.city || '';
+      document.getElementById('hidden-province').value = data.province || '';
+      document.getElementById('hidden-postal').value = data.postal_code || '';
+      document.getElementById('hidden-country').value = data.country || 'Canada';
+
+      // Pre-fill restaurant name
+      const nameInput = document.querySelector('input[name="name"]');
+      nameInput.value = data.name || '';
+
+      // Pre-fill cuisine type if available
+      const cuisineSelect = document.querySelector('select[name="cuisine_type"]');
+      if (data.cuisine_type) {
+        const options = Array.from(cuisineSelect.options);
+        const matching = options.find(opt => opt.value === data.cuisine_type);
+        if (matching) {
+          cuisineSelect.value = data.cuisine_type;
+        }
+      }
+
+      // Show the display address
+      const addressDisplay = `${data.address_line1}${data.city ? ', ' + data.city : ''}${data.province ? ', ' + data.province : ''} ${data.postal_code || ''}`;
+      document.getElementById('selected-address').textContent = addressDisplay;
+
+      // Hide location step, show details step
+      document.getElementById('location-step').style.display = 'none';
+      document.getElementById('details-step').style.display = 'block';
+
+      // Focus on happy hour field (last editable field)
+      document.querySelector('textarea[name="happy_hour"]').focus();
+    })
+    .catch(error => {
+      document.getElementById('search-loading').style.display = 'none';
+      alert('Error loading restaurant details: ' + error);
+    });
+}
+
+// Allow searching on Enter key
+document.addEventListener('DOMContentLoaded', function() {
+  const googleSearchInput = document.getElementById('google-search-input');
+  if (googleSearchInput) {
+    googleSearchInput.addEventListener('keypress', function(e) {
+      if (e.key === 'Enter') {
+        e.preventDefault();
+        searchGoogleRestaurants();
+      }
+    });
+  }
+});
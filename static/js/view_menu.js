@@ -0,0 +1,173 @@
+let menuSearchTimeout = null;
+
+function toggleHappyHourSection() {
+  const section = document.getElementById('happy-hour-section');
+  const toggle = document.getElementById('happy-hour-toggle');
+  if (section.style.display === 'none' || section.style.display === '') {
+    section.style.display = 'block';
+    toggle.textContent = '▼';
+  } else {
+    section.style.display = 'none';
+    toggle.textContent = '▶';
+  }
+}
+
+function toggleHappyHourForm() {
+  const form = document.getElementById('happy-hour-form');
+  if (form.style.display === 'none' || form.style.display === '') {
+    form.style.display = 'block';
+  } else {
+    form.style.display = 'none';
+  }
+}
+
+// Real-time search as user types
+const menuSearchInput = document.querySelector('input[name="search"]');
+if (menuSearchInput) {
+  menuSearchInput.addEventListener('input', function() {
+    clearTimeout(menuSearchTimeout);
+    menuSearchTimeout = setTimeout(function() {
+      searchMenuItems();
+    }, 300); // Wait 300ms after user stops typing
+  });
+}
+
+function searchMenuItems() {
+  const searchQuery = menuSearchInput.value;
+  const url = new URL(window.location.href);
+  
+  if (searchQuery) {
+    url.searchParams.set('search', searchQuery);
+  } else {
+    url.searchParams.delete('search');
+  }
+  
+  // Update the URL without reloading
+  window.history.pushState({}, '', url);
+  
+  // Fetch filtered results
+  fetch(url, {
+    method: 'GET',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+    }
+  })
+  .then(response => response.text())
+  .then(html => {
+    document.getElementById('menu-items-list').innerHTML = html;
+  })
+  .catch(error => {
+    console.error('Error:', error);
+  });
+}
+
+// Reviews and photos are fetched the first time a section is opened; the
+// section's data-url serves one page, and each page links to the next
+function toggleSection(sectionId) {
+  var section = document.getElementById(sectionId);
+  if (section.style.display === 'none') {
+    section.style.display = 'block';
+    if (!section.dataset.loaded) {
+      section.dataset.loaded = 'true';
+      fetchPage(section.dataset.url, section.firstElementChild);
+    }
+  } else {
+    section.style.display = 'none';
+  }
+}
+
+function toggleReviews(reviewsId) {
+  toggleSection(reviewsId);
+}
+
+function togglePhotos(photosId) {
+  toggleSection(photosId);
+}
+
+function loadMore(button) {
+  var placeholder = button.closest('.load-more');
+  var container = placeholder.parentElement;
+  placeholder.remove();
+  fetchPage(button.dataset.url, container);
+}
+
+function fetchPage(url, container) {
+  fetch(url, {
+    method: 'GET',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+    }
+  })
+  .then(response => response.text())
+  .then(html => {
+    container.insertAdjacentHTML('beforeend', html);
+  })
+  .catch(error => {
+    console.error('Error:', error);
+  });
+}
+
+function openImageModal(imageSrc) {
+  var modal = document.createElement('div');
+  modal.style.cssText = 'position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,0.9); display: flex; align-items: center; justify-content: center; z-index: 9999; cursor: pointer;';
+  modal.onclick = function() { document.body.removeChild(modal); };
+  
+  var img = document.createElement('img');
+  img.src = imageSrc;
+  img.style.cssText = 'max-width: 90%; max-height: 90%; border-radius: 8px;';
+  
+  modal.appendChild(img);
+  document.body.appendChild(modal);
+}
+
+function likeReview(event, reviewId, currentlyLiked) {
+  event.preventDefault();
+  
+  const icon = document.getElementById(`like-icon-${reviewId}`);
+  const count = document.getElementById(`like-count-${reviewId}`);
+  
+  // Optimistic update
+  if (currentlyLiked) {
+    icon.setAttribute('fill', 'none');
+    icon.setAttribute('stroke', 'rgba(91, 89, 65, 0.6)');
+  } else {
+    icon.setAttribute('fill', '#FB8B24');
+    icon.setAttribute('stroke', '#FB8B24');
+  }
+  
+  fetch(`/reviews/${reviewId}/likes/`, {
+    // Set the state the user sees, so a repeated click cannot undo itself
+    method: currentlyLiked ? 'DELETE' : 'POST',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'X-CSRFToken': csrfToken(),
+    }
+  })
+  .then(response => response.json())
+  .then(data => {
+    // Update with server response
+    if (data.liked) {
+      icon.setAttribute('fill', '#FB8B24');
+      icon.setAttribute('stroke', '#FB8B24');
+    } else {
+      icon.setAttribute('fill', 'none');
+      icon.setAttribute('stroke', 'rgba(91, 89, 65, 0.6)');
+    }
+    count.textContent = data.like_count;
+    
+    // Update the onclick handler for next click
+    const btn = document.getElementById(`like-btn-${reviewId}`);
+    btn.setAttribute('onclick', `likeReview(event, ${reviewId}, ${data.liked})`);
+  })
+  .catch(error => {
+    console.error('Error:', error);
+    // Revert on error
+    if (currentlyLiked) {
+      icon.setAttribute('fill', '#FB8B24');
+      icon.setAttribute('stroke', '#FB8B24');
+    } else {
+      icon.setAttribute('fill', 'none');
+      icon.setAttribute('stroke', 'rgba(91, 89, 65, 0.6)');
+    }
+  });
+}